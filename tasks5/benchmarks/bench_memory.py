@@ -0,0 +1,71 @@
+"""Peak RSS of `Storage.load()` versus streaming with `Storage.iter_tasks()`.
+
+Each mode runs in a fresh interpreter so the peaks do not mix:
+
+    PYTHONPATH=src python benchmarks/bench_memory.py --tasks 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from tasks5.models import Task
+from tasks5.storage import Storage
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def measure(path: str, mode: str) -> None:
+    storage = Storage(path)
+    start = time.perf_counter()
+    if mode == "load":
+        count = sum(1 for t in storage.load() if not t.completed)
+    else:
+        count = sum(1 for t in storage.iter_tasks() if not t.completed)
+    elapsed = time.perf_counter() - start
+    print(f"{mode:6} incomplete={count}  {elapsed:6.2f}s  peak RSS {peak_rss_mb():8.1f} MB")
+
+
+def generate(path: str, count: int) -> None:
+    Storage(path).save([
+        Task(id=f"{i:032x}", description=f"Benchmark task number {i}", created="2025-11-14T00:00:00+00:00",
+             completed=i % 3 == 0, tags=["bench", f"group{i % 100}"])
+        for i in range(count)
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--measure", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    parser.add_argument("--generate", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+    if args.generate:
+        generate(args.generate, args.tasks)
+        return
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        # Linux carries ru_maxrss across exec, so the parent stays small and
+        # every step runs in its own child
+        subprocess.run([sys.executable, __file__, "--generate", path, "--tasks", str(args.tasks)], check=True)
+        print(f"{args.tasks} tasks, {os.path.getsize(path) / 1e6:.1f} MB on disk")
+        for mode in ("load", "stream"):
+            subprocess.run([sys.executable, __file__, "--measure", path, mode], check=True)
+
+
+if __name__ == "__main__":
+    main()
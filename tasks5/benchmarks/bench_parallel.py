@@ -0,0 +1,64 @@
+"""Compare serial and process-pool predicate evaluation.
+
+Run from the project directory:
+
+    PYTHONPATH=src python benchmarks/bench_parallel.py --tasks 500000 --jobs 4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+
+from tasks5.commands.list import _keep
+from tasks5.commands.search import _matches
+from tasks5.models import Task
+from tasks5.parallel import parallel_filter
+
+
+WORDS = "alpha beta gamma delta report review plan draft email meeting invoice budget".split()
+
+
+def make_tasks(n: int, seed: int = 0):
+    rnd = random.Random(seed)
+    return [
+        Task(
+            id=f"{i:08x}",
+            description=" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(4, 12))),
+            created="2025-11-14T00:00:00+00:00",
+            completed=rnd.random() < 0.5,
+            tags=rnd.sample(WORDS, rnd.randint(0, 3)),
+        )
+        for i in range(n)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.tasks)
+    cases = [
+        ("search description -i", _matches, ("Report Draft", "description", True)),
+        ("search tags", _matches, ("plan", "tags", False)),
+        ("list --tag --incomplete", _keep, ("budget", False)),
+    ]
+    print(f"{args.tasks} tasks, {args.jobs} jobs")
+    for name, predicate, pargs in cases:
+        serial, expected = timed(lambda: parallel_filter(tasks, predicate, pargs, jobs=1))
+        pooled, got = timed(lambda: parallel_filter(tasks, predicate, pargs, jobs=args.jobs, min_tasks=0))
+        assert got == expected
+        print(f"{name:26} serial {serial:7.3f}s  parallel {pooled:7.3f}s  speedup {serial / pooled:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
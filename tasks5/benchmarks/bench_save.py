@@ -0,0 +1,72 @@
+"""Save cost against the number of changed tasks.
+
+Saves a generated task file once in full, then repeatedly with k tasks
+modified in place (plus one appended), and prints the median time per save:
+
+    PYTHONPATH=src python benchmarks/bench_save.py --tasks 100k --changes 0,1,10,100,1000,10000
+
+Unchanged tasks are copied from the previous file, the id index gets new
+spans only and the posting indexes a delta, so encoding and indexing grow
+with k rather than with the file size. What stays proportional to the file
+is comparing the tasks with the ones written and copying the bytes. The
+last line is the one-shot case: a fresh storage loads, changes one task and
+saves, as a CLI command would.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from datagen import make_tasks, size
+from tasks5.models import Task
+from tasks5.storage import Storage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=size, default=size("100k"))
+    parser.add_argument("--changes", default="0,1,10,100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    tasks = make_tasks(args.tasks)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        storage = Storage(path, durability="none")
+        storage.cache_writes = True
+
+        start = time.perf_counter()
+        storage.save(tasks)
+        print(f"{args.tasks} tasks, {os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"  full save              {(time.perf_counter() - start) * 1000:9.1f} ms  (id index built)")
+
+        for k in (int(c) for c in args.changes.split(",")):
+            times = []
+            for _ in range(args.repeat):
+                for t in rnd.sample(tasks, min(k, len(tasks))):
+                    t.completed = not t.completed
+                    t.description += " edited"
+                tasks.append(Task.create(f"Added {len(tasks)}", tags=["bench"]))
+                start = time.perf_counter()
+                storage.save(tasks)
+                times.append(time.perf_counter() - start)
+            print(f"  {k:>6} changed + 1 new {statistics.median(times) * 1000:9.1f} ms")
+
+        times = []
+        for _ in range(args.repeat):
+            oneshot = Storage(path, durability="none")
+            loaded = oneshot.load()
+            loaded[rnd.randrange(len(loaded))].description += " edited"
+            start = time.perf_counter()
+            oneshot.save(loaded)
+            times.append(time.perf_counter() - start)
+        print(f"  load, 1 changed, save  {statistics.median(times) * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
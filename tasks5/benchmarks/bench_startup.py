@@ -0,0 +1,90 @@
+"""Start-up budget for `speckit list` on an empty data file.
+
+Runs the CLI in fresh interpreters under `python -X importtime`, reports the
+median import time and wall time, and exits non-zero when the import time
+exceeds the budget or a module that `list` should not need gets imported:
+
+    PYTHONPATH=src python benchmarks/bench_startup.py --runs 20 --budget-ms 40
+
+Bytecode is cached in a temporary `PYTHONPYCACHEPREFIX` (after one warm-up
+run) so the numbers reflect an installed package rather than compilation.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# heavy modules that only other commands (or large inputs) should import
+FORBIDDEN = ("numpy", "asyncio", "concurrent.futures", "dataclasses", "sqlite3", "uuid", "tempfile",
+             "tasks5.daemon", "tasks5.table", "tasks5.commands.add", "tasks5.commands.search")
+
+
+def run_once(data_file: str, env: dict) -> tuple:
+    """`(total import µs, wall seconds, imported module names)` of one run."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "tasks5.cli", "--data-file", data_file, "list"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+    total = 0
+    modules = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules.add(name.strip())
+            # top-level entries (no indentation) add up to the whole import time
+            if not name[1:].startswith(" "):
+                total += int(cumulative)
+    return total, wall, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=40.0, help="Median import time allowed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        data_file = os.path.join(d, "tasks.json")
+        with open(data_file, "w", encoding="utf-8") as f:
+            f.write('{"version": "1.0", "tasks": []}\n')
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=os.path.join(d, "pycache"))
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+        run_once(data_file, env)  # writes the bytecode cache
+        imports, walls, seen = [], [], set()
+        for _ in range(args.runs):
+            total, wall, modules = run_once(data_file, env)
+            imports.append(total / 1000)
+            walls.append(wall * 1000)
+            seen |= modules
+
+    import_ms = statistics.median(imports)
+    print(f"speckit list (empty file), {args.runs} runs")
+    print(f"  imports  median {import_ms:6.1f} ms  (min {min(imports):.1f}, max {max(imports):.1f})")
+    print(f"  wall     median {statistics.median(walls):6.1f} ms")
+
+    failed = False
+    unexpected = sorted(m for m in seen if m in FORBIDDEN)
+    if unexpected:
+        print(f"FAIL: imported {', '.join(unexpected)}")
+        failed = True
+    if import_ms > args.budget_ms:
+        print(f"FAIL: median import time {import_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+"""tracemalloc comparison of Task representations.
+
+Compares a plain `__dict__` dataclass with list tags (the original model),
+the slotted `Task` and the frozen, tuple-tagged `FrozenTask`, all built from
+the same decoded JSON:
+
+    PYTHONPATH=src python benchmarks/bench_task_memory.py --tasks 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List
+
+from tasks5.models import FrozenTask, Task
+
+
+@dataclass
+class DictTask:
+    id: str
+    description: str
+    created: str
+    completed: bool = False
+    tags: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(str(data["id"]), str(data["description"]), str(data["created"]), bool(data["completed"]), list(data["tags"]))
+
+
+def make_rows(n: int):
+    # decode from JSON so every task gets its own tag string objects, as a real load would
+    return json.loads(json.dumps([
+        {"id": f"{i:032x}", "description": f"Benchmark task number {i}", "created": "2025-11-14T00:00:00+00:00",
+         "completed": i % 3 == 0, "tags": ["bench", f"group{i % 100}", "shared-tag"]}
+        for i in range(n)
+    ]))
+
+
+def measure(cls, n: int) -> float:
+    gc.collect()
+    # trace the decode too, so per-task tag strings that interning frees are counted
+    tracemalloc.start()
+    rows = make_rows(n)
+    tasks = [cls.from_dict(r) for r in rows]
+    del rows
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tasks
+    return current / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{args.tasks} tasks, memory retained after dropping the decoded rows")
+    baseline = None
+    for name, cls in (("dict dataclass", DictTask), ("slotted Task", Task), ("FrozenTask", FrozenTask)):
+        mb = measure(cls, args.tasks)
+        baseline = baseline or mb
+        print(f"{name:15} {mb:8.1f} MB  ({mb / baseline:5.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
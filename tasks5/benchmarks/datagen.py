@@ -0,0 +1,93 @@
+"""Deterministic synthetic task data for the benchmarks.
+
+The same `(count, seed)` always yields the same tasks. Distributions aim
+at what a real task list looks like rather than uniform noise:
+
+- tags: 0-4 per task drawn from a Zipf-like distribution over a few common
+  tags and a long tail of project tags;
+- descriptions: 3-14 words, Zipf-like over a vocabulary of common task
+  words plus rare terms, so some searches hit many tasks and some few;
+- created: increasing over two years, as tasks are appended over time;
+- completed: older tasks are more likely to be done.
+
+    PYTHONPATH=src python benchmarks/datagen.py --tasks 100k -o tasks.json
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from tasks5.models import Task
+from tasks5.storage import Storage
+
+
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000, "1m": 1000000}
+
+COMMON_TAGS = ["work", "home", "urgent", "errands", "email", "finance", "health", "reading",
+               "meeting", "someday", "waiting", "phone", "school", "travel", "garden", "car"]
+WORDS = """call email review write fix update plan book pay buy send check clean prepare draft
+schedule read finish submit order renew cancel organize follow up with about the for and to on
+report invoice budget meeting doctor dentist groceries laundry taxes insurance car kitchen garden
+project proposal slides notes contract client team manager mom dad friend birthday gift flight
+hotel tickets appointment prescription bill rent mortgage bank account password backup laptop
+phone printer website blog article chapter thesis homework exam lecture course library package
+delivery return refund warranty repair plumber electrician paint fence roof gutter lawn""".split()
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+SPAN = timedelta(days=730)
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return list(itertools.accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def size(value: str) -> int:
+    """Parse a task count such as `10000`, `10k` or `1m`."""
+    value = value.strip().lower()
+    if value in SIZES:
+        return SIZES[value]
+    if value.endswith(("k", "m")):
+        return int(float(value[:-1]) * (1000 if value[-1] == "k" else 1000000))
+    return int(value)
+
+
+def make_tasks(count: int, seed: int = 0) -> List[Task]:
+    rnd = random.Random(seed)
+    tags = COMMON_TAGS + [f"project-{i}" for i in range(200)]
+    words = WORDS + [f"term{i}" for i in range(5000)]
+    tag_weights = _zipf_weights(len(tags))
+    word_weights = _zipf_weights(len(words))
+    step = SPAN / max(count, 1)
+
+    tasks = []
+    for i in range(count):
+        age = 1 - i / max(count, 1)
+        created = START + step * i + timedelta(seconds=rnd.random() * step.total_seconds())
+        tasks.append(Task(
+            id=f"{rnd.getrandbits(128):032x}",
+            description=" ".join(rnd.choices(words, cum_weights=word_weights, k=rnd.randint(3, 14))).capitalize(),
+            created=created.isoformat(),
+            completed=rnd.random() < 0.1 + 0.8 * age,
+            tags=list(dict.fromkeys(rnd.choices(tags, cum_weights=tag_weights, k=rnd.choice((0, 1, 1, 2, 2, 3, 4))))),
+        ))
+    return tasks
+
+
+def write_dataset(path: str, count: int, seed: int = 0) -> None:
+    Storage(path).save(make_tasks(count, seed))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=size, default=SIZES["10k"], help="Task count (e.g. 1k, 10k, 100k, 1m)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", default="tasks.json")
+    args = parser.parse_args()
+    write_dataset(args.output, args.tasks, args.seed)
+    print(f"wrote {args.tasks} tasks to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Benchmark suite: storage operations and CLI commands on synthetic data.
+
+For each dataset size a tasks.json file is generated with `datagen` and
+every case runs in its own interpreter, so peak RSS belongs to that case
+alone. Results (latency percentiles, throughput, peak RSS) are written as
+JSON so runs can be compared across commits:
+
+    PYTHONPATH=src python benchmarks/suite.py --sizes 1k,10k,100k -o after.json
+    PYTHONPATH=src python benchmarks/suite.py --sizes 1k,10k,100k --compare before.json
+
+Every case starts with the sidecar indexes built, as earlier commands on
+the file would have left them. Command cases run through `cli.dispatch`
+with a fresh storage per repetition, like separate CLI invocations minus
+interpreter start-up, after one untimed run. Each command case is also
+reported cold (`[cold]`): the indexes are removed before every repetition,
+so it pays for building whatever it reads, like the first command after the
+indexes were lost. Internals missing from older trees (no indexes, no
+`cli.dispatch`) are skipped, so a report can be taken at any commit.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from datagen import size
+
+
+STORAGE_CASES = ("load", "save", "add_task", "get_task_by_id")
+# sidecar indexes, rebuilt on demand when missing
+SIDECARS = (".idx", ".tags", ".tri", ".terms")
+COMMAND_CASES = {
+    "list": [
+        ["list"],
+        ["list", "--tag", "work"],
+        ["list", "--completed"],
+        ["list", "--tag", "project-7", "--incomplete"],
+        ["list", "--since", "2024-07-01"],
+    ],
+    "search": [
+        ["search", "invoice"],
+        ["search", "--ignore-case", "Review Report"],
+        ["search", "--field", "tags", "urgent"],
+        ["search", "--rank", "budget meeting", "--limit", "10"],
+    ],
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    # nearest rank
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))]
+
+
+def summarize(latencies: List[float], items_per_op: int = 1) -> Dict[str, float]:
+    values = sorted(latencies)
+    total = sum(values)
+    return {
+        "repeat": len(values),
+        "mean_ms": total / len(values) * 1000,
+        "min_ms": values[0] * 1000,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p90_ms": percentile(values, 0.90) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "ops_per_s": len(values) / total if total else 0.0,
+        "items_per_s": len(values) * items_per_op / total if total else 0.0,
+    }
+
+
+def timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - start)
+    return out
+
+
+def build_indexes(path: str) -> None:
+    # copying them along with the data file would not do: the copy has a new
+    # signature, which leaves every copied index stale
+    from tasks5.storage import Storage
+
+    storage = Storage(path)
+    for name, args in (("reindex", ()), ("find_by_tag", ("",)), ("description_candidates", ("index",)),
+                       ("term_corpus", ("index",))):
+        method = getattr(storage, name, None)  # older trees lack some indexes
+        if method is not None:
+            method(*args)
+
+
+def drop_indexes(path: str) -> None:
+    for suffix in SIDECARS:
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def run_storage_case(case: str, path: str, repeat: int) -> dict:
+    from tasks5.models import Task
+    from tasks5.storage import Storage
+
+    count = len(Storage(path).load())
+    if case == "load":
+        def op():
+            Storage(path).load()
+        return summarize(timed(op, repeat), count)
+
+    if case == "save":
+        storage = Storage(path)
+        tasks = storage.load()
+        return summarize(timed(lambda: storage.save(tasks), repeat), count)
+
+    if case == "add_task":
+        storage = Storage(path)
+        numbers = iter(range(repeat))
+        return summarize(timed(lambda: storage.add_task(Task.create(f"Benchmark add {next(numbers)}", tags=["bench"])),
+                               repeat))
+
+    if case == "get_task_by_id":
+        storage = Storage(path)
+        ids = [t.id for t in storage.load()]
+        if hasattr(storage, "clear_cache"):
+            storage.clear_cache()  # look up through the id index, not the load cache
+        storage.get_task_by_id(ids[0])  # loads the index
+        rnd = random.Random(0)
+        return summarize(timed(lambda: storage.get_task_by_id(rnd.choice(ids)), repeat))
+
+    raise SystemExit(f"unknown case {case}")
+
+
+def run_command_case(argv: List[str], path: str, repeat: int, cold: bool = False) -> dict:
+    from tasks5 import cli
+
+    argv = ["--data-file", path] + argv
+    parser = cli.build_parser()
+
+    def run() -> int:
+        if not hasattr(cli, "dispatch"):  # older trees only have main()
+            return cli.main(argv)
+        args = parser.parse_args(argv)
+        return cli.dispatch(args, cli.make_context(args), parser)
+
+    def op():
+        with open(os.devnull, "w") as sink:
+            stdout, sys.stdout = sys.stdout, sink
+            try:
+                rc = run()
+            finally:
+                sys.stdout = stdout
+        if rc != 0:
+            raise SystemExit(f"{' '.join(argv)} exited with {rc}")
+
+    op()  # warms the page cache (and builds the indexes the command uses)
+    if not cold:
+        return summarize(timed(op, repeat))
+    latencies = []
+    for _ in range(repeat):
+        drop_indexes(path)
+        latencies += timed(op, 1)
+    return summarize(latencies)
+
+
+def child(args) -> None:
+    """Run one case on a private copy of the dataset and print its result."""
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        shutil.copyfile(args.data, path)
+        # in a process of its own, so that its memory is not counted; a cold
+        # case builds what it uses in its own untimed first run
+        if not args.cold:
+            subprocess.run([sys.executable, "-c", "import sys; from suite import build_indexes; build_indexes(sys.argv[1])",
+                            path], check=True, env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+        if args.child in STORAGE_CASES:
+            result = run_storage_case(args.child, path, args.repeat)
+        else:
+            result = run_command_case(json.loads(args.argv), path, args.repeat, args.cold)
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def repeats(count: int, light: bool) -> int:
+    # enough samples for percentiles without making 1M-task runs take hours
+    if light:
+        return max(5, min(200, 2000000 // count))
+    return max(3, min(20, 200000 // count))
+
+
+def spawn(case: str, data: str, repeat: int, argv: List[str] | None = None, cold: bool = False) -> dict:
+    cmd = [sys.executable, __file__, "--child", case, "--data", data, "--repeat", str(repeat)]
+    if argv is not None:
+        cmd += ["--argv", json.dumps(argv)]
+    if cold:
+        cmd.append("--cold")
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[dict], baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["case"], r["variant"], r["tasks"]): r for r in json.load(f)["results"]}
+    print(f"\np50 relative to {baseline_path} (<1 is faster)")
+    for r in results:
+        old = baseline.get((r["case"], r["variant"], r["tasks"]))
+        if old and old["p50_ms"]:
+            print(f"  {r['tasks']:>8} {r['variant']:45} {r['p50_ms'] / old['p50_ms']:6.2f}x"
+                  f"  rss {r['peak_rss_mb'] - old['peak_rss_mb']:+8.1f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1k,10k,100k", help="Comma-separated dataset sizes (1k, 10k, 100k, 1m)")
+    parser.add_argument("--cases", default=None, help="Comma-separated cases (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", default=None, help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", default=None, metavar="REPORT", help="Print p50 ratios against an earlier report")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    parser.add_argument("--repeat", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--argv", help=argparse.SUPPRESS)
+    parser.add_argument("--cold", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    selected = args.cases.split(",") if args.cases else list(STORAGE_CASES) + list(COMMAND_CASES)
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        for count in (size(s) for s in args.sizes.split(",")):
+            data = os.path.join(d, f"tasks-{count}.json")
+            # generated in a child so this process stays small for the RSS numbers
+            subprocess.run([sys.executable, "-c", "import sys; from datagen import write_dataset; "
+                            "write_dataset(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))",
+                            data, str(count), str(args.seed)],
+                           check=True, env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+            for case in selected:
+                variants = COMMAND_CASES.get(case, [None])
+                for argv in variants:
+                    for cold in (False, True) if argv is not None else (False,):
+                        # a cold repetition rebuilds indexes: sample it like the heavy cases
+                        repeat = repeats(count, light=case == "get_task_by_id" or (argv is not None and not cold))
+                        variant = (" ".join(argv) if argv else case) + (" [cold]" if cold else "")
+                        try:
+                            result = spawn(case, data, repeat, argv, cold)
+                        except subprocess.CalledProcessError as exc:
+                            # e.g. an option the tree under test does not have yet
+                            reason = (exc.stderr or "").strip().splitlines()[-1:] or [f"exit status {exc.returncode}"]
+                            print(f"{count:>8} {variant:45} skipped: {reason[0]}", file=sys.stderr)
+                            continue
+                        results.append(dict(case=case, variant=variant, tasks=count, **result))
+                        print(f"{count:>8} {variant:45} p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms"
+                              f"  rss {result['peak_rss_mb']:7.1f} MB", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Archive tier: completed tasks moved out of the working set.
+
+Most tasks end up completed and are rarely looked at again, yet every load
+of the data file parses them. `Storage.archive_completed` moves completed
+tasks created before a cutoff from `<path>` to `<path>.archive.gz`; after
+that `load`, `add` and the indexes only deal with the tasks that stay (the
+hot tier), and the archive is read only when asked for (`iter_archived`,
+`list --all`).
+
+The archive is a gzip file of NDJSON task objects. Each migration appends
+one gzip member, so archived tasks are never rewritten. Their ids are also
+listed, one per line, in `<archive>.ids`, so that `add` and `import` can
+refuse an archived id without decompressing the archive.
+
+Moving tasks between two files is not atomic. Before the archive grows,
+`<archive>.pending` records its size (and that of the id list) and the signature of the data file;
+the record is removed once the data file has been rewritten without the
+moved tasks. Until then readers ignore the new member, and `recover`, run
+whenever the storage takes its writer lock, cuts it off if the migration
+died first, before any other write can change the data file.
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+from datetime import datetime
+from typing import Iterator, Optional, Set
+
+from .atomic import atomic_write
+from .index import file_signature
+from .models import Task, parse_timestamp
+
+
+def archive_path(path: str) -> str:
+    return f"{path}.archive.gz"
+
+
+def pending_path(path: str) -> str:
+    return f"{archive_path(path)}.pending"
+
+
+def ids_path(path: str) -> str:
+    return f"{archive_path(path)}.ids"
+
+
+def archivable(task: Task, cutoff: datetime) -> bool:
+    """Completed and created before `cutoff`; tasks without a valid date stay."""
+    if not task.completed:
+        return False
+    try:
+        return parse_timestamp(task.created) < cutoff
+    except ValueError:
+        return False
+
+
+def _read_pending(path: str) -> Optional[dict]:
+    try:
+        with open(pending_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def recover(path: str) -> bool:
+    """Settle a migration interrupted by a crash; True if there was one."""
+    record = _read_pending(path)
+    if record is None:
+        return False
+    if file_signature(path) == tuple(record["data"] or ()):
+        # the data file still holds the moved tasks: drop their copies
+        with open(archive_path(path), "r+b") as f:
+            f.truncate(record["size"])
+            os.fsync(f.fileno())
+        if record.get("ids") is not None and os.path.exists(ids_path(path)):
+            with open(ids_path(path), "r+b") as f:
+                f.truncate(record["ids"])
+                os.fsync(f.fileno())
+    os.remove(pending_path(path))
+    return True
+
+
+class _Head(io.RawIOBase):
+    """The first `size` bytes of a binary file."""
+
+    def __init__(self, f, size: int) -> None:
+        self.f = f
+        self.left = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self.f.read(min(len(b), self.left))
+        b[:len(data)] = data
+        self.left -= len(data)
+        return len(data)
+
+
+def iter_archived(path: str) -> Iterator[Task]:
+    """Stream the archived tasks of the data file `path`, oldest migration first."""
+    import gzip
+
+    record = _read_pending(path)
+    try:
+        f = open(archive_path(path), "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        raw = f
+        if record is not None and file_signature(path) == tuple(record["data"] or ()):
+            raw = io.BufferedReader(_Head(f, record["size"]))  # a migration still in progress
+        with gzip.GzipFile(fileobj=raw, mode="rb") as z:
+            for line in z:
+                if line.strip():
+                    yield Task.from_dict(json.loads(line))
+
+
+def archived_ids(path: str) -> Set[str]:
+    """Ids of the archived tasks of the data file `path`.
+
+    Reads the id list; an archive written before there was one is scanned.
+    """
+    if not os.path.exists(archive_path(path)):
+        return set()
+    record = _read_pending(path)
+    try:
+        f = open(ids_path(path), "rb")
+    except FileNotFoundError:
+        return {t.id for t in iter_archived(path)}
+    with f:
+        if record is not None and record.get("ids") is not None and file_signature(path) == tuple(record["data"] or ()):
+            data = f.read(record["ids"])  # a migration still in progress
+        else:
+            data = f.read()
+    return set(data.decode("utf-8").split("\n")) - {""}
+
+
+def _write_ids(f, ids) -> None:
+    f.write("".join(f"{id}\n" for id in ids).encode("utf-8"))
+
+
+class Appender:
+    """Writes one new archive member; the pending record is written with the first task.
+
+    Call `close` once every task is added, before rewriting the data file.
+    Leaving the `with` block removes the pending record, or on an error
+    undoes the append.
+    """
+
+    def __init__(self, path: str, fsync: bool = True) -> None:
+        self.path = path
+        self.fsync = fsync
+        self.count = 0
+        self._file = None
+        self._member = None
+        self._ids = []
+
+    def __enter__(self) -> "Appender":
+        return self
+
+    def add(self, task: Task) -> None:
+        if self._file is None:
+            archive = archive_path(self.path)
+            size = os.path.getsize(archive) if os.path.exists(archive) else 0
+            if not os.path.exists(ids_path(self.path)):
+                # none yet, or an archive from before the id list
+                with atomic_write(ids_path(self.path), "wb", fsync=self.fsync) as f:
+                    _write_ids(f, (t.id for t in iter_archived(self.path)) if size else ())
+            signature = file_signature(self.path)
+            with atomic_write(pending_path(self.path), "w", fsync=self.fsync) as f:
+                f.write(json.dumps({"size": size, "ids": os.path.getsize(ids_path(self.path)),
+                                    "data": list(signature) if signature is not None else None}))
+            import gzip
+
+            self._file = open(archive, "ab")
+            self._member = gzip.GzipFile(fileobj=self._file, mode="wb")
+        self._member.write(json.dumps(task.to_dict(), ensure_ascii=False).encode("utf-8") + b"\n")
+        self._ids.append(task.id)
+        self.count += 1
+
+    def close(self) -> None:
+        if self._member is not None:
+            self._member.close()
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._member = None
+            with open(ids_path(self.path), "ab") as f:
+                _write_ids(f, self._ids)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            if self._file is not None:
+                try:
+                    if self._member is not None:
+                        self._member.close()
+                finally:
+                    self._file.close()
+                    self._member = None
+            recover(self.path)
+            return
+        self.close()
+        if self._file is not None:
+            os.remove(pending_path(self.path))
@@ -0,0 +1,45 @@
+"""Atomic file replacement through uniquely named temporary files.
+
+Each writer gets its own temporary file in the target's directory, so
+concurrent writers never share (and corrupt) a temporary path; the file
+is moved over the target with `os.replace` only once it is complete.
+"""
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+
+def _target_mode(path: str) -> int:
+    # mkstemp creates 0600 files; keep the mode of the file being replaced,
+    # or what a plain open() would have used for a new one
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+@contextmanager
+def atomic_write(path: str, mode: str = "wb", fsync: bool = True) -> Iterator[IO]:
+    """Yield a temporary file that replaces `path` when the block succeeds."""
+    import tempfile  # slow to import; read-only commands never get here
+
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        os.chmod(tmp_path, _target_mode(path))
+        encoding = None if "b" in mode else "utf-8"
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
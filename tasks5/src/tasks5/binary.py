@@ -0,0 +1,178 @@
+"""Binary task snapshot read through `mmap`.
+
+Layout (little-endian):
+
+- header: magic, format version, task count, then the section offsets and
+  the signature of the JSON file the snapshot was generated from;
+- one fixed-width record per task (`RECORD`): heap offsets/lengths of the
+  id, description and created strings, the completed flag and the slice of
+  the tag-id array holding the task's tags;
+- the task ordinals sorted by id, for binary search;
+- the tag-id array (u32 per tag occurrence) and the tag name table;
+- a heap with every string as UTF-8.
+
+Reading a field only touches the pages holding that record and its
+strings, so a lookup by id or a scan of the completed flags does not read
+the rest of the file.
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .atomic import atomic_write
+from .models import Task
+
+
+MAGIC = b"TSK5BIN\0"
+FORMAT_VERSION = 1
+
+# magic, version, count, records, sorted ids, tag ids, tag names, tag name
+# count, heap, source signature (mtime_ns, size, inode)
+HEADER = struct.Struct("<8sII QQQQI Q qqq")
+# id (off, len), description (off, len), created (off, len), completed,
+# first tag position, tag count
+RECORD = struct.Struct("<QIQIQIB3xII")
+_COMPLETED_AT = struct.calcsize("<QIQIQI")
+U32 = struct.Struct("<I")
+STRING = struct.Struct("<QI")
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+def write_snapshot(path: str, tasks: Sequence[Task], source: Optional[Tuple[int, int, int]] = None,
+                   fsync: bool = True) -> None:
+    """Write `tasks` to `path` atomically (temporary file + replace)."""
+    heap = bytearray()
+    strings: Dict[str, Tuple[int, int]] = {}
+
+    def put(value: str) -> Tuple[int, int]:
+        ref = strings.get(value)
+        if ref is None:
+            data = value.encode("utf-8")
+            ref = (len(heap), len(data))
+            heap.extend(data)
+            strings[value] = ref
+        return ref
+
+    tag_codes: Dict[str, int] = {}
+    tag_ids: List[int] = []
+    records = bytearray()
+    for t in tasks:
+        first = len(tag_ids)
+        for tag in t.tags:
+            tag_ids.append(tag_codes.setdefault(tag, len(tag_codes)))
+        records += RECORD.pack(*put(t.id), *put(t.description), *put(t.created),
+                               1 if t.completed else 0, first, len(t.tags))
+
+    order = sorted(range(len(tasks)), key=lambda i: tasks[i].id.encode("utf-8"))
+    sorted_ids = b"".join(U32.pack(i) for i in order)
+    tag_table = b"".join(U32.pack(c) for c in tag_ids)
+    names = b"".join(STRING.pack(*put(name)) for name in tag_codes)
+
+    records_off = HEADER.size
+    sorted_off = records_off + len(records)
+    tags_off = sorted_off + len(sorted_ids)
+    names_off = tags_off + len(tag_table)
+    heap_off = names_off + len(names)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(tasks), records_off, sorted_off, tags_off,
+                         names_off, len(tag_codes), heap_off, *(source or (0, -1, 0)))
+
+    with atomic_write(path, "wb", fsync=fsync) as f:
+        for part in (header, records, sorted_ids, tag_table, names, heap):
+            f.write(part)
+
+
+class BinarySnapshot:
+    """Lazy, memory-mapped view of a snapshot written by `write_snapshot`."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise BinaryFormatError(f"{path} is empty")
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise BinaryFormatError(f"{path} is truncated")
+        (magic, version, self.count, self._records, self._sorted, self._tags,
+         self._names, self._name_count, self._heap, *source) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise BinaryFormatError(f"{path} is not a tasks5 binary snapshot")
+        self.source = tuple(source)
+        self._tag_names: Optional[List[str]] = None
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> "BinarySnapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _string(self, off: int, length: int) -> str:
+        start = self._heap + off
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _record(self, i: int) -> tuple:
+        return RECORD.unpack_from(self._mm, self._records + i * RECORD.size)
+
+    def tag_names(self) -> List[str]:
+        if self._tag_names is None:
+            self._tag_names = [
+                self._string(*STRING.unpack_from(self._mm, self._names + n * STRING.size))
+                for n in range(self._name_count)
+            ]
+        return self._tag_names
+
+    def completed(self, i: int) -> bool:
+        # the flag sits at a fixed position inside the record
+        return self._mm[self._records + i * RECORD.size + _COMPLETED_AT] == 1
+
+    def id(self, i: int) -> str:
+        return self._string(*RECORD.unpack_from(self._mm, self._records + i * RECORD.size)[:2])
+
+    def task(self, i: int) -> Task:
+        id_off, id_len, d_off, d_len, c_off, c_len, completed, first, ntags = self._record(i)
+        names = self.tag_names() if ntags else []
+        tags = [names[U32.unpack_from(self._mm, self._tags + (first + k) * 4)[0]] for k in range(ntags)]
+        return Task(
+            id=self._string(id_off, id_len),
+            description=self._string(d_off, d_len),
+            created=self._string(c_off, c_len),
+            completed=completed == 1,
+            tags=tags,
+        )
+
+    def find(self, id: str) -> Optional[int]:
+        """Ordinal of the task with `id`, by binary search over the sorted ids."""
+        key = id.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = U32.unpack_from(self._mm, self._sorted + mid * 4)[0]
+            id_off, id_len = RECORD.unpack_from(self._mm, self._records + i * RECORD.size)[:2]
+            start = self._heap + id_off
+            probe = self._mm[start:start + id_len]
+            if probe < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            i = U32.unpack_from(self._mm, self._sorted + lo * 4)[0]
+            if self.id(i) == id:
+                return i
+        return None
+
+    def iter_tasks(self) -> Iterator[Task]:
+        for i in range(self.count):
+            yield self.task(i)
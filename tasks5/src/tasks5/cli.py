@@ -9,52 +9,67 @@ from __future__ import annotations
 import argparse
 import sys
 from types import SimpleNamespace
+from typing import Iterable
 
-from .storage import Storage
+from .commands import COMMANDS, load
+
+
+def build_parser(commands: Iterable[str] | None = None):
+    """Build the argument parser.
+
+    Only the subcommands in `commands` (default: all) get their full
+    arguments, which imports their modules; the rest are registered with
+    just their help text so `--help` still lists them.
+    """
+    from .storage import BACKENDS, DURABILITY
 
-def build_parser():
     parser = argparse.ArgumentParser(prog="speckit", description="Speckit CLI - task manager")
-    parser.add_argument("--data-file", help="Path to tasks.json file", default="tasks.json")
+    parser.add_argument("--data-file", help="Path to tasks.json file (or a sharded or segmented data directory)", default="tasks.json")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="Storage backend (default: sharded for new directories, sqlite for .db files, else json)")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Number of shards when a sharded data directory is created (default 16)")
+    # "batch" only groups adds made concurrently in one process, which
+    # `serve` does for its clients; a one-off CLI process never does
+    parser.add_argument("--durability", choices=DURABILITY, default="always",
+                        help="fsync every write, share one fsync between concurrent adds (serve only), or never fsync")
+    parser.add_argument("--binary-snapshot", action="store_true", help="Keep a memory-mapped binary copy of the data file")
     parser.add_argument("--debug", action="store_true", help="Show debug output")
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
-    # Import command modules and let them register their subparsers
-    from .commands import add as add_cmd
-    from .commands import list as list_cmd
-    from .commands import search as search_cmd
-
-    add_cmd.configure_parser(subparsers)
-    list_cmd.configure_parser(subparsers)
-    search_cmd.configure_parser(subparsers)
+    # a module may register several commands (shell and batch): configure
+    # whole modules, and give stubs only to names no configured module owns
+    selected = set(COMMANDS if commands is None else commands) & set(COMMANDS)
+    modules = {COMMANDS[name].module for name in selected}
+    configured = set()
+    for name, command in COMMANDS.items():
+        if command.module not in modules:
+            subparsers.add_parser(name, help=command.help, add_help=False)
+        elif command.module not in configured:
+            load(name).configure_parser(subparsers)
+            configured.add(command.module)
 
     return parser
 
 
-def main(argv: list[str] | None = None) -> int:
-    argv = argv if argv is not None else sys.argv[1:]
-    parser = build_parser()
-    args = parser.parse_args(argv)
+def make_context(args) -> SimpleNamespace:
+    """Context handed to the command `run` functions."""
+    from .storage import open_storage
 
-    # Build a simple context with storage instance
     ctx = SimpleNamespace()
     ctx.data_file = args.data_file
     ctx.debug = getattr(args, "debug", False)
-    ctx.storage = Storage(args.data_file)
-
-    try:
-        if args.command == "add":
-            from .commands import add as add_cmd
-
-            return add_cmd.run(args, ctx)
-        if args.command == "list":
-            from .commands import list as list_cmd
+    ctx.storage = open_storage(args.data_file, args.backend, binary=args.binary_snapshot, durability=args.durability,
+                               shards=args.shards)
+    return ctx
 
-            return list_cmd.run(args, ctx)
-        if args.command == "search":
-            from .commands import search as search_cmd
 
-            return search_cmd.run(args, ctx)
+def dispatch(args, ctx, parser) -> int:
+    """Run the selected command and return its exit code."""
+    try:
+        if args.command in COMMANDS:
+            return load(args.command).run(args, ctx)
 
         parser.print_help()
         return 1
@@ -65,5 +80,24 @@ def main(argv: list[str] | None = None) -> int:
         return 1
 
 
+def main(argv: list[str] | None = None) -> int:
+    argv = argv if argv is not None else sys.argv[1:]
+
+    # A running `speckit serve` answers without this process parsing
+    # arguments or loading any tasks.
+    from .client import forward, scan_argv
+
+    rc = forward(argv)
+    if rc is not None:
+        return rc
+
+    _, command = scan_argv(argv)
+    parser = build_parser([command] if command else [])
+    args = parser.parse_args(argv)
+    if args.durability == "batch" and args.command != "serve":
+        parser.error("--durability batch only applies to serve")
+    return dispatch(args, make_context(args), parser)
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""Client side of `speckit serve`, kept light so every CLI start can check it.
+
+See `tasks5.daemon` for the protocol and the server.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from typing import List, Optional, Tuple
+
+
+# commands that only touch the storage; the others read or write local
+# files or stdin and always run in the calling process
+FORWARDED = ("add", "list", "search")
+# global options taking a value, for `scan_argv`
+_VALUED = ("--data-file", "--backend", "--durability", "--shards")
+_OPTIONS = _VALUED + ("--binary-snapshot", "--debug", "--help")
+CONNECT_TIMEOUT = 1.0
+
+
+def socket_path(data_file: str) -> str:
+    return os.path.abspath(data_file) + ".sock"
+
+
+def _expand(arg: str) -> Tuple[str, Optional[str]]:
+    """`(option, inline value)` of a global option, resolving unique prefixes as argparse does."""
+    if not arg.startswith("--"):
+        return arg, None
+    name, eq, value = arg.partition("=")
+    matches = [o for o in _OPTIONS if o.startswith(name)]
+    if name not in _OPTIONS and len(matches) == 1:
+        name = matches[0]
+    return name, value if eq else None
+
+
+def scan_argv(argv: List[str]) -> Tuple[str, Optional[str]]:
+    """`(data file, command)` from a command line, without building the parser."""
+    data_file = "tasks.json"
+    i = 0
+    while i < len(argv):
+        arg, value = _expand(argv[i])
+        if arg == "--data-file" and value is not None:
+            data_file = value
+        elif arg in _VALUED and value is None:
+            if arg == "--data-file" and i + 1 < len(argv):
+                data_file = argv[i + 1]
+            i += 1
+        elif not arg.startswith("-"):
+            return data_file, arg
+        i += 1
+    return data_file, None
+
+
+def forward(argv: List[str]) -> Optional[int]:
+    """Run `argv` on a running server; None when it has to run locally."""
+    data_file, command = scan_argv(argv)
+    if command not in FORWARDED:
+        return None
+    path = socket_path(data_file)
+    if not os.path.exists(path):
+        return None
+
+    import socket
+
+    request = json.dumps({"argv": argv, "cwd": os.getcwd()}).encode("utf-8") + b"\n"
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.settimeout(None)
+        except OSError:
+            # stale socket file or a server that is shutting down
+            return None
+        try:
+            sock.sendall(request)
+            with sock.makefile("rb") as f:
+                response = json.loads(f.readline())
+        except (OSError, ValueError) as exc:
+            # the command may have run; running it again could apply it twice
+            print(f"Error: lost connection to speckit server: {exc}", file=sys.stderr)
+            return 1
+    finally:
+        sock.close()
+
+    if response.get("rc") is None:
+        return None
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    return response["rc"]
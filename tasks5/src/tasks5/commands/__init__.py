@@ -1,3 +1,38 @@
-"""Commands package for tasks5 CLI"""
+"""Commands package for tasks5 CLI
 
-from . import add, list, search  # imported for side-effect of registering parsers
+Each command lives in its own module exposing `configure_parser` and
+`run`. `COMMANDS` lists them with their help text so the top-level parser
+can be built without importing any of them; a module is imported only
+when its command is selected (or a full parser is needed).
+"""
+from __future__ import annotations
+
+from importlib import import_module
+from typing import NamedTuple
+
+
+class Command(NamedTuple):
+    module: str
+    help: str
+
+
+# in the order shown by --help; `configure_parser` of the module registers
+# the subparser with the same help text
+COMMANDS = {
+    "add": Command("add", "Add a new task"),
+    "import": Command("import_", "Import tasks from a file or stdin"),
+    "export": Command("export", "Export tasks as NDJSON, JSON or CSV"),
+    "list": Command("list", "List tasks"),
+    "search": Command("search", "Search tasks"),
+    "archive": Command("archive", "Move old completed tasks to the compressed archive"),
+    "migrate": Command("migrate", "Copy a tasks.json file into the SQLite --data-file"),
+    "snapshot": Command("snapshot", "Import or export the binary snapshot"),
+    "serve": Command("serve", "Keep tasks in memory and answer other speckit commands over a socket"),
+    "shell": Command("shell", "Run commands interactively against one loaded storage"),
+    "batch": Command("shell", "Run commands read from a file or stdin, one per line"),
+}
+
+
+def load(name: str):
+    """Import and return the module implementing command `name`."""
+    return import_module(f"{__name__}.{COMMANDS[name].module}")
@@ -16,6 +16,13 @@ def configure_parser(subparsers: argparse._SubParsersAction):
     p.set_defaults(func=run)
 
 
+def _taken(storage, id: str) -> bool:
+    if storage.get_task_by_id(id) is not None:
+        return True
+    archived_ids = getattr(storage, "archived_ids", None)  # archived ids are not reused either
+    return archived_ids is not None and id in archived_ids()
+
+
 def run(args, ctx) -> int:
     tags = [t.strip() for t in args.tags.split(",") if t.strip()] if args.tags else []
     try:
@@ -30,6 +37,9 @@ def run(args, ctx) -> int:
         return 0
 
     try:
+        if args.id is not None and _taken(ctx.storage, args.id):
+            print(f"Invalid input: a task with id {args.id!r} already exists")
+            return 2
         ctx.storage.add_task(task)
     except Exception as exc:
         print(f"Could not save task: {exc}")
@@ -0,0 +1,39 @@
+"""Archive command for speckit CLI"""
+from __future__ import annotations
+
+import argparse
+from datetime import timedelta
+
+DEFAULT_DAYS = 30
+
+
+def configure_parser(subparsers: argparse._SubParsersAction):
+    p = subparsers.add_parser("archive", help="Move old completed tasks to the compressed archive")
+    p.add_argument("--older-than", type=days, default=DEFAULT_DAYS, metavar="DAYS",
+                   help=f"Archive completed tasks created more than DAYS days ago (default {DEFAULT_DAYS})")
+    p.set_defaults(func=run)
+
+
+def days(value: str) -> float:
+    try:
+        parsed = float(value)
+    except ValueError:
+        parsed = -1
+    if parsed < 0:
+        raise argparse.ArgumentTypeError(f"invalid number of days: {value!r}")
+    return parsed
+
+
+def run(args, ctx) -> int:
+    archive_completed = getattr(ctx.storage, "archive_completed", None)
+    if archive_completed is None:
+        print("Archiving is not supported by this storage backend")
+        return 2
+    try:
+        count = archive_completed(timedelta(days=args.older_than))
+    except Exception as exc:
+        print(f"Could not archive tasks: {exc}")
+        return 3
+
+    print(f"Archived {count} tasks")
+    return 0
@@ -0,0 +1,122 @@
+"""Export command for speckit CLI
+
+Streams the selected tasks as NDJSON, JSON or CSV to stdout or a file, one
+record at a time through a buffered writer, optionally compressed.
+"""
+from __future__ import annotations
+
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import sys
+from contextlib import ExitStack
+from typing import IO, Iterable
+
+from .import_ import FORMATS, infer_format
+from .list import add_filter_arguments, select_tasks
+from .output import write_json
+
+
+COMPRESSION = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz"}
+CSV_FIELDS = ("id", "description", "created", "completed", "tags")
+BUFFER_SIZE = 1 << 16
+
+
+def configure_parser(subparsers: argparse._SubParsersAction):
+    p = subparsers.add_parser("export", help="Export tasks as NDJSON, JSON or CSV")
+    add_filter_arguments(p)
+    p.add_argument("--output", "-o", default="-", help="File to write, or - for stdout (default)")
+    p.add_argument("--format", "-f", choices=FORMATS, default=None,
+                   help="Output format (default: from the output extension, else ndjson)")
+    p.add_argument("--compress", choices=tuple(COMPRESSION), default=None,
+                   help="Compress the output (default: from a .gz/.bz2/.xz output extension)")
+    p.set_defaults(func=run)
+
+
+def _split_compression(path: str):
+    """`(compression, path without the compression suffix)` for an output name."""
+    root, ext = os.path.splitext(path)
+    for name, suffix in COMPRESSION.items():
+        if ext.lower() == suffix:
+            return name, root
+    return None, path
+
+
+def _compressed(raw: IO[bytes], compress: str | None) -> IO[bytes]:
+    if compress == "gzip":
+        # level 6 like the gzip tool; the module default of 9 is much slower
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+    if compress == "bz2":
+        return bz2.BZ2File(raw, "wb")
+    if compress == "xz":
+        return lzma.LZMAFile(raw, "wb")
+    return raw
+
+
+def write_ndjson(records: Iterable[dict], out: IO[str]) -> int:
+    n = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+        n += 1
+    return n
+
+
+def write_csv(records: Iterable[dict], out: IO[str]) -> int:
+    # tags are joined with commas and completed is true/false, which is what
+    # `import` reads back
+    writer = csv.writer(out)
+    writer.writerow(CSV_FIELDS)
+    n = 0
+    for r in records:
+        writer.writerow((r["id"], r["description"], r["created"],
+                         "true" if r["completed"] else "false", ",".join(r["tags"])))
+        n += 1
+    return n
+
+
+WRITERS = {"ndjson": write_ndjson, "json": write_json, "csv": write_csv}
+
+
+def run(args, ctx) -> int:
+    inferred, base = _split_compression(args.output)
+    compress = args.compress or inferred
+    fmt = args.format or (infer_format(base) if args.output != "-" else "ndjson")
+
+    with ExitStack() as stack:
+        if args.output == "-":
+            sys.stdout.flush()
+            raw = sys.stdout.buffer
+        else:
+            try:
+                raw = stack.enter_context(open(args.output, "wb", buffering=BUFFER_SIZE))
+            except OSError as exc:
+                print(f"Could not open {args.output}: {exc}")
+                return 2
+        stream = _compressed(raw, compress)
+        if stream is not raw:
+            stack.enter_context(stream)
+        out = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        try:
+            count = WRITERS[fmt]((t.to_dict() for t in select_tasks(args, ctx.storage, stream=True)), out)
+            out.flush()
+        except BrokenPipeError:
+            # the reader went away (e.g. `| head`); stop quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 0
+        except Exception as exc:
+            print(f"Could not export tasks: {exc}", file=sys.stderr)
+            return 3
+        finally:
+            # leave the underlying file (or stdout) to its own owner
+            out.detach()
+    if args.output == "-":
+        raw.flush()
+    else:
+        print(f"Exported {count} tasks to {args.output}")
+    return 0
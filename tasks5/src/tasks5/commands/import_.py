@@ -0,0 +1,164 @@
+"""Import command for speckit CLI
+
+Reads tasks from an NDJSON, CSV or JSON file (or stdin) one record at a
+time and adds them all with a single storage write.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+from ..jsonscan import ScanError, iter_task_objects
+from ..models import Task, parse_timestamp
+
+
+FORMATS = ("ndjson", "csv", "json")
+_EXTENSIONS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv", ".json": "json"}
+PROGRESS_EVERY = 100000
+
+
+def configure_parser(subparsers: argparse._SubParsersAction):
+    p = subparsers.add_parser("import", help="Import tasks from a file or stdin")
+    p.add_argument("source", nargs="?", default="-", help="File to read, or - for stdin (default)")
+    p.add_argument("--format", "-f", choices=FORMATS, default=None,
+                   help="Input format (default: from the file extension, else ndjson)")
+    p.add_argument("--skip-invalid", action="store_true", help="Skip invalid records instead of aborting")
+    p.add_argument("--quiet", "-q", action="store_true", help="Do not report progress")
+    p.set_defaults(func=run)
+
+
+def infer_format(source: str) -> str:
+    """Record format for a file name, by extension (ndjson when unknown)."""
+    return _EXTENSIONS.get(os.path.splitext(source)[1].lower(), "ndjson")
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def _read_ndjson(f) -> Iterator[Tuple[str, Any]]:
+    # lines are decoded in `to_task` so a malformed one can be skipped
+    for lineno, line in enumerate(f, 1):
+        if line.strip():
+            yield f"line {lineno}", line
+
+
+def _read_csv(f) -> Iterator[Tuple[str, Any]]:
+    reader = csv.DictReader(f)
+    if reader.fieldnames is None or "description" not in reader.fieldnames:
+        raise InvalidRecord("CSV input needs a header row with a description column")
+    for row in reader:
+        yield f"line {reader.line_num}", row
+
+
+def _read_json(f) -> Iterator[Tuple[str, Any]]:
+    # accepts a tasks.json document or a bare array of task objects
+    try:
+        for n, obj in enumerate(iter_task_objects(f, allow_array=True), 1):
+            yield f"#{n}", obj
+    except ScanError as exc:
+        raise InvalidRecord(str(exc))
+
+
+_READERS = {"ndjson": _read_ndjson, "csv": _read_csv, "json": _read_json}
+
+
+def _flag(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    text = str(value).strip().lower()
+    if text in ("", "0", "false", "no", "n"):
+        return False
+    if text in ("1", "true", "yes", "y", "x"):
+        return True
+    raise ValueError(f"invalid completed value: {value!r}")
+
+
+def to_task(record: Dict[str, Any] | str) -> Task:
+    """Validate one input record (a mapping or an NDJSON line) and turn it into a Task."""
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    tags = record.get("tags") or []
+    if isinstance(tags, str):
+        tags = [t.strip() for t in tags.split(",") if t.strip()]
+    elif not isinstance(tags, list):
+        raise ValueError("tags must be a list or a comma-separated string")
+    id = record.get("id") or None
+    created = record.get("created") or None
+    if created is not None:
+        parse_timestamp(str(created))
+    task = Task.create(
+        description=str(record.get("description") or ""),
+        tags=tags,
+        id=str(id) if id is not None else None,
+        created=str(created) if created is not None else None,
+    )
+    task.completed = _flag(record.get("completed"))
+    return task
+
+
+def run(args, ctx) -> int:
+    fmt = args.format or infer_format(args.source)
+    progress = not args.quiet
+
+    storage = ctx.storage
+    try:
+        seen = {t.id for t in storage.load()}
+        archived_ids = getattr(storage, "archived_ids", None)
+        if archived_ids is not None:
+            seen |= archived_ids()  # so an archived task is not imported back
+    except Exception as exc:
+        print(f"Could not read existing tasks: {exc}")
+        return 3
+
+    added = []
+    duplicates = invalid = read = 0
+    try:
+        f = sys.stdin if args.source == "-" else open(args.source, "r", encoding="utf-8", newline="")
+    except OSError as exc:
+        print(f"Could not open {args.source}: {exc}")
+        return 2
+    try:
+        for where, record in _READERS[fmt](f):
+            read += 1
+            if progress and read % PROGRESS_EVERY == 0:
+                print(f"read {read} records", file=sys.stderr)
+            try:
+                task = to_task(record)
+            except ValueError as exc:
+                if not args.skip_invalid:
+                    print(f"Invalid record {where}: {exc}")
+                    return 2
+                invalid += 1
+                continue
+            if task.id in seen:
+                duplicates += 1
+                continue
+            seen.add(task.id)
+            added.append(task)
+    except InvalidRecord as exc:
+        print(f"Invalid input: {exc}")
+        return 2
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+    if added:
+        if progress:
+            print(f"writing {len(added)} tasks", file=sys.stderr)
+        try:
+            storage.add_tasks(added, defer_indexes=True)
+        except Exception as exc:
+            print(f"Could not save tasks: {exc}")
+            return 3
+
+    print(f"Imported {len(added)} tasks ({duplicates} duplicates skipped, {invalid} invalid skipped)")
+    return 0
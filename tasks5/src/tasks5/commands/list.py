@@ -2,56 +2,152 @@
 from __future__ import annotations
 
 import argparse
-import json
-from typing import List
+from itertools import chain
+from typing import Iterable, List
 
-from ..storage import Storage
+from ..models import parse_timestamp
+from ..parallel import parallel_filter
+from .output import print_json
 
 
 def configure_parser(subparsers: argparse._SubParsersAction):
     p = subparsers.add_parser("list", help="List tasks")
+    add_filter_arguments(p)
+    p.add_argument("--json", action="store_true", help="Output JSON")
+    p.set_defaults(func=run)
+
+
+def add_filter_arguments(p: argparse.ArgumentParser) -> None:
+    """Register the task filters shared by `list` and `export`."""
     p.add_argument("--tag", "-t", help="Filter by tag", default=None)
     p.add_argument("--completed", action="store_true", help="Show only completed tasks")
     p.add_argument("--incomplete", action="store_true", help="Show only incomplete tasks")
-    p.add_argument("--json", action="store_true", help="Output JSON")
-    p.set_defaults(func=run)
+    p.add_argument("--all", action="store_true", help="Include archived tasks (implied by --completed)")
+    p.add_argument("--since", type=_timestamp, default=None, help="Show tasks created on or after DATE (ISO 8601)")
+    p.add_argument("--until", type=_timestamp, default=None, help="Show tasks created before DATE (ISO 8601)")
+    p.add_argument("--jobs", "-j", type=int, default=1, help="Filter in N worker processes instead of using indexes")
 
 
-def _filter_tasks(tasks: List, tag: str | None, completed_only: bool | None):
-    out = tasks
-    if tag:
-        out = [t for t in out if tag in t.tags]
-    if completed_only is True:
-        out = [t for t in out if t.completed]
-    if completed_only is False:
-        out = [t for t in out if not t.completed]
-    return out
+def _timestamp(value: str):
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {value!r}")
 
 
-def run(args, ctx) -> int:
+def _created_in(task, since, until) -> bool:
     try:
-        tasks = ctx.storage.load()
-    except Exception as exc:
-        print(f"Could not load tasks: {exc}")
-        return 3
+        created = parse_timestamp(task.created)
+    except ValueError:
+        return False
+    return (since is None or created >= since) and (until is None or created < until)
+
+
+def _keep(task, tag: str | None, completed_only: bool | None, since=None, until=None) -> bool:
+    if tag and tag not in task.tags:
+        return False
+    if completed_only is not None and task.completed != completed_only:
+        return False
+    if (since is not None or until is not None) and not _created_in(task, since, until):
+        return False
+    return True
+
+
+def _filter_tasks(tasks: List, tag: str | None, completed_only: bool | None, jobs: int = 1, since=None, until=None):
+    return parallel_filter(tasks, _keep, (tag, completed_only, since, until), jobs)
 
+
+def _filter_table(storage, tag: str | None, completed_only: bool | None, since, until) -> List | None:
+    """Filter through the storage's cached `TaskTable`; None when there is none to use.
+
+    Building the table parses every timestamp, which costs several times a
+    plain pass over the tasks, so only long-lived processes (which keep the
+    table across commands, and extend it as tasks are added) use it. There
+    a current table answers every filter; date filters, which parse the
+    timestamps anyway, also build it when it is missing or stale.
+    """
+    if getattr(storage, "table", None) is None or not getattr(storage, "cache_writes", False):
+        return None
+    # numpy costs tens of milliseconds to import; only pay it when used
+    from .. import table
+
+    if not table.available():
+        return None
+    cached = storage.table(build=since is not None or until is not None)
+    if cached is None:
+        return None
+    tasks, tt = cached
+    return [tasks[i] for i in table.np.flatnonzero(tt.mask(tag, completed_only, since, until))]
+
+
+def select_tasks(args, storage, stream: bool = False) -> Iterable:
+    """Tasks of `storage` matching the filters registered by `add_filter_arguments`.
+
+    With `stream`, filters are applied to `iter_tasks()` rather than answered
+    from indexes, so memory stays flat however many tasks match. Archived
+    tasks are included, ahead of the others, only with `--all` or
+    `--completed`.
+    """
     completed_only = None
     if getattr(args, "completed", False):
         completed_only = True
     if getattr(args, "incomplete", False):
         completed_only = False
+    tag = getattr(args, "tag", None)
+    since = getattr(args, "since", None)
+    until = getattr(args, "until", None)
+    tasks = _select_hot(storage, tag, completed_only, since, until, getattr(args, "jobs", 1), stream)
+
+    iter_archived = getattr(storage, "iter_archived", None)
+    if iter_archived is not None and completed_only is not False and (getattr(args, "all", False) or completed_only):
+        # everything archived is completed and older than what stays, so it
+        # goes first; the generator does not open the archive until iterated
+        archived = (t for t in iter_archived() if _keep(t, tag, completed_only, since, until))
+        return chain(archived, tasks)
+    return tasks
+
 
-    tasks = _filter_tasks(tasks, getattr(args, "tag", None), completed_only)
+def _select_hot(storage, tag, completed_only, since, until, jobs: int, stream: bool) -> Iterable:
+    # Storage backends answer filters from their indexes through `query`;
+    # plain scans stream tasks so memory stays flat on large files.
+    query = getattr(storage, "query", None)
+    iter_tasks = getattr(storage, "iter_tasks", None)
+    scan = getattr(storage, "scan", None)
+    candidates = getattr(storage, "candidates", None)
+    if jobs > 1 and scan is not None:
+        # sharded storage filters each shard in a worker of its own
+        return scan(_keep, (tag, completed_only, since, until), jobs)
+    if jobs <= 1 and not stream and (tag or completed_only is not None or since is not None or until is not None):
+        # a cached table answers filters with column masks, without parsing timestamps again
+        tasks = _filter_table(storage, tag, completed_only, since, until)
+        if tasks is not None:
+            return tasks
+    if candidates is not None and jobs <= 1 and (stream or since is not None or until is not None):
+        # segmented storage skips the months whose zone maps rule them out
+        return (t for t in candidates(tag, completed_only, since, until) if _keep(t, tag, completed_only, since, until))
+    if jobs > 1 or query is None:
+        return _filter_tasks(storage.load(), tag, completed_only, jobs, since, until)
+    if iter_tasks is not None and (stream or (tag is None and completed_only is None)):
+        return (t for t in iter_tasks() if _keep(t, tag, completed_only, since, until))
+    return (t for t in query(tag=tag, completed=completed_only) if _keep(t, None, None, since, until))
 
-    if getattr(args, "json", False):
-        print(json.dumps([t.to_dict() for t in tasks], ensure_ascii=False, indent=2))
-        return 0
 
-    # Simple table-like print
-    print("ID  CREATED               C  DESCRIPTION")
-    for t in tasks:
-        created_short = t.created.split("T")[0]
-        flag = "✓" if t.completed else " "
-        print(f"{t.id[:8]}  {created_short}    {flag}  {t.description}")
+def run(args, ctx) -> int:
+    try:
+        tasks = select_tasks(args, ctx.storage)
+
+        if getattr(args, "json", False):
+            print_json(t.to_dict() for t in tasks)
+            return 0
+
+        # Simple table-like print
+        print("ID  CREATED               C  DESCRIPTION")
+        for t in tasks:
+            created_short = t.created.split("T")[0]
+            flag = "✓" if t.completed else " "
+            print(f"{t.id[:8]}  {created_short}    {flag}  {t.description}")
+    except Exception as exc:
+        print(f"Could not load tasks: {exc}")
+        return 3
 
     return 0
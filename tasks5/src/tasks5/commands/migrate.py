@@ -0,0 +1,32 @@
+"""Migrate command for speckit CLI"""
+from __future__ import annotations
+
+import argparse
+import os
+
+from ..sqlite_storage import SqliteStorage, migrate_json
+
+
+def configure_parser(subparsers: argparse._SubParsersAction):
+    p = subparsers.add_parser("migrate", help="Copy a tasks.json file into the SQLite --data-file")
+    p.add_argument("source", help="Path to the tasks.json file to migrate")
+    p.set_defaults(func=run)
+
+
+def run(args, ctx) -> int:
+    if not isinstance(ctx.storage, SqliteStorage):
+        print("Migrate target must be an SQLite data file (use a .db path or --backend sqlite)")
+        return 2
+    if not os.path.exists(args.source):
+        print(f"Source file not found: {args.source}")
+        return 2
+
+    ctx.storage.close()
+    try:
+        count = migrate_json(args.source, ctx.storage.path)
+    except Exception as exc:
+        print(f"Could not migrate tasks: {exc}")
+        return 3
+
+    print(f"Migrated {count} tasks from {args.source} to {ctx.storage.path}")
+    return 0
@@ -0,0 +1,29 @@
+"""Output helpers shared by the speckit commands"""
+from __future__ import annotations
+
+import json
+import sys
+from typing import Any, Dict, Iterable, TextIO
+
+
+def write_json(records: Iterable[Dict[str, Any]], out: TextIO) -> int:
+    """Write records to `out` as an indented JSON array, one record at a time.
+
+    The output is identical to `json.dumps(list(records), indent=2)` plus a
+    newline, but the records are never collected into one list or string.
+    Returns the number of records written.
+    """
+    n = 0
+    sep = "[\n"
+    for record in records:
+        body = json.dumps(record, ensure_ascii=False, indent=2)
+        out.write(sep + "  " + body.replace("\n", "\n  "))
+        sep = ",\n"
+        n += 1
+    out.write("[]\n" if sep == "[\n" else "\n]\n")
+    return n
+
+
+def print_json(records: Iterable[Dict[str, Any]]) -> None:
+    """Print records as an indented JSON array, see `write_json`."""
+    write_json(records, sys.stdout)
@@ -3,9 +3,12 @@ from __future__ import annotations
 
 import argparse
 import json
+from itertools import islice
 from typing import List
 
 from ..models import Task
+from ..parallel import parallel_filter
+from .output import print_json
 
 
 def configure_parser(subparsers: argparse._SubParsersAction):
@@ -13,10 +16,24 @@ def configure_parser(subparsers: argparse._SubParsersAction):
     p.add_argument("query", help="Search query")
     p.add_argument("--ignore-case", action="store_true", help="Case-insensitive search")
     p.add_argument("--field", choices=["description", "tags"], default="description", help="Field to search")
+    p.add_argument("--rank", action="store_true", help="Rank matches by relevance (BM25 over descriptions and tags)")
+    p.add_argument("--all-terms", action="store_true", help="With --rank, require every query term to match")
+    p.add_argument("--limit", type=_positive, default=None, help="Show at most N results")
+    p.add_argument("--jobs", "-j", type=int, default=1, help="Match in N worker processes")
     p.add_argument("--json", action="store_true", help="Output JSON")
     p.set_defaults(func=run)
 
 
+def _positive(value: str) -> int:
+    try:
+        parsed = int(value)
+    except ValueError:
+        parsed = 0
+    if parsed < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive number: {value!r}")
+    return parsed
+
+
 def _matches(task: Task, query: str, field: str, ignore_case: bool) -> bool:
     q = query.lower() if ignore_case else query
     if field == "description":
@@ -28,20 +45,69 @@ def _matches(task: Task, query: str, field: str, ignore_case: bool) -> bool:
     return False
 
 
-def run(args, ctx) -> int:
+def _run_ranked(args, ctx) -> int:
+    rank = getattr(ctx.storage, "rank", None)
+    if rank is None:
+        print("Ranked search is not supported by this storage backend")
+        return 2
     try:
-        tasks = ctx.storage.load()
+        results = rank(args.query, limit=getattr(args, "limit", None), match_all=getattr(args, "all_terms", False))
     except Exception as exc:
         print(f"Could not load tasks: {exc}")
         return 3
 
-    matches = [t for t in tasks if _matches(t, args.query, args.field, getattr(args, "ignore_case", False))]
-
     if getattr(args, "json", False):
-        print(json.dumps([t.to_dict() for t in matches], ensure_ascii=False, indent=2))
+        print(json.dumps([dict(t.to_dict(), score=round(score, 6)) for t, score in results], ensure_ascii=False, indent=2))
         return 0
 
-    for t in matches:
-        print(f"{t.id[:8]}: {t.description}")
+    for t, score in results:
+        print(f"{t.id[:8]}: {t.description}  ({score:.3f})")
+
+    return 0
+
+
+def run(args, ctx) -> int:
+    if getattr(args, "rank", False):
+        return _run_ranked(args, ctx)
+
+    ignore_case = getattr(args, "ignore_case", False)
+    jobs = getattr(args, "jobs", 1)
+    limit = getattr(args, "limit", None)
+    find_by_tag = getattr(ctx.storage, "find_by_tag", None)
+    description_candidates = getattr(ctx.storage, "description_candidates", None)
+    try:
+        tasks = None
+        if args.field == "tags" and find_by_tag is not None:
+            # the tag index answers exact (or case-folded) tag matches directly
+            tasks = find_by_tag(args.query, ignore_case=ignore_case)
+        elif args.field == "description" and description_candidates is not None:
+            # the trigram index narrows candidates; _matches below verifies them
+            tasks = description_candidates(args.query)
+        predicate_args = (args.query, args.field, ignore_case)
+        scan = getattr(ctx.storage, "scan", None)
+        if tasks is None and jobs > 1 and scan is not None:
+            # sharded storage filters each shard in a worker of its own
+            tasks = scan(_matches, predicate_args, jobs)
+            jobs = 1
+        if tasks is None:
+            iter_tasks = getattr(ctx.storage, "iter_tasks", None)
+            tasks = iter_tasks() if iter_tasks is not None and jobs <= 1 else ctx.storage.load()
+
+        if jobs > 1:
+            matches = iter(parallel_filter(list(tasks), _matches, predicate_args, jobs))
+        else:
+            matches = (t for t in tasks if _matches(t, *predicate_args))
+        if limit is not None:
+            matches = islice(matches, limit)
+
+        if getattr(args, "json", False):
+            print_json(t.to_dict() for t in matches)
+            return 0
+
+        for t in matches:
+            print(f"{t.id[:8]}: {t.description}")
+    except Exception as exc:
+        print(f"Could not load tasks: {exc}")
+        return 3
 
     return 0
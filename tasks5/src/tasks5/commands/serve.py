@@ -0,0 +1,37 @@
+"""Serve command for speckit CLI"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import timedelta
+
+from .archive import days
+
+
+def configure_parser(subparsers: argparse._SubParsersAction):
+    p = subparsers.add_parser("serve", help="Keep tasks in memory and answer other speckit commands over a socket")
+    p.add_argument("--archive-after", type=days, default=None, metavar="DAYS",
+                   help="Every hour, archive completed tasks created more than DAYS days ago")
+    p.set_defaults(func=run)
+
+
+def run(args, ctx) -> int:
+    from ..daemon import Server
+
+    # the daemon serves many loads from one process, so keep its own
+    # writes cached instead of re-reading them
+    ctx.storage.cache_writes = True
+    archive_after = None
+    if getattr(args, "archive_after", None) is not None:
+        if getattr(ctx.storage, "archive_completed", None) is None:
+            print("Archiving is not supported by this storage backend")
+            return 2
+        archive_after = timedelta(days=args.archive_after)
+    server = Server(args, ctx.storage, archive_after=archive_after)
+    try:
+        print(f"Serving {args.data_file} on {server.path} (Ctrl-C to stop)", flush=True)
+        asyncio.run(server.run())
+    except (OSError, RuntimeError) as exc:
+        print(f"Could not start server: {exc}")
+        return 2
+    return 0
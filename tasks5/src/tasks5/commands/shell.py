@@ -0,0 +1,144 @@
+"""Shell and batch commands for speckit CLI
+
+Both run many subcommands against one storage: tasks loaded by one command
+stay cached for the next, and added tasks are held in memory until a
+`commit` line or the end of the session writes them in a single save.
+"""
+from __future__ import annotations
+
+import argparse
+import shlex
+import sys
+import time
+import traceback
+from types import SimpleNamespace
+from typing import Iterator
+
+from ..storage import BufferedStorage
+
+
+PROMPT = "speckit> "
+# commands that would start a session of their own
+NOT_IN_SESSION = ("shell", "batch", "serve")
+SESSION_HELP = "Session commands: commit (write pending tasks), help, exit/quit"
+
+
+def configure_parser(subparsers: argparse._SubParsersAction):
+    p = subparsers.add_parser("shell", help="Run commands interactively against one loaded storage")
+    p.set_defaults(func=run)
+    p = subparsers.add_parser("batch", help="Run commands read from a file or stdin, one per line")
+    p.add_argument("source", nargs="?", default="-", help="File with one command per line, or - for stdin (default)")
+    p.add_argument("--keep-going", "-k", action="store_true", help="Continue after a failing command")
+    p.set_defaults(func=run)
+
+
+def _interactive_lines() -> Iterator[str]:
+    try:
+        import readline  # noqa: F401  (line editing and history for input())
+    except ImportError:
+        pass
+    while True:
+        try:
+            yield input(PROMPT)
+        except KeyboardInterrupt:
+            print()
+        except EOFError:
+            print()
+            return
+
+
+class Session:
+    """Parses and dispatches command lines against one buffered storage."""
+
+    def __init__(self, ctx) -> None:
+        from ..cli import build_parser
+
+        self.parser = build_parser()
+        ctx.storage.cache_writes = True  # commits reuse what the last one wrote
+        self.storage = BufferedStorage(ctx.storage)
+        self.debug = ctx.debug
+        self.ctx = SimpleNamespace(data_file=ctx.data_file, debug=ctx.debug, storage=self.storage)
+        self.done = False
+
+    def commit(self) -> int:
+        try:
+            count = self.storage.commit()
+        except Exception as exc:
+            print(f"Could not save tasks: {exc}")
+            return 3
+        print(f"Committed {count} tasks")
+        return 0
+
+    def execute(self, line: str) -> int:
+        """Run one command line; returns its exit code."""
+        from ..cli import dispatch
+
+        try:
+            argv = shlex.split(line, comments=True)
+        except ValueError as exc:
+            print(f"Invalid command line: {exc}")
+            return 2
+        if not argv:
+            return 0
+        name = argv[0]
+        if name in ("exit", "quit"):
+            self.done = True
+            return 0
+        if name == "help":
+            self.parser.print_help()
+            print(SESSION_HELP)
+            return 0
+        if name in NOT_IN_SESSION:
+            print(f"{name} cannot be run inside a session")
+            return 2
+
+        started = time.perf_counter()
+        try:
+            if name == "commit":
+                rc = self.commit()
+            else:
+                try:
+                    args = self.parser.parse_args(argv)
+                except SystemExit as exc:  # usage error, already reported
+                    return exc.code if isinstance(exc.code, int) else 2
+                rc = dispatch(args, self.ctx, self.parser)
+        except Exception:
+            # dispatch only lets errors through in debug mode
+            traceback.print_exc()
+            rc = 1
+        if self.debug:
+            print(f"[{name}: {(time.perf_counter() - started) * 1000:.1f} ms, rc={rc}]", file=sys.stderr)
+        return rc
+
+
+def run(args, ctx) -> int:
+    session = Session(ctx)
+    batch = args.command == "batch"
+    if not batch:
+        lines = _interactive_lines() if sys.stdin.isatty() else iter(sys.stdin)
+    elif args.source == "-":
+        lines = iter(sys.stdin)
+    else:
+        try:
+            with open(args.source, "r", encoding="utf-8") as f:
+                lines = iter(f.read().splitlines())
+        except OSError as exc:
+            print(f"Could not open {args.source}: {exc}")
+            return 2
+
+    rc = 0
+    for n, line in enumerate(lines, 1):
+        line_rc = session.execute(line)
+        if line_rc != 0 and batch:
+            rc = line_rc
+            if not args.keep_going:
+                print(f"Stopped at line {n}: {line.strip()}", file=sys.stderr)
+                break
+        if session.done:
+            break
+
+    # whatever is still pending is written on the way out
+    if session.storage.pending:
+        commit_rc = session.commit()
+        rc = rc or commit_rc
+    return rc
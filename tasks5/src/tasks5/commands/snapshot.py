@@ -0,0 +1,54 @@
+"""Snapshot command for speckit CLI: convert between JSON and the binary snapshot"""
+from __future__ import annotations
+
+import argparse
+import os
+
+from ..binary import BinarySnapshot
+from ..storage import Storage
+
+
+def configure_parser(subparsers: argparse._SubParsersAction):
+    p = subparsers.add_parser("snapshot", help="Import or export the binary snapshot")
+    actions = p.add_subparsers(dest="action", required=True)
+    imp = actions.add_parser("import", help="Build <data-file>.bin from a JSON tasks file")
+    imp.add_argument("source", nargs="?", default=None, help="JSON tasks file (default: the data file)")
+    exp = actions.add_parser("export", help="Write the tasks in <data-file>.bin as a JSON tasks file")
+    exp.add_argument("output", help="Path of the JSON file to write")
+    p.set_defaults(func=run)
+
+
+def run(args, ctx) -> int:
+    if not isinstance(ctx.storage, Storage):
+        print("Binary snapshots are only available for JSON data files")
+        return 2
+    binary_path = f"{ctx.storage.path}.bin"
+
+    if args.action == "import":
+        target = Storage(ctx.storage.path, binary=True)
+        try:
+            if args.source:
+                # importing another file replaces the data file as well
+                tasks = Storage(args.source).load()
+                target.save(tasks)
+            else:
+                tasks = target.load()
+                target.write_binary(tasks)
+        except Exception as exc:
+            print(f"Could not build snapshot: {exc}")
+            return 3
+        print(f"Wrote {len(tasks)} tasks to {binary_path}")
+        return 0
+
+    if not os.path.exists(binary_path):
+        print(f"Snapshot not found: {binary_path}")
+        return 2
+    try:
+        with BinarySnapshot(binary_path) as snapshot:
+            tasks = list(snapshot.iter_tasks())
+        Storage(args.output).save(tasks)
+    except Exception as exc:
+        print(f"Could not export snapshot: {exc}")
+        return 3
+    print(f"Exported {len(tasks)} tasks to {args.output}")
+    return 0
@@ -0,0 +1,259 @@
+"""`speckit serve`: one long-running process answering CLI commands.
+
+The server keeps a single storage object open, so parsed tasks (the load
+cache) and sidecar indexes stay in memory between commands, and listens on
+a Unix domain socket next to the data file (`<data file>.sock`).
+
+The protocol is one JSON line each way. A client sends
+`{"argv": [...], "cwd": "..."}` with its unchanged command line; the server
+parses and runs it against its storage and answers
+`{"rc": int, "stdout": str, "stderr": str}`. `"rc": null` means the server
+declines (another data file or storage options), and the client runs the
+command itself.
+
+Connections are handled concurrently on an asyncio event loop; commands run
+one at a time on a worker thread so they see a consistent task set, and all
+writes go through the usual storage layer (and its file lock), so processes
+not talking to the server stay safe.
+
+With `--durability batch` adds from concurrent clients share a write and
+its fsync (`GroupCommitter`): an `add` waits for its group commit on its own
+worker thread without holding the server's lock, so that other commands
+(and other adds) run meanwhile, and answers once the write is durable.
+Clients asking for "always" are served by such a server, since every add is
+still durable before it is acknowledged.
+
+With `archive_after` the server also moves old completed tasks to the
+archive (`Storage.archive_completed`) at start-up and then every
+`maintenance_interval` seconds, on the same worker thread between commands.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from .client import FORWARDED, socket_path
+
+
+class _Output(io.TextIOBase):
+    """Stand-in for sys.stdout or sys.stderr that sends each thread's writes to its own buffer."""
+
+    def __init__(self, stream) -> None:
+        self.stream = stream
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        return (getattr(self._local, "buffer", None) or self.stream).write(text)
+
+    def flush(self) -> None:
+        (getattr(self._local, "buffer", None) or self.stream).flush()
+
+    def capture(self, buffer: Optional[io.StringIO]) -> None:
+        self._local.buffer = buffer
+
+
+class _GroupCommitted:
+    """The storage as commands see it on a batching server.
+
+    `add_task` waits for the group commit without holding the server's lock,
+    so that adds from other clients join the same write; until it is done
+    the task's id counts as taken.
+    """
+
+    def __init__(self, server: "Server") -> None:
+        self._server = server
+
+    def __getattr__(self, name: str):
+        return getattr(self._server.storage, name)
+
+    def get_task_by_id(self, id: str):
+        pending = self._server.pending.get(id)
+        return pending if pending is not None else self._server.storage.get_task_by_id(id)
+
+    def add_task(self, task) -> None:
+        server = self._server
+        server.pending.setdefault(task.id, task)
+        server.lock.release()
+        try:
+            server.committer.add(task)
+        finally:
+            server.lock.acquire()
+            if server.pending.get(task.id) is task:
+                del server.pending[task.id]
+
+
+class Server:
+    """Serve commands for one data file over a Unix domain socket."""
+
+    maintenance_interval = 3600.0
+    # worker threads of a batching server: adds waiting on one group commit
+    batch_workers = 8
+
+    def __init__(self, args, storage, path: Optional[str] = None, archive_after: Optional[timedelta] = None) -> None:
+        from .cli import build_parser
+
+        self.data_path = os.path.abspath(args.data_file)
+        self.batched = args.durability == "batch"
+        self.options = self._options(args)
+        self.storage = storage
+        self.path = path or socket_path(args.data_file)
+        self.parser = build_parser()
+        self.requests = 0
+        self.archive_after = archive_after
+        self.archived = 0
+        # held by a command for as long as it uses the storage
+        self.lock = threading.Lock()
+        self.committer = None
+        self.pending: Dict[str, Any] = {}  # id -> task waiting for its group commit
+        if self.batched:
+            from .groupcommit import GroupCommitter
+
+            self.committer = GroupCommitter(self._commit)
+        self._executor = ThreadPoolExecutor(max_workers=self.batch_workers if self.batched else 1)
+        self._outputs = (_Output(None), _Output(None))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self.ready = threading.Event()
+
+    @staticmethod
+    def _options(args) -> tuple:
+        # a batching server still makes every add durable before answering
+        durability = "always" if args.durability == "batch" else args.durability
+        return (args.backend, durability, args.binary_snapshot)
+
+    def _commit(self, tasks) -> None:
+        with self.lock:
+            self.storage.add_tasks(tasks)
+
+    def _locked(self, fn, *args):
+        with self.lock:
+            return fn(*args)
+
+    def execute(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one forwarded command line, capturing its output.
+
+        Runs on a worker thread while `run` is serving.
+        """
+        from .cli import dispatch
+
+        out, err = io.StringIO(), io.StringIO()
+        rc: Optional[int]
+        self._outputs[0].capture(out)
+        self._outputs[1].capture(err)
+        try:
+            with self.lock:
+                try:
+                    args = self.parser.parse_args(request["argv"])
+                except SystemExit as exc:  # --help or a usage error
+                    rc = exc.code if isinstance(exc.code, int) else 2
+                else:
+                    data_path = os.path.abspath(os.path.join(request.get("cwd", ""), args.data_file))
+                    if (args.command not in FORWARDED or data_path != self.data_path
+                            or self._options(args) != self.options):
+                        return {"rc": None}
+                    storage = _GroupCommitted(self) if self.batched else self.storage
+                    ctx = SimpleNamespace(data_file=args.data_file, debug=args.debug, storage=storage)
+                    try:
+                        rc = dispatch(args, ctx, self.parser)
+                    except Exception:
+                        traceback.print_exc()
+                        rc = 1
+                self.requests += 1
+        finally:
+            self._outputs[0].capture(None)
+            self._outputs[1].capture(None)
+        return {"rc": rc, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+    async def _maintain(self) -> None:
+        while True:
+            try:
+                self.archived += await self._loop.run_in_executor(
+                    self._executor, self._locked, self.storage.archive_completed, self.archive_after)
+            except Exception:
+                traceback.print_exc()  # keep serving; the next round retries
+            await asyncio.sleep(self.maintenance_interval)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            line = await reader.readline()
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict) or not isinstance(request.get("argv"), list):
+                    raise ValueError("expected an object with an argv list")
+            except ValueError as exc:
+                response: Dict[str, Any] = {"rc": 2, "stdout": "", "stderr": f"bad request: {exc}\n"}
+            else:
+                response = await asyncio.get_running_loop().run_in_executor(self._executor, self.execute, request)
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def _claim_socket(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.remove(self.path)  # left behind by a server that died
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"a server is already listening on {self.path}")
+
+    async def run(self) -> None:
+        self._claim_socket()
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        # commands print from worker threads; each captures its own output
+        streams = sys.stdout, sys.stderr
+        self._outputs[0].stream, self._outputs[1].stream = streams
+        sys.stdout, sys.stderr = self._outputs
+        try:
+            await self._serve()
+        finally:
+            sys.stdout, sys.stderr = streams
+
+    async def _serve(self) -> None:
+        # warm the cache so the first client does not pay for the load
+        await self._loop.run_in_executor(self._executor, self._locked, self.storage.load)
+        server = await asyncio.start_unix_server(self._handle, path=self.path)
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                self._loop.add_signal_handler(sig, self._stop.set)
+        maintenance = asyncio.ensure_future(self._maintain()) if self.archive_after is not None else None
+        self.ready.set()
+        try:
+            async with server:
+                await self._stop.wait()
+        finally:
+            if maintenance is not None:
+                maintenance.cancel()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self._executor.shutdown(wait=True)
+
+    def stop(self) -> None:
+        """Ask `run` to return; safe to call from any thread."""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
@@ -0,0 +1,59 @@
+"""Group commit: coalesce writes that arrive close together into one.
+
+Callers hand their task to `GroupCommitter.submit` and wait on the returned
+future. The first caller of a window becomes the leader: it waits `window`
+seconds (and for any commit still in progress), takes every task queued so
+far and commits them with a single durable write. Every caller in the
+batch then sees that write's success or failure.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+from .models import Task
+
+
+class GroupCommitter:
+    def __init__(self, commit: Callable[[List[Task]], None], window: float = 0.005) -> None:
+        self._commit = commit
+        self.window = window
+        self._lock = threading.Lock()
+        # held for the duration of a commit so batches never overlap
+        self._commit_lock = threading.Lock()
+        self._pending: List[Tuple[Task, Future]] = []
+        self._leader = False
+        self.commits = 0
+
+    def submit(self, task: Task) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((task, future))
+            lead = not self._leader
+            self._leader = True
+        if lead:
+            self._lead()
+        return future
+
+    def add(self, task: Task) -> None:
+        """Submit `task` and block until its batch is durable."""
+        self.submit(task).result()
+
+    def _lead(self) -> None:
+        if self.window:
+            time.sleep(self.window)
+        with self._commit_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._leader = False
+            try:
+                self._commit([task for task, _ in batch])
+            except BaseException as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+            else:
+                for _, future in batch:
+                    future.set_result(None)
+            self.commits += 1
@@ -0,0 +1,692 @@
+"""Sidecar indexes kept next to a tasks.json file.
+
+An index records the signature (`mtime_ns`, `size`, inode) of the data it
+was built from; when the signature no longer matches (or the index file is
+missing) the index is treated as stale and rebuilt by the storage layer.
+
+On disk a posting index (`TagIndex`, `TrigramIndex`, `TermIndex`) is, like
+the id index, a binary table read through `mmap`: keys sorted for
+bisection, each pointing at its slice of task ordinals, so a query reads
+the postings of its own keys and nothing else. A write that patched the
+index since the last build appends a JSON delta line after the table and
+rewrites the signature in the header in place (`update`); deltas are kept
+in memory as a small overlay on the table and folded in by a rebuild once
+they grow past a sixteenth of it.
+"""
+from __future__ import annotations
+
+import heapq
+import json
+from array import array
+from itertools import accumulate
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .atomic import atomic_write
+from .models import Task
+
+
+Signature = Tuple[int, ...]
+
+ID_MAGIC = b"TSK5IDX\0"
+ID_VERSION = 3
+# magic, version, flags, task count, heap offset, tail offset, then the part
+# that appends rewrite: tail entry count and data signature (mtime_ns, size,
+# inode)
+ID_HEADER = struct.Struct("<8sIIIQQIqqq")
+_ID_STAMP_AT = struct.calcsize("<8sIIIQQ")
+_ID_STAMP = struct.Struct("<Iqqq")
+# appended entry: id length and span, followed by the id
+ID_TAIL = struct.Struct("<IQI")
+# flag: the spans are of tasks laid out by `Storage`'s own writer
+OWN_LAYOUT = 1
+U32 = struct.Struct("<I")
+U64 = struct.Struct("<Q")
+
+POSTING_MAGIC = b"TSK5PST\0"
+POSTING_VERSION = 1
+# magic, version, flags, task count, key count, posting count, summed task
+# lengths, signature of the tasks the table was built from, offsets of the
+# sections (task lengths, id starts, id heap, key starts, key heap, posting
+# starts, ordinals, values, deltas), then the signature the deltas bring the
+# table to, which writes rewrite in place; a signature is stored as its
+# length and up to six values (data file and journal)
+POSTING_HEADER = struct.Struct("<8sIIIIIQI6q9QI6q")
+_STAMP = struct.Struct("<I6q")
+_POSTING_STAMP_AT = POSTING_HEADER.size - _STAMP.size
+WEIGHTED = 1
+NO_SIGNATURE = (0, -1, 0)
+
+
+def file_signature(path: str) -> Optional[Signature]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _column(typecode: str, values: Iterable[int]) -> bytes:
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_column(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _tail_entries(entries: Iterable[Tuple[str, int, int]]) -> bytes:
+    return b"".join(ID_TAIL.pack(len(raw), offset, length) + raw
+                    for raw, offset, length in ((id.encode("utf-8"), o, n) for id, o, n in entries))
+
+
+def _dumps(data) -> bytes:
+    # dumps() rather than dump() because only the one-shot encoder is
+    # implemented in C
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _stamp(signature: Signature) -> Tuple[int, ...]:
+    return (len(signature), *signature, *(0,) * (6 - len(signature)))
+
+
+def _unstamp(values: Sequence[int]) -> Signature:
+    return tuple(values[1:1 + values[0]])
+
+
+def _entry(task: Task) -> list:
+    # what the posting indexes read of a task
+    return [task.id, task.description, list(task.tags)]
+
+
+def _task(entry: list) -> Task:
+    id, description, tags = entry
+    return Task(id, description, "", False, tags)
+
+
+class PostingIndex:
+    """Base class for the posting indexes: keys to the ordinals of tasks.
+
+    Ordinals are positions in storage order. Subclasses implement `_keys`,
+    the keys of one task - a mapping to a value for each, such as a term
+    frequency, for a `weighted` index - and build their queries on
+    `_postings`.
+    """
+
+    weighted = False
+
+    def __init__(self, path: Optional[str]) -> None:
+        # path None keeps the index in memory only
+        self.path = path
+        self.signature: Optional[Signature] = None
+        self._buf = None  # mmap or bytes of the table
+        self._clear()
+
+    def _clear(self) -> None:
+        self._count = self._key_count = self._total = 0
+        self._sections: Sequence[int] = ()
+        # overlay of the deltas: ids appended, per key the ordinals posted
+        # (with their value) or removed (None), and lengths of the tasks touched
+        self._added: List[str] = []
+        self._overlay: Dict[str, Dict[int, Optional[int]]] = {}
+        self._lengths: Dict[int, int] = {}
+
+    @staticmethod
+    def _keys(task: Task) -> Iterable[str]:
+        raise NotImplementedError
+
+    def _weights(self, task: Task) -> Dict[str, int]:
+        keys = self._keys(task)
+        return keys if self.weighted else dict.fromkeys(keys, 1)
+
+    def __len__(self) -> int:
+        return self._count + len(self._added)
+
+    def _table(self, tasks: Iterable[Task], signature: Optional[Signature]) -> bytes:
+        ids: List[bytes] = []
+        lengths = array("I")
+        postings: Dict[str, array] = {}
+        weights: Dict[str, array] = {}
+        for n, task in enumerate(tasks):
+            ids.append(task.id.encode("utf-8"))
+            keys = self._keys(task)
+            for key in keys:
+                try:
+                    postings[key].append(n)
+                except KeyError:
+                    postings[key] = array("I", (n,))
+            if self.weighted:
+                lengths.append(sum(keys.values()))
+                for key, value in keys.items():
+                    try:
+                        weights[key].append(value)
+                    except KeyError:
+                        weights[key] = array("I", (value,))
+            else:
+                lengths.append(len(keys))
+        keys = sorted((key.encode("utf-8"), key) for key in postings)
+        ordinals, values, ends = array("I"), array("I"), array("Q")
+        for _, key in keys:
+            ordinals.extend(postings.pop(key))
+            if self.weighted:
+                values.extend(weights.pop(key))
+            ends.append(len(ordinals))
+        sections = [_column("I", lengths),
+                    _column("Q", accumulate(map(len, ids), initial=0)), b"".join(ids),
+                    _column("Q", accumulate((len(raw) for raw, _ in keys), initial=0)),
+                    b"".join(raw for raw, _ in keys),
+                    _column("Q", [0, *ends]), _column("I", ordinals), _column("I", values)]
+        offsets = list(accumulate(map(len, sections), initial=POSTING_HEADER.size))
+        signature = signature or NO_SIGNATURE
+        header = POSTING_HEADER.pack(POSTING_MAGIC, POSTING_VERSION, WEIGHTED if self.weighted else 0,
+                                     len(ids), len(keys), len(ordinals), sum(lengths),
+                                     *_stamp(signature), *offsets, *_stamp(signature))
+        return b"".join((header, *sections))
+
+    def build(self, tasks: Iterable[Task], signature: Optional[Signature]) -> None:
+        """Replace the index with postings for `tasks` and persist it."""
+        data = self._table(tasks, signature)
+        if self.path is not None:
+            try:
+                # rebuilt when lost, so not fsynced
+                with atomic_write(self.path, "wb", fsync=False) as f:
+                    f.write(data)
+            except OSError:
+                pass  # only a cache: the in-memory copy is still used
+        self._use(data, signature or NO_SIGNATURE)
+        self.signature = signature
+
+    def _use(self, buf, signature: Signature) -> bool:
+        """Read the header and deltas of `buf`; False unless they bring it to `signature`."""
+        if len(buf) < POSTING_HEADER.size:
+            return False
+        magic, version, flags, count, key_count, _, total, *rest = POSTING_HEADER.unpack_from(buf, 0)
+        if (magic != POSTING_MAGIC or version != POSTING_VERSION or bool(flags & WEIGHTED) != self.weighted
+                or _unstamp(rest[16:]) != signature):
+            return False
+        self.close()
+        self._buf, self._count, self._key_count, self._total = buf, count, key_count, total
+        self._sections = rest[7:16]
+        # lines past the one for `signature` belong to a write still in progress
+        at, pos = _unstamp(rest[:7]), self._sections[8]
+        while at != signature:
+            end = buf.find(b"\n", pos)
+            if end < 0:
+                self.close()
+                return False
+            record = json.loads(bytes(buf[pos:end]))
+            self._apply(((n, _task(old), _task(new)) for n, old, new in record["changed"]),
+                        map(_task, record["added"]))
+            at, pos = tuple(record["data"]), end + 1
+        self.signature = signature
+        return True
+
+    def close(self) -> None:
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._buf = None
+        self.signature = None
+        self._clear()
+
+    def is_fresh(self, signature: Optional[Signature]) -> bool:
+        """Map the on-disk index if needed and report whether it matches `signature`."""
+        if signature is None:
+            return False
+        if self.signature == signature:
+            return True
+        if self.path is None:
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # missing or empty
+            return False
+        try:
+            if self._use(buf, signature):
+                return True
+        except (struct.error, ValueError, KeyError, TypeError):
+            self.close()
+        buf.close()
+        return False
+
+    def overgrown(self) -> bool:
+        """Whether the deltas have outgrown the table, so that a rebuild is due."""
+        return len(self._lengths) > max(1000, self._count // 16)
+
+    def _apply(self, changed: Iterable[Tuple[int, Task, Task]], added: Iterable[Task]) -> None:
+        for n, old, new in changed:
+            self._repost(n, self._weights(old), self._weights(new))
+        for task in added:
+            self._repost(len(self), {}, self._weights(task))
+            self._added.append(task.id)
+
+    def _repost(self, n: int, before: Dict[str, int], after: Dict[str, int]) -> None:
+        for key in before.keys() - after.keys():
+            self._overlay.setdefault(key, {})[n] = None
+        for key, value in after.items():
+            if before.get(key) != value:
+                self._overlay.setdefault(key, {})[n] = value
+        self._lengths[n] = sum(after.values())
+
+    def update(self, changed: Dict[int, Tuple[Task, Task]], added: Sequence[Task],
+               before: Optional[Signature], after: Optional[Signature]) -> None:
+        """Patch the index for a write that took the data from `before` to `after`.
+
+        `changed` maps the positions of tasks modified in place to their old
+        and new versions; `added` were appended. The in-memory copy is
+        patched if it is at `before`, and the file gets a delta line if its
+        header is; an index at neither stays stale until a query rebuilds it.
+        """
+        if before is None or after is None:
+            return
+        if self.signature == before:
+            self._apply(((n, old, new) for n, (old, new) in changed.items()), added)
+            self.signature = after
+        if self.path is None:
+            return
+        delta = {"data": list(after), "changed": [[n, _entry(old), _entry(new)] for n, (old, new) in changed.items()],
+                 "added": [_entry(t) for t in added]}
+        try:
+            with open(self.path, "r+b") as f:
+                head = f.read(POSTING_HEADER.size)
+                if head[:8] != POSTING_MAGIC or _unstamp(_STAMP.unpack_from(head, _POSTING_STAMP_AT)) != before:
+                    return
+                f.seek(0, os.SEEK_END)
+                f.write(_dumps(delta) + b"\n")
+                f.flush()
+                # a crash before this leaves the header at `before`: stale
+                f.seek(_POSTING_STAMP_AT)
+                f.write(_STAMP.pack(*_stamp(after)))
+        except (OSError, struct.error):
+            pass
+
+    def _slice(self, section: int, typecode: str, start: int, stop: int) -> array:
+        at = self._sections[section]
+        size = array(typecode).itemsize
+        return _read_column(typecode, self._buf[at + size * start:at + size * stop])
+
+    def _key_at(self, i: int) -> bytes:
+        start, stop = self._slice(3, "Q", i, i + 2)
+        at = self._sections[4]
+        return bytes(self._buf[at + start:at + stop])
+
+    def _postings(self, key: str) -> Tuple[Sequence[int], Sequence[int]]:
+        """Ordinals posted under `key`, ascending, and their values."""
+        ordinals: Sequence[int] = ()
+        values: Sequence[int] = ()
+        if self._key_count:
+            raw = key.encode("utf-8")
+            lo, hi = 0, self._key_count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._key_at(mid) < raw:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo < self._key_count and self._key_at(lo) == raw:
+                start, stop = self._slice(5, "Q", lo, lo + 2)
+                ordinals = self._slice(6, "I", start, stop)
+                values = self._slice(7, "I", start, stop) if self.weighted else array("I", [1]) * len(ordinals)
+        changes = self._overlay.get(key)
+        if changes:
+            merged = dict(zip(ordinals, values))
+            for n, value in changes.items():
+                if value is None:
+                    merged.pop(n, None)
+                else:
+                    merged[n] = value
+            ordinals = sorted(merged)
+            values = [merged[n] for n in ordinals]
+        return ordinals, values
+
+    def id(self, n: int) -> str:
+        if n >= self._count:
+            return self._added[n - self._count]
+        start, stop = self._slice(1, "Q", n, n + 2)
+        at = self._sections[2]
+        return self._buf[at + start:at + stop].decode("utf-8")
+
+    def length(self, n: int) -> int:
+        """Summed values of the keys of the task at `n`."""
+        length = self._lengths.get(n)
+        return length if length is not None else self._slice(0, "I", n, n + 1)[0]
+
+    def total(self) -> int:
+        """Summed lengths of all tasks."""
+        return self._total + sum(length - (self._slice(0, "I", n, n + 1)[0] if n < self._count else 0)
+                                 for n, length in self._lengths.items())
+
+
+class IdIndex:
+    """Maps task id to the byte span of its object in the data file.
+
+    The file (little-endian) holds a header and then columns over the tasks
+    in file order - span offsets, span lengths, id heap offsets, id lengths
+    - followed by the ordinals sorted by id and a heap of ids. It is read
+    through `mmap` and searched by bisection, so a lookup touches a few
+    pages rather than parsing the index. Spans of tasks appended since the
+    last build follow as tail entries, counted in the header, which appends
+    rewrite in place; the tail is folded in once it outgrows a quarter of
+    the rest.
+
+    `own_layout` records whether the spans were taken from the storage's
+    own writes, as opposed to a file scanned by `Storage.reindex`: only
+    then may a save copy the bytes they cover.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.signature: Optional[Signature] = None
+        self._buf = None  # mmap or bytes of the file as of the last build
+        self._count = 0
+        self.own_layout = False
+        self._heap = 0
+        self._heap_end = 0
+        self._tail_ids: List[str] = []
+        self._tail_spans: List[Tuple[int, int]] = []
+        self._tail_first: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._count + len(self._tail_ids)
+
+    def _folds(self, count: int, tail: int) -> bool:
+        return tail > max(1024, count // 4)
+
+    @staticmethod
+    def _file(count: int, spans: bytes, ids: bytes, tail: List[Tuple[str, int, int]],
+              signature: Optional[Signature], own_layout: bool) -> bytes:
+        # `ids`: the id columns, the sorted ordinals and the heap
+        heap_off = ID_HEADER.size + 24 * count + 4 * count
+        header = ID_HEADER.pack(ID_MAGIC, ID_VERSION, OWN_LAYOUT if own_layout else 0, count, heap_off,
+                                ID_HEADER.size + len(spans) + len(ids), len(tail), *(signature or (0, -1, 0)))
+        return b"".join((header, spans, ids, _tail_entries(tail)))
+
+    def _install(self, data: bytes, signature: Optional[Signature]) -> None:
+        try:
+            # rebuilt when lost, so not fsynced
+            with atomic_write(self.path, "wb", fsync=False) as f:
+                f.write(data)
+        except OSError:
+            pass  # only a cache: the in-memory copy is still used
+        self._use(data, signature or (0, -1, 0))
+        self.signature = signature
+
+    def build(self, entries: Iterable[Tuple[str, int, int]], signature: Optional[Signature],
+              own_layout: bool = True) -> None:
+        """Replace the index with `(id, offset, length)` entries and persist it."""
+        entries = list(entries)
+        ids = [id.encode("utf-8") for id, _, _ in entries]
+        lengths = array("I", map(len, ids))
+        # stable, so a duplicated id finds its first task
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        columns = _column("Q", [offset for _, offset, _ in entries]) + _column("I", [n for _, _, n in entries])
+        id_columns = b"".join((_column("Q", accumulate(lengths[:-1], initial=0) if ids else ()),
+                               _column("I", lengths), _column("I", order), b"".join(ids)))
+        self._install(self._file(len(ids), columns, id_columns, [], signature, own_layout), signature)
+
+    def respan(self, entries: Sequence[Tuple[str, int, int]], signature: Optional[Signature]) -> None:
+        """Like `build`, for a write that kept the ids and order of the tasks indexed.
+
+        Only the spans are rewritten; tasks past those are added to the tail.
+        The write must have laid out every task itself or copied it from
+        spans of `own_layout`.
+        """
+        count = self._count
+        if self._buf is None or self._folds(count, len(entries) - count):
+            self.build(entries, signature)
+            return
+        columns = _column("Q", [offset for _, offset, _ in entries[:count]]) + _column(
+            "I", [n for _, _, n in entries[:count]])
+        ids = bytes(self._buf[ID_HEADER.size + 12 * count:self._heap_end])
+        self._install(self._file(count, columns, ids, list(entries[count:]), signature, True), signature)
+
+    def _use(self, buf, signature: Optional[Signature]) -> bool:
+        """Read the header and tail of `buf`; False unless it is an index of `signature`."""
+        if len(buf) < ID_HEADER.size:
+            return False
+        magic, version, flags, count, heap, tail, tail_count, *stamp = ID_HEADER.unpack_from(buf, 0)
+        if magic != ID_MAGIC or version != ID_VERSION or tuple(stamp) != signature:
+            return False
+        heap_end = tail
+        ids, spans, first = [], [], {}
+        for _ in range(tail_count):
+            length, offset, size = ID_TAIL.unpack_from(buf, tail)
+            tail += ID_TAIL.size
+            id = bytes(buf[tail:tail + length]).decode("utf-8")
+            tail += length
+            first.setdefault(id, len(ids))
+            ids.append(id)
+            spans.append((offset, size))
+        self.close()
+        self._buf, self._count, self._heap, self._heap_end = buf, count, heap, heap_end
+        self.own_layout = bool(flags & OWN_LAYOUT)
+        self._tail_ids, self._tail_spans, self._tail_first = ids, spans, first
+        self.signature = signature
+        return True
+
+    def close(self) -> None:
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._buf = None
+        self.signature = None
+        self.own_layout = False
+
+    def is_fresh(self, signature: Optional[Signature]) -> bool:
+        """Map the on-disk index if needed and report whether it matches `signature`."""
+        if signature is None:
+            return False
+        if self.signature == signature:
+            return True
+        try:
+            with open(self.path, "rb") as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # missing or empty
+            return False
+        try:
+            if self._use(buf, signature):
+                return True
+        except (struct.error, UnicodeDecodeError):
+            pass
+        buf.close()
+        return False
+
+    def extend(self, entries: Iterable[Tuple[str, int, int]], before: Optional[Signature],
+               after: Optional[Signature]) -> None:
+        """Add the spans of tasks appended by a write that took the data from `before` to `after`.
+
+        Does nothing unless the index matches `before`.
+        """
+        if after is None or not self.is_fresh(before):
+            return
+        entries = list(entries)
+        for id, offset, length in entries:
+            self._tail_first.setdefault(id, len(self._tail_ids))
+            self._tail_ids.append(id)
+            self._tail_spans.append((offset, length))
+        if self._folds(self._count, len(self._tail_ids)):
+            self.build(self.entries(), after)
+            return
+        self.signature = after
+        try:
+            with open(self.path, "r+b") as f:
+                magic, version, _, _, _, _, tail_count, *stamp = ID_HEADER.unpack(f.read(ID_HEADER.size))
+                if magic != ID_MAGIC or tuple(stamp) != before:
+                    return
+                f.seek(0, os.SEEK_END)
+                f.write(_tail_entries(entries))
+                f.flush()
+                # a crash before this leaves the header at `before`: stale
+                f.seek(_ID_STAMP_AT)
+                f.write(_ID_STAMP.pack(tail_count + len(entries), *after))
+        except (OSError, struct.error):
+            pass
+
+    def _span(self, n: int) -> Tuple[int, int]:
+        at = ID_HEADER.size
+        return U64.unpack_from(self._buf, at + 8 * n)[0], U32.unpack_from(self._buf, at + 8 * self._count + 4 * n)[0]
+
+    def _id(self, n: int) -> bytes:
+        at = ID_HEADER.size + 12 * self._count
+        start = self._heap + U64.unpack_from(self._buf, at + 8 * n)[0]
+        return bytes(self._buf[start:start + U32.unpack_from(self._buf, at + 8 * self._count + 4 * n)[0]])
+
+    def lookup(self, id: str) -> Optional[Tuple[int, int]]:
+        """Span of the first task with `id`; the index must be fresh."""
+        if self._buf is not None and self._count:
+            raw = id.encode("utf-8")
+            sorted_at = ID_HEADER.size + 24 * self._count
+            lo, hi = 0, self._count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._id(U32.unpack_from(self._buf, sorted_at + 4 * mid)[0]) < raw:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo < self._count:
+                n = U32.unpack_from(self._buf, sorted_at + 4 * lo)[0]
+                if self._id(n) == raw:
+                    return self._span(n)
+        n = self._tail_first.get(id)
+        return self._tail_spans[n] if n is not None else None
+
+    def spans(self) -> List[Tuple[int, int]]:
+        """`(offset, length)` of every task, in file order."""
+        if self._buf is None:
+            return []
+        at, count = ID_HEADER.size, self._count
+        offsets = _read_column("Q", self._buf[at:at + 8 * count])
+        lengths = _read_column("I", self._buf[at + 8 * count:at + 12 * count])
+        return list(zip(offsets, lengths)) + self._tail_spans
+
+    def entries(self) -> List[Tuple[str, int, int]]:
+        """`(id, offset, length)` of every task, in file order."""
+        return ([(self._id(n).decode("utf-8"), *self._span(n)) for n in range(self._count)]
+                + [(id, *span) for id, span in zip(self._tail_ids, self._tail_spans)])
+
+
+class TagIndex(PostingIndex):
+    """Posting lists from tag (`=tag`) and lower-cased tag (`~tag`) to task ordinals."""
+
+    @staticmethod
+    def _keys(task: Task) -> Iterable[str]:
+        return {"=" + tag for tag in task.tags} | {"~" + tag.lower() for tag in task.tags}
+
+    @staticmethod
+    def _key(tag: str, ignore_case: bool) -> str:
+        return "~" + tag.lower() if ignore_case else "=" + tag
+
+    def lookup(self, tag: str, ignore_case: bool = False) -> List[str]:
+        ordinals, _ = self._postings(self._key(tag, ignore_case))
+        return [self.id(n) for n in ordinals]
+
+    def count(self, tag: str, ignore_case: bool = False) -> int:
+        return len(self._postings(self._key(tag, ignore_case))[0])
+
+
+def trigrams(text: str) -> set:
+    """Lower-cased character trigrams of `text`."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex(PostingIndex):
+    """Lower-cased description trigrams to task ordinals, for substring search."""
+
+    @staticmethod
+    def _keys(task: Task) -> Iterable[str]:
+        return trigrams(task.description)
+
+    def candidates(self, query: str) -> Optional[List[str]]:
+        """Ids whose description may contain `query` (in any case).
+
+        Returns None when the query is shorter than a trigram and the index
+        cannot narrow anything down.
+        """
+        grams = trigrams(query)
+        if not grams:
+            return None
+        postings = sorted((self._postings(g)[0] for g in grams), key=len)
+        result = postings[0]
+        for other in postings[1:]:
+            if not result:
+                break
+            keep = set(other)
+            result = [n for n in result if n in keep]
+        return [self.id(n) for n in result]
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class TermIndex(PostingIndex):
+    """Inverted index with term frequencies over descriptions and tags, for BM25."""
+
+    K1 = 1.2
+    B = 0.75
+    weighted = True
+
+    @staticmethod
+    def _keys(task: Task) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for term in tokenize(task.description) + [t for tag in task.tags for t in tokenize(tag)]:
+            counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def corpus(self, query: str) -> Tuple[int, int, Dict[str, int]]:
+        """`(documents, total length, document frequency per query term)`.
+
+        Summed over several indexes these score tasks split across them
+        (see `top`) as if they were in one index.
+        """
+        terms = dict.fromkeys(tokenize(query))
+        return len(self), self.total(), {t: len(self._postings(t)[0]) for t in terms}
+
+    def top(self, query: str, k: int | None, match_all: bool = False,
+            corpus: Optional[Tuple[int, int, Dict[str, int]]] = None) -> List[Tuple[str, float]]:
+        """Best `k` `(id, score)` pairs by BM25, highest first.
+
+        Posting lists of the query terms are combined by union, or by
+        intersection when `match_all` is set. `corpus` overrides the
+        collection statistics taken from this index.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not len(self):
+            return []
+        postings = [self._postings(t) for t in terms]
+        if match_all and not all(ordinals for ordinals, _ in postings):
+            return []
+
+        count, total, df = corpus if corpus is not None else self.corpus(query)
+        avgdl = (total / count) or 1.0
+        scores: Dict[int, float] = {}
+        hits: Dict[int, int] = {}
+        for term, (ordinals, values) in zip(terms, postings):
+            if not ordinals:
+                continue
+            idf = math.log(1 + (count - df[term] + 0.5) / (df[term] + 0.5))
+            for n, tf in zip(ordinals, values):
+                norm = tf + self.K1 * (1 - self.B + self.B * self.length(n) / avgdl)
+                scores[n] = scores.get(n, 0.0) + idf * tf * (self.K1 + 1) / norm
+                hits[n] = hits.get(n, 0) + 1
+        if match_all:
+            scores = {n: sc for n, sc in scores.items() if hits[n] == len(terms)}
+
+        # ties keep storage order; a bounded heap avoids sorting every hit
+        key = lambda item: (item[1], -item[0])
+        best = heapq.nlargest(k, scores.items(), key=key) if k else sorted(scores.items(), key=key, reverse=True)
+        return [(self.id(n), score) for n, score in best]
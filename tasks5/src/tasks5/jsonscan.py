@@ -0,0 +1,154 @@
+"""Helpers for walking a tasks.json document without a full `json.load`.
+
+`iter_task_spans` yields each object of the top-level `"tasks"` array
+together with its byte span in the file, which is what the sidecar indexes
+need to locate a single task later. `iter_task_objects` streams the same
+objects from an open file without reading it all into memory.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, TextIO, Tuple
+
+
+_decoder = json.JSONDecoder()
+_WS = " \t\n\r"
+
+
+class ScanError(ValueError):
+    pass
+
+
+def _skip_ws(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in _WS:
+        pos += 1
+    return pos
+
+
+def _expect(text: str, pos: int, char: str) -> int:
+    pos = _skip_ws(text, pos)
+    if pos >= len(text) or text[pos] != char:
+        raise ScanError(f"expected {char!r} at offset {pos}")
+    return pos + 1
+
+
+def _find_tasks_array(text: str) -> int:
+    """Return the position just after the `[` of the top-level tasks array."""
+    pos = _expect(text, 0, "{")
+    while True:
+        pos = _skip_ws(text, pos)
+        if pos < len(text) and text[pos] == "}":
+            raise ScanError("no tasks array in document")
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = _expect(text, pos, ":")
+        pos = _skip_ws(text, pos)
+        if key == "tasks":
+            return _expect(text, pos, "[")
+        _, pos = _decoder.raw_decode(text, pos)
+        pos = _skip_ws(text, pos)
+        if pos < len(text) and text[pos] == ",":
+            pos += 1
+
+
+def iter_task_spans(raw: bytes) -> Iterator[Tuple[Dict[str, Any], int, int]]:
+    """Yield `(task_dict, byte_offset, byte_length)` for every stored task."""
+    text = raw.decode("utf-8")
+    ascii_only = len(text) == len(raw)
+    pos = _find_tasks_array(text)
+    byte_pos = pos if ascii_only else len(text[:pos].encode("utf-8"))
+    char_pos = pos
+
+    def to_bytes(p: int) -> int:
+        nonlocal byte_pos, char_pos
+        if not ascii_only:
+            byte_pos += len(text[char_pos:p].encode("utf-8"))
+            char_pos = p
+            return byte_pos
+        return p
+
+    pos = _skip_ws(text, pos)
+    if pos < len(text) and text[pos] == "]":
+        return
+    while True:
+        pos = _skip_ws(text, pos)
+        start = pos
+        try:
+            obj, pos = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as exc:
+            raise ScanError(str(exc))
+        if not isinstance(obj, dict):
+            raise ScanError(f"task at offset {start} is not an object")
+        start_b = to_bytes(start)
+        end_b = to_bytes(pos)
+        yield obj, start_b, end_b - start_b
+        pos = _skip_ws(text, pos)
+        if pos < len(text) and text[pos] == ",":
+            pos += 1
+            continue
+        _expect(text, pos, "]")
+        return
+
+
+def iter_task_objects(f: TextIO, chunk_size: int = 1 << 16, allow_array: bool = False) -> Iterator[Dict[str, Any]]:
+    """Stream the objects of the `"tasks"` array from a text file.
+
+    With `allow_array`, a document that is itself a JSON array of tasks is
+    accepted too. Only the current chunk and the object being decoded are
+    held in memory.
+    """
+    buf = ""
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, eof
+        if eof:
+            return False
+        data = f.read(chunk_size)
+        if not data:
+            eof = True
+            return False
+        buf += data
+        return True
+
+    # the header is small; re-scan it from the start until it is complete
+    while True:
+        try:
+            start = _skip_ws(buf, 0)
+            if allow_array and start < len(buf) and buf[start] == "[":
+                pos = start + 1
+            else:
+                pos = _find_tasks_array(buf)
+            break
+        except (ScanError, json.JSONDecodeError) as exc:
+            if not fill():
+                raise ScanError(str(exc))
+
+    while True:
+        pos = _skip_ws(buf, pos)
+        if pos >= len(buf):
+            if not fill():
+                raise ScanError("unexpected end of document")
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as exc:
+            if not fill():
+                raise ScanError(str(exc))
+            continue
+        if not isinstance(obj, dict):
+            raise ScanError(f"task at offset {pos} is not an object")
+        yield obj
+
+        pos = _skip_ws(buf, end)
+        while pos >= len(buf) and fill():
+            pos = _skip_ws(buf, pos)
+        if pos < len(buf) and buf[pos] == ",":
+            pos += 1
+        elif pos >= len(buf) or buf[pos] != "]":
+            raise ScanError(f"expected ',' or ']' at offset {pos}")
+        # drop what has been consumed so the buffer stays one chunk or so
+        if pos > chunk_size:
+            buf = buf[pos:]
+            pos = 0
@@ -1,26 +1,75 @@
 """Task data model for tasks5.
 
-Contains a small dataclass-like Task with serialization helpers.
+Contains a small dataclass-like Task with serialization helpers, plus
+`FrozenTask`, an immutable variant with tuple tags for read-mostly callers
+holding many tasks in memory. Both use `__slots__`, and tag strings are
+interned so repeated tags share one object.
+
+The classes are written out by hand rather than with `dataclasses`, whose
+import (it pulls in `inspect`) is a noticeable share of CLI start-up.
 """
 from __future__ import annotations
 
-from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
-import uuid
+from typing import List, Dict, Any, Optional, Tuple
+import sys
+
+
+class FrozenInstanceError(AttributeError):
+    pass
+
+
+def _intern_tags(tags) -> List[str]:
+    return [sys.intern(str(t)) for t in tags]
+
+
+def _new_id() -> str:
+    # uuid is imported on first use; it is slow to import and only `add`
+    # and `import` need new ids
+    import uuid
+
+    return uuid.uuid4().hex
 
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-@dataclass
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO 8601 date or timestamp; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
 class Task:
-    id: str
-    description: str
-    created: str
-    completed: bool = False
-    tags: List[str] = field(default_factory=list)
+    __slots__ = ("id", "description", "created", "completed", "tags")
+
+    def __init__(self, id: str, description: str, created: str, completed: bool = False,
+                 tags: Optional[List[str]] = None) -> None:
+        self.id = id
+        self.description = description
+        self.created = created
+        self.completed = completed
+        self.tags = tags if tags is not None else []
+
+    def _fields(self) -> tuple:
+        return (self.id, self.description, self.created, self.completed, self.tags)
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None  # mutable, like an eq=True dataclass
+
+    def __repr__(self) -> str:
+        return (f"Task(id={self.id!r}, description={self.description!r}, created={self.created!r}, "
+                f"completed={self.completed!r}, tags={self.tags!r})")
+
+    def __reduce__(self):
+        return (self.__class__, self._fields())
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -38,7 +87,7 @@ class Task:
             description=str(data.get("description", "")),
             created=str(data.get("created", utc_now_iso())),
             completed=bool(data.get("completed", False)),
-            tags=list(data.get("tags", [])),
+            tags=_intern_tags(data.get("tags", [])),
         )
 
     @classmethod
@@ -46,9 +95,72 @@ class Task:
         if not description or not description.strip():
             raise ValueError("description must be non-empty")
         return cls(
-            id=(id if id is not None else uuid.uuid4().hex),
+            id=(id if id is not None else _new_id()),
             description=description.strip(),
             created=(created if created is not None else utc_now_iso()),
             completed=False,
-            tags=tags or [],
+            tags=_intern_tags(tags or []),
+        )
+
+
+class FrozenTask:
+    __slots__ = ("id", "description", "created", "completed", "tags")
+
+    def __init__(self, id: str, description: str, created: str, completed: bool = False,
+                 tags: Tuple[str, ...] = ()) -> None:
+        set_field = object.__setattr__
+        set_field(self, "id", id)
+        set_field(self, "description", description)
+        set_field(self, "created", created)
+        set_field(self, "completed", completed)
+        set_field(self, "tags", tags)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+    def _fields(self) -> tuple:
+        return (self.id, self.description, self.created, self.completed, self.tags)
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __repr__(self) -> str:
+        return (f"FrozenTask(id={self.id!r}, description={self.description!r}, created={self.created!r}, "
+                f"completed={self.completed!r}, tags={self.tags!r})")
+
+    def __reduce__(self):
+        return (self.__class__, self._fields())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "description": self.description,
+            "created": self.created,
+            "completed": self.completed,
+            "tags": list(self.tags),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FrozenTask":
+        return cls(
+            id=str(data.get("id", "")),
+            description=str(data.get("description", "")),
+            created=str(data.get("created", utc_now_iso())),
+            completed=bool(data.get("completed", False)),
+            tags=tuple(_intern_tags(data.get("tags", []))),
         )
+
+    @classmethod
+    def from_task(cls, task: Task) -> "FrozenTask":
+        return cls(task.id, task.description, task.created, task.completed, tuple(_intern_tags(task.tags)))
+
+    def to_task(self) -> Task:
+        return Task(self.id, self.description, self.created, self.completed, list(self.tags))
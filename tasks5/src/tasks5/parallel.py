@@ -0,0 +1,64 @@
+"""Process-pool evaluation of task predicates for `list` and `search`.
+
+Tasks are shipped to workers as JSON-encoded slices of just the fields the
+predicates look at, which pickles as one string per chunk instead of a
+graph of `Task` objects. Workers answer with the indices that matched, so
+results are reassembled in the original order.
+"""
+from __future__ import annotations
+
+import json
+from itertools import repeat
+from typing import Callable, List, Sequence
+
+from .models import Task
+
+
+# below this many tasks the pool start-up costs more than it saves
+MIN_PARALLEL_TASKS = 20000
+
+
+def _encode_chunk(tasks: Sequence[Task]) -> str:
+    return json.dumps([[t.description, t.created, t.tags, t.completed] for t in tasks], ensure_ascii=False)
+
+
+def _filter_chunk(payload: str, predicate: Callable[..., bool], args: tuple) -> List[int]:
+    rows = json.loads(payload)
+    return [
+        i
+        for i, (description, created, tags, completed) in enumerate(rows)
+        if predicate(Task(id="", description=description, created=created, completed=completed, tags=tags), *args)
+    ]
+
+
+def parallel_filter(
+    tasks: List[Task],
+    predicate: Callable[..., bool],
+    args: tuple,
+    jobs: int,
+    chunk_size: int | None = None,
+    min_tasks: int = MIN_PARALLEL_TASKS,
+) -> List[Task]:
+    """Return the tasks for which `predicate(task, *args)` holds, in order.
+
+    `predicate` must be a module-level function so it can be pickled, and
+    may only look at `description`, `created`, `tags` and `completed`.
+    """
+    if jobs <= 1 or len(tasks) < min_tasks:
+        return [t for t in tasks if predicate(t, *args)]
+
+    if chunk_size is None:
+        # a few chunks per worker keeps them busy when chunks finish unevenly
+        chunk_size = max(1, -(-len(tasks) // (jobs * 4)))
+    starts = range(0, len(tasks), chunk_size)
+    payloads = (_encode_chunk(tasks[s:s + chunk_size]) for s in starts)
+
+    # imported here: concurrent.futures is slow to import and most runs
+    # never get this far
+    from concurrent.futures import ProcessPoolExecutor
+
+    out: List[Task] = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for start, hits in zip(starts, pool.map(_filter_chunk, payloads, repeat(predicate), repeat(args))):
+            out.extend(tasks[start + i] for i in hits)
+    return out
@@ -0,0 +1,167 @@
+"""Common ground of storages made of several task files.
+
+A partitioned data directory holds `manifest.json` and a number of part
+files, each an ordinary tasks.json file managed by its own `Storage`, with
+its own lock, sidecar indexes and in-place appends. Subclasses decide which
+part a task lives in; reads that need several parts run them on a thread
+pool and merge their tasks, and `scan` filters whole parts in worker
+processes.
+
+Each part is written atomically, but a `save` spanning parts is not.
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import timedelta
+from itertools import chain, repeat
+from typing import Callable, Iterable, Iterator, List, Set, Tuple
+
+from .atomic import atomic_write
+from .models import Task
+from .storage import Storage, StorageError
+
+
+MANIFEST = "manifest.json"
+
+
+def read_manifest(path: str) -> dict | None:
+    """The manifest of the data directory `path`, or None if it has none."""
+    try:
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        raise StorageError(f"could not read the manifest of {path}: {exc}")
+    if not isinstance(manifest, dict):
+        raise StorageError(f"unsupported manifest in {path}")
+    return manifest
+
+
+def write_manifest(path: str, manifest: dict) -> None:
+    try:
+        os.makedirs(path, exist_ok=True)
+        with atomic_write(os.path.join(path, MANIFEST), "w") as f:
+            f.write(json.dumps(manifest, indent=2) + "\n")
+    except OSError as exc:
+        raise StorageError(f"could not write the manifest of {path}: {exc}")
+
+
+def _filter_part(path: str, predicate: Callable[..., bool], args: tuple) -> List[dict]:
+    return [t.to_dict() for t in Storage(path).iter_tasks() if predicate(t, *args)]
+
+
+class PartitionedStorage:
+    """Read side of the `Storage` surface over the parts returned by `_parts`."""
+
+    # threads overlap the reads of a cold cache; parsing still takes the GIL
+    workers = 8
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._cache_writes = False
+
+    def _parts(self) -> List[Storage]:
+        raise NotImplementedError
+
+    def _merge_iter(self, parts: Iterable[Iterable[Task]]) -> Iterator[Task]:
+        """Tasks of `parts` (given in `_parts` order) in storage order."""
+        return chain.from_iterable(parts)
+
+    def _merge(self, parts: Iterable[Iterable[Task]]) -> List[Task]:
+        return list(self._merge_iter(parts))
+
+    def _map(self, fn: Callable, items: list | None = None) -> list:
+        """`fn(item)` for every part (or item of `items`) on the thread pool, in order."""
+        items = self._parts() if items is None else items
+        if self.workers <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    @property
+    def cache_writes(self) -> bool:
+        return self._cache_writes
+
+    @cache_writes.setter
+    def cache_writes(self, value: bool) -> None:
+        self._cache_writes = value
+        for part in self._parts():
+            part.cache_writes = value
+
+    def clear_cache(self) -> None:
+        for part in self._parts():
+            part.clear_cache()
+
+    def load(self) -> List[Task]:
+        return self._merge(self._map(Storage.load))
+
+    def iter_tasks(self) -> Iterator[Task]:
+        return self._merge_iter([p.iter_tasks() for p in self._parts()])
+
+    def archive_completed(self, older_than: timedelta) -> int:
+        return sum(self._map(lambda p: p.archive_completed(older_than)))
+
+    def iter_archived(self) -> Iterator[Task]:
+        return self._merge_iter([p.iter_archived() for p in self._parts()])
+
+    def archived_ids(self) -> Set[str]:
+        return set().union(*self._map(Storage.archived_ids))
+
+    def get_task_by_id(self, id: str) -> Task | None:
+        found = self.get_tasks_by_ids([id])
+        return found[0] if found else None
+
+    def get_tasks_by_ids(self, ids: Iterable[str]) -> List[Task]:
+        ids = list(ids)
+        found = {t.id: t for part in self._map(lambda p: p.get_tasks_by_ids(ids)) for t in part}
+        return [found[id] for id in ids if id in found]
+
+    def query(self, tag: str | None = None, completed: bool | None = None) -> List[Task]:
+        return self._merge(self._map(lambda p: p.query(tag=tag, completed=completed)))
+
+    def find_by_tag(self, tag: str, ignore_case: bool = False) -> List[Task]:
+        return self._merge(self._map(lambda p: p.find_by_tag(tag, ignore_case)))
+
+    def description_candidates(self, query: str) -> List[Task] | None:
+        parts = self._map(lambda p: p.description_candidates(query))
+        if any(p is None for p in parts):
+            return None
+        return self._merge(parts)
+
+    def rank(self, query: str, limit: int | None = None, match_all: bool = False) -> List[Tuple[Task, float]]:
+        """Tasks matching the terms of `query`, best BM25 score first.
+
+        Every part scores with the statistics of all parts together, so
+        scores are the same as with the tasks in one file.
+        """
+        count, total, df = 0, 0, {}
+        for part_count, part_total, part_df in self._map(lambda p: p.term_corpus(query)):
+            count += part_count
+            total += part_total
+            for term, n in part_df.items():
+                df[term] = df.get(term, 0) + n
+        if not count:
+            return []
+        parts = self._map(lambda p: p.rank(query, limit, match_all, corpus=(count, total, df)))
+        # ties in creation order, as the storage order of a single file
+        ranked = sorted((item for part in parts for item in part), key=lambda item: (-item[1], item[0].created))
+        return ranked[:limit] if limit else ranked
+
+    def scan(self, predicate: Callable[..., bool], args: tuple, jobs: int) -> List[Task]:
+        """Tasks for which `predicate(task, *args)` holds, filtered per part in `jobs` processes.
+
+        `predicate` must be a module-level function so it can be pickled.
+        Only the matches travel back from the workers.
+        """
+        parts = [p for p in self._parts() if os.path.exists(p.path)]
+        if jobs <= 1 or len(parts) <= 1:
+            return [t for t in self.iter_tasks() if predicate(t, *args)]
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(parts))) as pool:
+            found = pool.map(_filter_part, [p.path for p in parts], repeat(predicate), repeat(args))
+            return self._merge([Task.from_dict(d) for d in part] for part in found)
@@ -0,0 +1,264 @@
+"""Task storage split into segments by creation month, with zone maps.
+
+A segmented data directory is a partitioned directory (see `partitioned`)
+whose parts are one file per month of `created` (UTC): `segment-2026-09.json`,
+..., plus `segment-undated.json` for tasks whose `created` does not parse.
+New tasks land in the segment of the current month, so adding never touches
+older segments, and `save` rewrites only the segments whose tasks changed.
+
+The manifest keeps a zone map per segment: task count, completed count,
+min/max `created` and the tag set. `candidates` and `query` use them to skip
+segments that cannot match a filter without opening them. Each zone map
+records the signature of the segment file it describes; one that does not
+match (the segment was written by something else, or two writers raced on
+the manifest) is recomputed from the segment on the next read.
+"""
+from __future__ import annotations
+
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List
+
+from .index import Signature, file_signature
+from .models import Task, parse_timestamp
+from .partitioned import PartitionedStorage, read_manifest, write_manifest
+from .storage import Storage, StorageError, _written_fields
+
+
+FORMAT = "speckit-segments"
+UNDATED = "undated"
+
+_SEGMENT = re.compile(r"segment-(\d{4}-\d{2}|undated)\.json")
+
+
+def segment_key(created: str) -> str:
+    """Segment of a task created at `created`: its UTC month as `YYYY-MM`."""
+    try:
+        when = parse_timestamp(created).astimezone(timezone.utc)
+    except ValueError:
+        return UNDATED
+    return f"{when.year:04d}-{when.month:02d}"
+
+
+def _utc(created: str) -> str | None:
+    try:
+        return parse_timestamp(created).astimezone(timezone.utc).isoformat()
+    except ValueError:
+        return None
+
+
+def zone_map(tasks: Iterable[Task]) -> dict:
+    """Count, completed count, min/max `created` (UTC) and tag set of `tasks`."""
+    count = completed = 0
+    first = last = None
+    tags = set()
+    for t in tasks:
+        count += 1
+        completed += t.completed
+        created = _utc(t.created)
+        if created is not None:
+            first = created if first is None or created < first else first
+            last = created if last is None or created > last else last
+        tags.update(t.tags)
+    return {"count": count, "completed": completed, "min_created": first, "max_created": last,
+            "tags": sorted(tags)}
+
+
+def _merge_zones(a: dict, b: dict) -> dict:
+    dates = [d for d in (a["min_created"], a["max_created"], b["min_created"], b["max_created"]) if d is not None]
+    return {"count": a["count"] + b["count"], "completed": a["completed"] + b["completed"],
+            "min_created": min(dates) if dates else None, "max_created": max(dates) if dates else None,
+            "tags": sorted(set(a["tags"]) | set(b["tags"]))}
+
+
+def admits(zone: dict, tag: str | None = None, completed: bool | None = None, since=None, until=None,
+           ignore_case: bool = False) -> bool:
+    """False when no task summarized by `zone` can pass the filters."""
+    if not zone["count"]:
+        return False
+    if tag is not None:
+        tags = [t.lower() for t in zone["tags"]] if ignore_case else zone["tags"]
+        if (tag.lower() if ignore_case else tag) not in tags:
+            return False
+    if completed is True and not zone["completed"]:
+        return False
+    if completed is False and zone["completed"] == zone["count"]:
+        return False
+    if since is not None or until is not None:
+        if zone["max_created"] is None:
+            return False  # nothing in it has a date to compare
+        if since is not None and parse_timestamp(zone["max_created"]) < since:
+            return False
+        if until is not None and parse_timestamp(zone["min_created"]) >= until:
+            return False
+    return True
+
+
+class SegmentedStorage(PartitionedStorage):
+    """Same surface as `Storage` over a directory of monthly segments."""
+
+    def __init__(self, path: str, binary: bool = False, durability: str = "always") -> None:
+        super().__init__(path)
+        manifest = read_manifest(path)
+        if manifest is not None:
+            if manifest.get("format") != FORMAT or manifest.get("partition") != "created-month":
+                raise StorageError(f"unsupported segment manifest in {path}")
+        elif os.path.isdir(path) and os.listdir(path):
+            raise StorageError(f"{path} is a directory but not a segmented data directory")
+        self._has_manifest = manifest is not None
+        self.binary = binary
+        self.durability = durability
+        self.segments: Dict[str, Storage] = {}
+        # fields of the tasks each segment held at our last load, so that
+        # save() can leave unchanged segments alone
+        self._loaded: Dict[str, List[tuple]] = {}
+
+    def _manifest(self) -> dict:
+        manifest = read_manifest(self.path) if self._has_manifest else None
+        if manifest is None:
+            manifest = {"format": FORMAT, "version": 1, "partition": "created-month", "segments": {}}
+        manifest.setdefault("segments", {})
+        return manifest
+
+    def _ensure_manifest(self) -> None:
+        if not self._has_manifest:
+            write_manifest(self.path, self._manifest())
+            self._has_manifest = True
+
+    def segment(self, key: str) -> Storage:
+        if key not in self.segments:
+            storage = Storage(os.path.join(self.path, f"segment-{key}.json"), binary=self.binary,
+                              durability=self.durability)
+            storage.cache_writes = self.cache_writes
+            self.segments[key] = storage
+        return self.segments[key]
+
+    def keys(self) -> List[str]:
+        """Keys of the segments on disk, oldest month first."""
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        return sorted(m.group(1) for m in map(_SEGMENT.fullmatch, names) if m)
+
+    def _parts(self) -> List[Storage]:
+        return [self.segment(key) for key in self.keys()]
+
+    def zones(self) -> Dict[str, dict]:
+        """Zone map of every segment, recomputing (and recording) stale ones."""
+        manifest = self._manifest()
+        recorded = manifest["segments"]
+        zones = {}
+        stale = False
+        for key in self.keys():
+            path = self.segment(key).path
+            signature = file_signature(path)
+            entry = recorded.get(key)
+            if entry is None or signature is None or tuple(entry.get("data") or ()) != signature:
+                entry = self._record(recorded, key, zone_map(self.segment(key).load()), signature)
+                stale = True
+            zones[key] = entry
+        if stale and self._has_manifest:
+            try:
+                write_manifest(self.path, manifest)
+            except StorageError:
+                pass  # zone maps are recomputed until one can be recorded
+        return zones
+
+    @staticmethod
+    def _record(recorded: Dict[str, dict], key: str, zone: dict, signature: Signature | None) -> dict:
+        zone["data"] = list(signature) if signature is not None else None
+        recorded[key] = zone
+        return zone
+
+    def _partition(self, tasks: Iterable[Task]) -> Dict[str, List[Task]]:
+        parts: Dict[str, List[Task]] = {}
+        for t in tasks:
+            parts.setdefault(segment_key(t.created), []).append(t)
+        return parts
+
+    def load(self) -> List[Task]:
+        keys = self.keys()
+        parts = self._map(lambda key: self.segment(key).load(), keys)
+        self._loaded = {key: [_written_fields(t) for t in part] for key, part in zip(keys, parts)}
+        return self._merge(parts)
+
+    def save(self, tasks: List[Task]) -> None:
+        self._ensure_manifest()
+        parts = self._partition(tasks)
+        manifest = self._manifest()
+        for key in sorted(set(parts) | set(self.keys())):
+            part = parts.get(key, [])
+            if self._loaded.get(key) == [_written_fields(t) for t in part]:
+                continue  # unchanged since we loaded it
+            segment = self.segment(key)
+            with segment.locked():
+                segment.save(part)
+                signature = file_signature(segment.path)
+                if segment.id_index.signature != signature or len(segment.id_index) != len(part):
+                    part = segment.load()  # the save merged in tasks added meanwhile
+                self._record(manifest["segments"], key, zone_map(part), signature)
+            self._loaded[key] = [_written_fields(t) for t in part]
+        write_manifest(self.path, manifest)
+
+    def add_task(self, task: Task) -> None:
+        self.add_tasks([task])
+
+    def add_tasks(self, added: List[Task], defer_indexes: bool = False) -> None:
+        self._ensure_manifest()
+        manifest = self._manifest()
+        for key, part in self._partition(added).items():
+            segment = self.segment(key)
+            with segment.locked():
+                before = file_signature(segment.path)
+                segment.add_tasks(part, defer_indexes=defer_indexes)
+                entry = manifest["segments"].get(key)
+                if before is None:
+                    zone = zone_map(part)
+                elif entry is not None and tuple(entry.get("data") or ()) == before:
+                    zone = _merge_zones(entry, zone_map(part))
+                else:
+                    zone = zone_map(segment.load())
+                self._record(manifest["segments"], key, zone, file_signature(segment.path))
+        write_manifest(self.path, manifest)
+
+    def archive_completed(self, older_than: timedelta) -> int:
+        # months without completed tasks from before the cutoff stay untouched
+        cutoff = datetime.now(timezone.utc) - older_than
+        keys = [key for key, zone in self.zones().items() if admits(zone, completed=True, until=cutoff)]
+        moved = sum(self._map(lambda key: self.segment(key).archive_completed(older_than), keys))
+        for key in keys:
+            self._loaded.pop(key, None)
+        if moved:
+            self.zones()  # record the zone maps of the segments that shrank
+        return moved
+
+    def get_task_by_id(self, id: str) -> Task | None:
+        # recent tasks are the likely ones, so look from the newest segment back
+        for key in reversed(self.keys()):
+            task = self.segment(key).get_task_by_id(id)
+            if task is not None:
+                return task
+        return None
+
+    def _admitted(self, **filters) -> List[Storage]:
+        return [self.segment(key) for key, zone in self.zones().items() if admits(zone, **filters)]
+
+    def candidates(self, tag: str | None = None, completed: bool | None = None, since=None,
+                   until=None) -> Iterator[Task]:
+        """Tasks of the segments whose zone maps admit the filters.
+
+        Callers still apply the filters: a segment that may hold a match
+        yields all its tasks.
+        """
+        segments = self._admitted(tag=tag, completed=completed, since=since, until=until)
+        return self._merge_iter([s.iter_tasks() for s in segments])
+
+    def query(self, tag: str | None = None, completed: bool | None = None) -> List[Task]:
+        segments = self._admitted(tag=tag, completed=completed)
+        return self._merge(self._map(lambda s: s.query(tag=tag, completed=completed), segments))
+
+    def find_by_tag(self, tag: str, ignore_case: bool = False) -> List[Task]:
+        segments = self._admitted(tag=tag, ignore_case=ignore_case)
+        return self._merge(self._map(lambda s: s.find_by_tag(tag, ignore_case), segments))
@@ -0,0 +1,96 @@
+"""Task storage split over hash-partitioned shard files.
+
+A sharded data directory is a partitioned directory (see `partitioned`)
+whose parts are N shard files (`shard-000.json`, ...). A task lives in
+shard `crc32(id) % N`, so looking up an id reads one shard and adding a
+task writes only the shard it lands in; tasks from several shards are
+merged by `created`.
+"""
+from __future__ import annotations
+
+import heapq
+import os
+import zlib
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List
+
+from .models import Task
+from .partitioned import PartitionedStorage, read_manifest, write_manifest
+from .storage import Storage, StorageError
+
+
+FORMAT = "speckit-shards"
+DEFAULT_SHARDS = 16
+
+_created = attrgetter("created")
+
+
+def _shard_path(path: str, n: int) -> str:
+    return os.path.join(path, f"shard-{n:03d}.json")
+
+
+class ShardedStorage(PartitionedStorage):
+    """Same surface as `Storage` over a directory of hash-partitioned shards."""
+
+    def __init__(self, path: str, shards: int | None = None, binary: bool = False,
+                 durability: str = "always") -> None:
+        super().__init__(path)
+        manifest = read_manifest(path)
+        if manifest is not None:
+            if manifest.get("format") != FORMAT or manifest.get("partition") != "crc32":
+                raise StorageError(f"unsupported shard manifest in {path}")
+            count = manifest["shards"]
+        elif os.path.isdir(path) and os.listdir(path):
+            raise StorageError(f"{path} is a directory but not a sharded data directory")
+        else:
+            count = shards or DEFAULT_SHARDS
+        if count < 1:
+            raise StorageError(f"invalid shard count: {count}")
+        self._has_manifest = manifest is not None
+        self.shards = [Storage(_shard_path(path, n), binary=binary, durability=durability) for n in range(count)]
+
+    def _ensure_manifest(self) -> None:
+        if not self._has_manifest:
+            write_manifest(self.path, {"format": FORMAT, "version": 1, "shards": len(self.shards),
+                                       "partition": "crc32"})
+            self._has_manifest = True
+
+    def _parts(self) -> List[Storage]:
+        return self.shards
+
+    def _merge_iter(self, parts: Iterable[Iterable[Task]]) -> Iterator[Task]:
+        return heapq.merge(*parts, key=_created)
+
+    def shard_for(self, id: str) -> Storage:
+        return self.shards[zlib.crc32(id.encode("utf-8")) % len(self.shards)]
+
+    def _partition(self, tasks: Iterable[Task]) -> Dict[int, List[Task]]:
+        parts: Dict[int, List[Task]] = {}
+        for t in tasks:
+            parts.setdefault(zlib.crc32(t.id.encode("utf-8")) % len(self.shards), []).append(t)
+        return parts
+
+    def save(self, tasks: List[Task]) -> None:
+        self._ensure_manifest()
+        parts = self._partition(tasks)
+        self._map(lambda n: self.shards[n].save(parts.get(n, [])), list(range(len(self.shards))))
+
+    def add_task(self, task: Task) -> None:
+        self._ensure_manifest()
+        self.shard_for(task.id).add_task(task)
+
+    def add_tasks(self, added: List[Task], defer_indexes: bool = False) -> None:
+        self._ensure_manifest()
+        for n, part in self._partition(added).items():
+            self.shards[n].add_tasks(part, defer_indexes=defer_indexes)
+
+    def get_task_by_id(self, id: str) -> Task | None:
+        return self.shard_for(id).get_task_by_id(id)
+
+    def get_tasks_by_ids(self, ids: Iterable[str]) -> List[Task]:
+        ids = list(ids)
+        wanted: Dict[int, List[str]] = {}
+        for id in ids:
+            wanted.setdefault(zlib.crc32(id.encode("utf-8")) % len(self.shards), []).append(id)
+        found = {t.id: t for n, part in wanted.items() for t in self.shards[n].get_tasks_by_ids(part)}
+        return [found[id] for id in ids if id in found]
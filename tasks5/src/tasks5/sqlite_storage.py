@@ -0,0 +1,174 @@
+"""SQLite storage backend for tasks.
+
+`SqliteStorage` offers the same load/save/add/get surface as
+`tasks5.storage.Storage` but keeps tasks in an SQLite database with indexed
+`id`, `completed` and `created` columns and a separate tag table, so single
+lookups and tag/completion filters do not have to read every task.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+from typing import Iterable, List, Optional
+
+from .models import Task
+from .storage import Storage, StorageError
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL,
+    created TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed);
+CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created);
+CREATE TABLE IF NOT EXISTS task_tags (
+    task_seq INTEGER NOT NULL REFERENCES tasks (seq) ON DELETE CASCADE,
+    pos INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (task_seq, pos)
+);
+CREATE INDEX IF NOT EXISTS task_tags_tag ON task_tags (tag);
+"""
+
+
+class SqliteStorage:
+    def __init__(self, path: str = "tasks.db") -> None:
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            parent = os.path.dirname(os.path.abspath(self.path))
+            if parent and not os.path.exists(parent):
+                os.makedirs(parent, exist_ok=True)
+            try:
+                conn = sqlite3.connect(self.path)
+                conn.execute("PRAGMA foreign_keys = ON")
+                conn.executescript(SCHEMA)
+            except sqlite3.Error as exc:
+                raise StorageError(f"could not open {self.path}: {exc}")
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _tasks_from_rows(self, conn: sqlite3.Connection, rows) -> List[Task]:
+        rows = list(rows)
+        if not rows:
+            return []
+        tags = {seq: [] for seq, *_ in rows}
+        # chunked to stay under SQLite's bound-parameter limit
+        seqs = list(tags)
+        for i in range(0, len(seqs), 500):
+            chunk = seqs[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for seq, tag in conn.execute(
+                f"SELECT task_seq, tag FROM task_tags WHERE task_seq IN ({marks}) ORDER BY task_seq, pos",
+                chunk,
+            ):
+                tags[seq].append(tag)
+        return [
+            Task(id=id, description=description, created=created, completed=bool(completed), tags=tags[seq])
+            for seq, id, description, created, completed in rows
+        ]
+
+    def _insert(self, conn: sqlite3.Connection, tasks: Iterable[Task]) -> None:
+        for t in tasks:
+            cur = conn.execute(
+                "INSERT INTO tasks (id, description, created, completed) VALUES (?, ?, ?, ?)",
+                (t.id, t.description, t.created, int(t.completed)),
+            )
+            conn.executemany(
+                "INSERT INTO task_tags (task_seq, pos, tag) VALUES (?, ?, ?)",
+                [(cur.lastrowid, pos, tag) for pos, tag in enumerate(t.tags)],
+            )
+
+    def load(self) -> List[Task]:
+        return self.query()
+
+    def save(self, tasks: List[Task]) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM task_tags")
+                conn.execute("DELETE FROM tasks")
+                self._insert(conn, tasks)
+        except sqlite3.Error as exc:
+            raise StorageError(f"could not write {self.path}: {exc}")
+
+    def add_task(self, task: Task) -> None:
+        self.add_tasks([task])
+
+    def add_tasks(self, tasks: List[Task], defer_indexes: bool = False) -> None:
+        """Insert several tasks in one transaction.
+
+        `defer_indexes` is accepted for parity with `Storage`; SQLite keeps
+        its own indexes current.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                self._insert(conn, tasks)
+        except sqlite3.IntegrityError as exc:
+            raise StorageError(f"task id already exists: {exc}")
+        except sqlite3.Error as exc:
+            raise StorageError(f"could not write {self.path}: {exc}")
+
+    def get_task_by_id(self, id: str) -> Task | None:
+        tasks = self._select("WHERE id = ?", (id,))
+        return tasks[0] if tasks else None
+
+    def query(self, tag: str | None = None, completed: bool | None = None) -> List[Task]:
+        """Return tasks filtered by tag and/or completion state, in insertion order."""
+        clauses = []
+        params: list = []
+        if tag:
+            clauses.append("seq IN (SELECT task_seq FROM task_tags WHERE tag = ?)")
+            params.append(tag)
+        if completed is not None:
+            clauses.append("completed = ?")
+            params.append(int(completed))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(where, params)
+
+    def _select(self, where: str, params) -> List[Task]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT seq, id, description, created, completed FROM tasks {where} ORDER BY seq",
+                params,
+            )
+            return self._tasks_from_rows(conn, rows)
+        except sqlite3.Error as exc:
+            raise StorageError(f"could not read {self.path}: {exc}")
+
+
+def migrate_json(json_path: str, db_path: str) -> int:
+    """Copy every task from a tasks.json file into an SQLite database.
+
+    The database contents are replaced. Returns the number of tasks copied.
+    Ids must be unique in the database, so a file with duplicated ids is
+    refused, naming them, before anything is written.
+    """
+    tasks = Storage(json_path).load()
+    seen, duplicates = set(), set()
+    for t in tasks:
+        (duplicates if t.id in seen else seen).add(t.id)
+    if duplicates:
+        duplicates = sorted(duplicates)
+        shown = ", ".join(repr(id) for id in duplicates[:10])
+        more = f" and {len(duplicates) - 10} more" if len(duplicates) > 10 else ""
+        raise StorageError(f"{json_path} has duplicate task ids: {shown}{more}")
+    db = SqliteStorage(db_path)
+    try:
+        db.save(tasks)
+    finally:
+        db.close()
+    return len(tasks)
@@ -1,36 +1,290 @@
 """Simple JSON file storage for tasks.
 
 Provides a minimal Storage class with load/save/add/get methods. Writes are
-performed via an atomic replace of a temporary file.
+performed via an atomic replace of a temporary file. Every save also
+refreshes `<path>.idx`, which maps ids to byte spans so `get_task_by_id`
+can decode a single task without parsing the rest of the file. The posting
+indexes - `<path>.tags` (tag posting lists for tag filters), `<path>.tri`
+(description trigrams for substring search) and `<path>.terms` (term
+frequencies for ranked search) - are built by the first query that needs
+them; later writes append their changes to the ones that are current (see
+`tasks5.index`) and leave the others stale.
+
+Writes are incremental where they can be: the storage remembers the
+fields of every task as it last read or wrote the file, and the next write
+copies the bytes of tasks that have not changed since straight from the old
+file, encoding only new and modified ones. The file comes out byte for byte
+as a full rewrite would. With `cache_writes` set (for long-lived processes)
+what is written also becomes the load cache.
+
+`add_task` on a file laid out as `save()` writes it appends in place (see
+`tasks5.tailappend`) instead of loading and rewriting every task.
+
+`archive_completed` moves old completed tasks to a compressed archive next
+to the data file (see `tasks5.archive`); `load` and everything else then
+only read the tasks that stay, and `iter_archived` streams the archive.
+
+Writers serialize on an advisory lock on `<path>.lock` (where `fcntl` is
+available) and write through uniquely named temporary files. `save()`
+merges in tasks that other processes added since this object's `load()`,
+so concurrent writers do not lose each other's tasks.
+
+`durability` selects when writes reach the disk: "always" fsyncs every
+write, "batch" coalesces `add_task` calls made concurrently from several
+threads into one fsynced write (see `tasks5.groupcommit`; the CLI offers it
+to `speckit serve`, whose clients' adds do overlap) and "none" never fsyncs.
+
+With `binary=True` every save also writes `<path>.bin`, a memory-mapped
+binary snapshot (see `tasks5.binary`) used for id lookups and completion
+filters while it matches the JSON file.
+
+`JournalStorage` keeps the same snapshot file but appends new tasks to a
+line-oriented journal next to it, so adding a task does not rewrite the
+whole snapshot. The journal is folded back into the snapshot by `compact()`.
 """
 from __future__ import annotations
 
 import json
 import os
-from typing import List
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; writes are then unlocked
+    fcntl = None
 
+from .atomic import atomic_write
+from .index import IdIndex, PostingIndex, Signature, TagIndex, TermIndex, TrigramIndex, file_signature
+from .jsonscan import ScanError, iter_task_objects, iter_task_spans
 from .models import Task
+from . import tailappend
+
+
+# fields compared to tell whether a task changed since it was written
+def _written_fields(task: Task) -> tuple:
+    return (task.id, task.description, task.created, task.completed, tuple(task.tags))
+
+
+_encode_str = json.encoder.encode_basestring
 
 
 class StorageError(Exception):
     pass
 
 
+DURABILITY = ("always", "batch", "none")
+
+# share of all tasks (and count) past which decoding index hits one by one
+# loses to a single streamed pass over the file
+SCAN_SHARE = 0.1
+SCAN_MIN_HITS = 1000
+
+
+def _scan_cheaper(hits: int, total: int) -> bool:
+    return hits > max(SCAN_MIN_HITS, SCAN_SHARE * total)
+
+
+def _first_of_each_id(tasks: Iterable[Task]) -> Iterator[Task]:
+    # what looking ids up finds when a file holds duplicates
+    seen = set()
+    for task in tasks:
+        if task.id not in seen:
+            seen.add(task.id)
+            yield task
+
+
 class Storage:
-    def __init__(self, path: str = "tasks.json") -> None:
+    def __init__(self, path: str = "tasks.json", binary: bool = False, durability: str = "always") -> None:
+        if durability not in DURABILITY:
+            raise StorageError(f"unknown durability level: {durability}")
         self.path = path
+        self.durability = durability
+        self._committer = None
+        if durability == "batch":
+            from .groupcommit import GroupCommitter
+
+            self._committer = GroupCommitter(self.add_tasks)
+        self.binary_path = f"{path}.bin" if binary else None
+        self.id_index = IdIndex(f"{path}.idx")
+        self.tag_index = TagIndex(f"{path}.tags")
+        self.trigram_index = TrigramIndex(f"{path}.tri")
+        self.term_index = TermIndex(f"{path}.terms")
+        # indexes over task contents, kept in step with `load()`
+        self.posting_indexes = [self.tag_index, self.trigram_index, self.term_index]
+        # parsed tasks from the last load, valid while the signature matches
+        self._cache: List[Task] | None = None
+        self._cache_signature: Signature | None = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # keep what we write as the cache instead of re-reading it on the next
+        # load; worth it for long-lived processes such as the daemon
+        self.cache_writes = False
+        self._table = None
+        self._by_id: Tuple[Signature, Dict[str, Task]] | None = None
+        # signature and ids as of the last load(), for merging in save()
+        self._loaded: Tuple[Signature | None, set] | None = None
+        # signature of the data file as we last parsed or wrote it and the
+        # fields of the tasks in it, in file order; lets the next write splice
+        # unchanged tasks
+        self._written: Tuple[Signature | None, List[tuple]] | None = None
+        self.lock_path = f"{path}.lock"
+        self.lock_timeout = 10.0
+        self._lock_state = threading.local()
+
+    @contextmanager
+    def locked(self):
+        """Hold the exclusive writer lock; re-entrant within a thread."""
+        state = self._lock_state
+        if getattr(state, "depth", 0) or fcntl is None:
+            state.depth = getattr(state, "depth", 0) + 1
+            try:
+                yield
+            finally:
+                state.depth -= 1
+            return
+
+        self._ensure_parent()
+        try:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as exc:
+            raise StorageError(f"could not open lock file {self.lock_path}: {exc}")
+        try:
+            deadline = time.monotonic() + self.lock_timeout
+            delay = 0.001
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise StorageError(f"timed out waiting for lock on {self.path}")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.05)
+            state.depth = 1
+            try:
+                self._recover()
+                yield
+            finally:
+                state.depth = 0
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def _recover(self) -> None:
+        # an in-place append or archive migration cut short by a crash;
+        # called holding the lock, before anything else changes the file
+        try:
+            if tailappend.recover(self.path):
+                self.clear_cache()
+        except (OSError, ValueError, KeyError) as exc:
+            raise StorageError(f"could not recover interrupted append to {self.path}: {exc}")
+        from . import archive
+
+        if os.path.exists(archive.pending_path(self.path)):
+            try:
+                archive.recover(self.path)
+            except (OSError, ValueError, KeyError) as exc:
+                raise StorageError(f"could not recover interrupted archiving of {self.path}: {exc}")
+
+    def _settle(self) -> None:
+        """Wait for (or recover from) an in-place append before reading."""
+        if fcntl is not None and os.path.exists(tailappend.undo_path(self.path)):
+            with self.locked():
+                pass
 
     def _ensure_parent(self) -> None:
         parent = os.path.dirname(os.path.abspath(self.path))
         if parent and not os.path.exists(parent):
             os.makedirs(parent, exist_ok=True)
 
+    def _cached(self) -> List[Task] | None:
+        signature = self._signature()
+        if signature is not None and signature == self._cache_signature:
+            self.cache_hits += 1
+            return self._cache
+        self.cache_misses += 1
+        return None
+
+    def _remember(self, tasks: List[Task]) -> None:
+        # called under the lock right after writing `tasks`
+        if self.cache_writes:
+            self._cache = list(tasks)
+            self._cache_signature = self._signature()
+
+    def clear_cache(self) -> None:
+        self._cache = None
+        self._cache_signature = None
+        self._table = None
+        self._by_id = None
+
+    def _cached_by_id(self) -> Dict[str, Task] | None:
+        """Id map over the load cache while it is current (no hit/miss counting)."""
+        signature = self._signature()
+        if self._cache is None or signature is None or signature != self._cache_signature:
+            return None
+        if self._by_id is None or self._by_id[0] != signature:
+            # the first of duplicated ids, like the id index and a linear scan
+            self._by_id = (signature, {t.id: t for t in reversed(self._cache)})
+        return self._by_id[1]
+
+    def table(self, build: bool = True):
+        """`(tasks, TaskTable)` of all tasks, rows in task order (needs numpy), cached like `load`.
+
+        Without `build` it is None unless the cached table is current.
+        """
+        from .table import TaskTable
+
+        signature = self._signature()
+        if self._table is None or self._table[0] != signature:
+            if not build:
+                return None
+            tasks = self.load()
+            self._table = (signature, tasks, TaskTable.from_tasks(tasks))
+        return self._table[1:]
+
     def load(self) -> List[Task]:
+        """Return all tasks, reusing the previous parse while the file is unchanged.
+
+        The returned list is a fresh copy, but the `Task` objects are shared
+        with the cache and should not be mutated without saving them.
+        """
+        cached = self._cached()
+        if cached is not None:
+            tasks = list(cached)
+            signature = self._cache_signature
+        else:
+            signature = self._signature()
+            tasks = self._load_uncached()
+            if signature is not None:
+                self._cache = list(tasks)
+                self._cache_signature = signature
+                if self._snapshot_only():
+                    # as parsed, before callers get to modify the tasks
+                    self._written = (signature, [_written_fields(t) for t in tasks])
+        self._loaded = (signature, {t.id for t in tasks})
+        return tasks
+
+    def _load_uncached(self) -> List[Task]:
         if not os.path.exists(self.path):
             return []
+        self._settle()
         try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except json.JSONDecodeError:
+                # Possibly an in-place append caught half way, even if its
+                # undo record is gone by now: read again under the writer
+                # lock, which waits for it (or recovers from its crash).
+                if fcntl is None:
+                    raise
+                with self.locked():
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
         except json.JSONDecodeError as exc:
             raise StorageError(f"invalid JSON in {self.path}: {exc}")
         except OSError as exc:
@@ -42,32 +296,818 @@ class Storage:
 
         return [Task.from_dict(t) for t in tasks_data]
 
+    def iter_tasks(self) -> Iterator[Task]:
+        """Yield stored tasks one at a time without loading the whole file."""
+        cached = self._cached()
+        if cached is not None:
+            yield from list(cached)
+        else:
+            yield from self._iter_uncached()
+
+    def _iter_uncached(self) -> Iterator[Task]:
+        if not os.path.exists(self.path):
+            return
+        self._settle()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for data in iter_task_objects(f):
+                    yield Task.from_dict(data)
+        except (ScanError, UnicodeDecodeError) as exc:
+            raise StorageError(f"invalid JSON in {self.path}: {exc}")
+        except OSError as exc:
+            raise StorageError(f"could not read {self.path}: {exc}")
+
+    @staticmethod
+    def _encode_task(task: Task) -> bytes:
+        # Same bytes json.dump(..., indent=2) produces for an element of the
+        # top-level "tasks" array, so offsets into the file can be recorded.
+        # Laid out by hand because the indenting encoder is pure Python;
+        # only the strings go through the (C) string encoder.
+        if task.tags:
+            tags = "[\n        " + ",\n        ".join(map(_encode_str, task.tags)) + "\n      ]"
+        else:
+            tags = "[]"
+        return (
+            '    {\n      "id": ' + _encode_str(task.id)
+            + ',\n      "description": ' + _encode_str(task.description)
+            + ',\n      "created": ' + _encode_str(task.created)
+            + ',\n      "completed": ' + ("true" if task.completed else "false")
+            + ',\n      "tags": ' + tags + "\n    }"
+        ).encode("utf-8")
+
+    def _signature(self) -> Signature | None:
+        """Signature of everything `load` reads; tags the sidecar indexes."""
+        return file_signature(self.path)
+
     def save(self, tasks: List[Task]) -> None:
+        with self.locked():
+            tasks = self._merge_concurrent(tasks)
+            before = self._signature()
+            entries, changes = self._write_snapshot(tasks)
+            if changes is None:
+                self._build_indexes(tasks, entries)
+            else:
+                # tasks kept their ids and order: only the spans moved
+                self.id_index.respan(entries, file_signature(self.path))
+                self.write_binary(tasks)
+                self._post_changed(tasks, changes, before)
+            self._loaded = (self._signature(), {t.id for t in tasks})
+            self._remember(tasks)
+
+    def _merge_concurrent(self, tasks: List[Task]) -> List[Task]:
+        """Append tasks that others added since our `load()`.
+
+        Tasks that were present at load time and are missing from `tasks`
+        were removed on purpose and stay removed. Without a prior load the
+        save simply replaces the file.
+        """
+        if self._loaded is None:
+            return tasks
+        loaded_signature, loaded_ids = self._loaded
+        if self._signature() == loaded_signature:
+            return tasks
+        ours = {t.id for t in tasks}
+        theirs = [t for t in self._load_uncached() if t.id not in ours and t.id not in loaded_ids]
+        return tasks + theirs if theirs else tasks
+
+    def _build_indexes(self, tasks: List[Task], entries) -> None:
+        # the posting indexes are left to the next query
+        self.id_index.build(entries, file_signature(self.path))
+        self.write_binary(tasks)
+
+    def write_binary(self, tasks: List[Task] | None = None) -> None:
+        """Regenerate the binary snapshot from `tasks` (default: the JSON file)."""
+        if self.binary_path is None:
+            return
+        from .binary import write_snapshot
+
+        if tasks is None:
+            tasks = Storage._load_uncached(self)
+        try:
+            write_snapshot(self.binary_path, tasks, file_signature(self.path), fsync=self.durability != "none")
+        except OSError as exc:
+            raise StorageError(f"could not write {self.binary_path}: {exc}")
+
+    def _snapshot_only(self) -> bool:
+        """True when every task lives in the snapshot file."""
+        return True
+
+    def _binary(self):
+        """Open the binary snapshot if it mirrors the current JSON file."""
+        if self.binary_path is None:
+            return None
+        from .binary import BinaryFormatError, BinarySnapshot
+
+        signature = file_signature(self.path)
+        try:
+            snapshot = BinarySnapshot(self.binary_path)
+        except (OSError, BinaryFormatError):
+            return None
+        if signature is None or snapshot.source != signature:
+            snapshot.close()
+            return None
+        return snapshot
+
+    def _post_added(self, added: List[Task], before: Signature | None) -> None:
+        """Update posting indexes after `added` were appended.
+
+        Indexes that matched `before`, the signature before the write, get
+        the new tasks posted without being loaded; the others stay stale
+        until a query needs them and rebuilds them.
+        """
+        after = self._signature()
+        for index in self.posting_indexes:
+            index.update({}, added, before, after)
+
+    def _post_changed(self, tasks: List[Task], changes: Tuple[Dict[int, tuple], int],
+                      before: Signature | None) -> None:
+        """Like `_post_added` for a save that changed tasks in place as well."""
+        changed, start = changes
+        pairs = {n: (Task(*fields[:4], list(fields[4])), tasks[n]) for n, fields in changed.items()}
+        after = self._signature()
+        for index in self.posting_indexes:
+            index.update(pairs, tasks[start:], before, after)
+
+    def _changes(self, fields: List[tuple]) -> Tuple[Dict[int, tuple], int] | None:
+        """Compare tasks about to be written with the file as we last parsed or wrote it.
+
+        Returns `(changed, start)`: the positions of tasks modified in place
+        (with their fields as written) and the position from which tasks are
+        new. None means the file must be rewritten in full: nothing read or
+        written yet, the file replaced since, tasks removed or reordered, or
+        no id index over spans this storage laid out itself.
+        """
+        written = self._written
+        signature = file_signature(self.path)
+        if written is None or signature is None or written[0] != signature:
+            return None
+        old = written[1]
+        if (len(fields) < len(old) or not self.id_index.is_fresh(signature) or not self.id_index.own_layout
+                or len(self.id_index) != len(old)):
+            return None
+        start = len(old)
+        if fields[:start] == old:
+            return {}, start
+        changed = {}
+        for n, (before, after) in enumerate(zip(old, fields)):
+            if before != after:
+                if before[0] != after[0]:
+                    return None
+                changed[n] = before
+        return changed, start
+
+    def _sync(self, f) -> None:
+        f.flush()
+        if self.durability != "none":
+            os.fsync(f.fileno())
+
+    def _write_snapshot(self, tasks: List[Task]):
+        """Atomically write the snapshot.
+
+        Returns `(entries, changes)`: `(id, offset, length)` per task, and
+        `_changes` for the tasks written (None if every task was encoded).
+        """
+        fields = [_written_fields(t) for t in tasks] if self.cache_writes or self._written is not None else None
+        changes = self._changes(fields) if fields is not None else None
+        self.clear_cache()
         self._ensure_parent()
-        data = {
-            "version": "1.0",
-            "updated": Task.create("_meta_", created=None).created,  # cheap timestamp
-            "tasks": [t.to_dict() for t in tasks],
-        }
+        updated = tailappend.timestamp()
+        head = (
+            "{\n"
+            f'  "version": {json.dumps("1.0")},\n'
+            f'  "updated": {json.dumps(updated, ensure_ascii=False)},\n'
+            '  "tasks": ['
+        ).encode("utf-8")
 
-        tmp_path = f"{self.path}.tmp"
+        entries = []
         try:
-            with open(tmp_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                f.flush()
-                os.fsync(f.fileno())
-            os.replace(tmp_path, self.path)
+            with atomic_write(self.path, "wb", fsync=self.durability != "none") as f:
+                f.write(head)
+                if changes is None:
+                    self._write_tasks(f, tasks, len(head), entries)
+                else:
+                    with open(self.path, "rb") as old:
+                        self._splice_tasks(f, old, tasks, changes, len(head), entries)
+                f.write(b"\n  ]\n}" if tasks else b"]\n}")
         except OSError as exc:
+            self._written = None
             raise StorageError(f"could not write {self.path}: {exc}")
+        self._written = (file_signature(self.path), fields) if fields is not None else None
+        return entries, changes
+
+    def _write_tasks(self, f, tasks: List[Task], offset: int, entries: list) -> None:
+        sep = b"\n"
+        for t in tasks:
+            chunk = self._encode_task(t)
+            f.write(sep)
+            offset += len(sep)
+            f.write(chunk)
+            entries.append((t.id, offset, len(chunk)))
+            offset += len(chunk)
+            sep = b",\n"
+
+    def _splice_tasks(self, f, old, tasks: List[Task], changes: Tuple[Dict[int, tuple], int], offset: int,
+                      entries: list) -> None:
+        """Like `_write_tasks`, copying unchanged tasks from the old file `old`.
+
+        Runs of unchanged tasks are adjacent in the old file (with the same
+        separators between them), so each run is copied as one block.
+        """
+        changed, start = changes
+        spans = self.id_index.spans()
+        run_start = run_end = -1
+
+        def copy_run() -> None:
+            old.seek(run_start)
+            remaining = run_end - run_start
+            while remaining:
+                block = old.read(min(remaining, 1 << 20))
+                if not block:
+                    raise OSError(f"{self.path} is shorter than its index")
+                f.write(block)
+                remaining -= len(block)
+
+        sep = b"\n"
+        for n, t in enumerate(tasks):
+            if n < start and n not in changed:
+                old_offset, length = spans[n]
+                if old_offset == run_end + 2:
+                    run_end = old_offset + length  # the ",\n" before it is copied too
+                else:
+                    if run_end >= 0:
+                        copy_run()
+                    f.write(sep)
+                    run_start, run_end = old_offset, old_offset + length
+                offset += len(sep)
+                entries.append((t.id, offset, length))
+                offset += length
+            else:
+                if run_end >= 0:
+                    copy_run()
+                    run_start = run_end = -1
+                chunk = self._encode_task(t)
+                f.write(sep)
+                offset += len(sep)
+                f.write(chunk)
+                entries.append((t.id, offset, len(chunk)))
+                offset += len(chunk)
+            sep = b",\n"
+        if run_end >= 0:
+            copy_run()
 
     def add_task(self, task: Task) -> None:
-        tasks = self.load()
-        tasks.append(task)
-        self.save(tasks)
+        if self._committer is not None:
+            self._committer.add(task)
+        else:
+            self.add_tasks([task])
+
+    def add_tasks(self, added: List[Task], defer_indexes: bool = False) -> None:
+        """Append several tasks with a single write.
+
+        With `defer_indexes` the tag, trigram and term indexes are left stale
+        and rebuilt by the first query that needs them, which keeps bulk
+        imports from paying for indexes nobody may use.
+        """
+        with self.locked():
+            before = self._signature()
+            if self._append_in_place(added):
+                if not defer_indexes:
+                    self._post_added(added, before)
+                return
+            tasks = self._cached()
+            tasks = list(tasks) if tasks is not None else self._load_uncached()
+            tasks.extend(added)
+            entries, _ = self._write_snapshot(tasks)
+            self.id_index.build(entries, file_signature(self.path))
+            self.write_binary(tasks)
+            if not defer_indexes:
+                self._post_added(added, before)
+            self._remember(tasks)
+
+    def _append_in_place(self, added: List[Task]) -> bool:
+        """Write `added` over the end of the file instead of rewriting it.
+
+        Keeps the load cache and id index current if they were. False when
+        the file is not laid out as `_write_snapshot` writes it (or there is
+        no lock to make the patch safe, or a binary snapshot to rewrite).
+        """
+        if fcntl is None or self.binary_path is not None or not added:
+            return False
+        before = file_signature(self.path)
+        if before is None:
+            return False
+        cached = self._cache if self._cache_signature == before else None
+        written = self._written if self._written is not None and self._written[0] == before else None
+        try:
+            spans = tailappend.append(self.path, [self._encode_task(t) for t in added],
+                                      fsync=self.durability != "none")
+        except OSError as exc:
+            raise StorageError(f"could not write {self.path}: {exc}")
+        if spans is None:
+            return False
+
+        table = self._table if self._table is not None and self._table[0] == before else None
+        self.clear_cache()
+        after = file_signature(self.path)
+        self.id_index.extend([(t.id, offset, length) for t, (offset, length) in zip(added, spans)], before, after)
+        if cached is not None:
+            self._remember(cached + added)
+            if table is not None and self._cache_signature is not None:
+                # appending rows keeps the table from re-parsing every timestamp
+                self._table = (self._cache_signature, table[1] + added, table[2].appended(added))
+        if written is not None:
+            written[1].extend(_written_fields(t) for t in added)
+            self._written = (after, written[1])
+        else:
+            self._written = None
+        return True
+
+    def reindex(self) -> None:
+        """Rebuild the id index from the current data file."""
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            signature = file_signature(self.path)
+            entries = [(str(obj.get("id", "")), off, length) for obj, off, length in iter_task_spans(raw)]
+        except (ScanError, UnicodeDecodeError) as exc:
+            raise StorageError(f"invalid JSON in {self.path}: {exc}")
+        except OSError as exc:
+            raise StorageError(f"could not read {self.path}: {exc}")
+        # scanned rather than written here, so the layout is not known to be ours
+        self.id_index.build(entries, signature, own_layout=False)
+
+    def archive_completed(self, older_than: timedelta) -> int:
+        """Move completed tasks created more than `older_than` ago to the archive.
+
+        Streams the data file: archived tasks go straight into the archive
+        and only the tasks that stay are kept to rewrite the file. Returns
+        the number of tasks moved.
+        """
+        from . import archive
+
+        cutoff = datetime.now(timezone.utc) - older_than
+        with self.locked():
+            try:
+                with archive.Appender(self.path, fsync=self.durability != "none") as out:
+                    kept = []
+                    for t in self.iter_tasks():
+                        if archive.archivable(t, cutoff):
+                            out.add(t)
+                        else:
+                            kept.append(t)
+                    if out.count:
+                        out.close()  # archived for good before they leave the data file
+                        self._loaded = None  # under the lock `kept` is the whole file
+                        self.save(kept)
+            except (OSError, ValueError, KeyError) as exc:
+                raise StorageError(f"could not archive tasks of {self.path}: {exc}")
+        return out.count
+
+    def iter_archived(self) -> Iterator[Task]:
+        """Stream the tasks moved to the archive by `archive_completed`."""
+        from . import archive
+
+        try:
+            yield from archive.iter_archived(self.path)
+        except (OSError, ValueError, EOFError) as exc:
+            raise StorageError(f"could not read the archive of {self.path}: {exc}")
+
+    def archived_ids(self) -> Set[str]:
+        """Ids of the archived tasks, which new tasks must not reuse."""
+        from . import archive
+
+        try:
+            return archive.archived_ids(self.path)
+        except (OSError, ValueError, EOFError) as exc:
+            raise StorageError(f"could not read the archive of {self.path}: {exc}")
 
     def get_task_by_id(self, id: str) -> Task | None:
+        found = self.get_tasks_by_ids([id])
+        return found[0] if found else None
+
+    def get_tasks_by_ids(self, ids: Iterable[str]) -> List[Task]:
+        """Return the tasks for `ids` in the given order, skipping unknown ids.
+
+        Tasks come from the load cache when it is current, otherwise each is
+        decoded from its byte span recorded in the id index.
+        """
+        if not os.path.exists(self.path):
+            return []
+        ids = list(ids)
+        by_id = self._cached_by_id()
+        if by_id is not None:
+            return [by_id[id] for id in ids if id in by_id]
+        snapshot = self._binary()
+        if snapshot is not None:
+            with snapshot:
+                ordinals = (snapshot.find(id) for id in ids)
+                return [snapshot.task(i) for i in ordinals if i is not None]
+        if not self.id_index.is_fresh(file_signature(self.path)):
+            self.reindex()
+        found = self._read_spans(ids)
+        if found is None:
+            # the file changed without its signature changing (coarse
+            # mtimes); rebuild once rather than trust the old offsets
+            self.reindex()
+            found = self._read_spans(ids) or []
+        return found
+
+    def _read_spans(self, ids: List[str]) -> List[Task] | None:
+        out = []
+        try:
+            with open(self.path, "rb") as f:
+                for id in ids:
+                    span = self.id_index.lookup(id)
+                    if span is None:
+                        continue
+                    f.seek(span[0])
+                    try:
+                        data = json.loads(f.read(span[1]))
+                    except ValueError:
+                        return None
+                    if not isinstance(data, dict) or data.get("id") != id:
+                        return None
+                    out.append(Task.from_dict(data))
+        except OSError as exc:
+            raise StorageError(f"could not read {self.path}: {exc}")
+        return out
+
+    def find_by_tag(self, tag: str, ignore_case: bool = False) -> List[Task]:
+        """Tasks carrying `tag`, located through the tag index."""
+        if self._fresh(self.tag_index) is None:
+            return []
+        if _scan_cheaper(self.tag_index.count(tag, ignore_case), len(self.tag_index)):
+            tasks = _first_of_each_id(self.iter_tasks())
+        else:
+            tasks = self.get_tasks_by_ids(self.tag_index.lookup(tag, ignore_case))
+        # postings name ids; with a duplicated id the lookup finds the first task
+        if ignore_case:
+            folded = tag.lower()
+            return [t for t in tasks if any(x.lower() == folded for x in t.tags)]
+        return [t for t in tasks if tag in t.tags]
+
+    def description_candidates(self, query: str) -> List[Task] | None:
+        """Tasks whose description may contain `query`, ignoring case.
+
+        Narrowed through the trigram index; callers still verify the match.
+        Returns None for queries too short to use the index, or matching so
+        many tasks that scanning them all is cheaper.
+        """
+        if self._fresh(self.trigram_index) is None:
+            return []
+        ids = self.trigram_index.candidates(query)
+        if ids is None or _scan_cheaper(len(ids), len(self.trigram_index)):
+            return None
+        return self.get_tasks_by_ids(ids)
+
+    def _fresh(self, index: PostingIndex) -> PostingIndex | None:
+        """`index` brought up to date with the data; None if there is no data file."""
+        signature = self._signature()
+        if signature is None:
+            return None
+        if not index.is_fresh(signature) or index.overgrown():
+            # streamed, so that a build holds the postings but not the tasks
+            index.build(self.iter_tasks(), signature)
+        return index
+
+    def _fresh_term_index(self) -> TermIndex | None:
+        return self._fresh(self.term_index)
+
+    def term_corpus(self, query: str) -> Tuple[int, int, Dict[str, int]]:
+        """Collection statistics for `query`; see `TermIndex.corpus`."""
+        index = self._fresh_term_index()
+        return index.corpus(query) if index is not None else (0, 0, {})
+
+    def rank(self, query: str, limit: int | None = None, match_all: bool = False,
+             corpus: Tuple[int, int, Dict[str, int]] | None = None) -> List[Tuple[Task, float]]:
+        """Tasks matching the terms of `query`, best BM25 score first."""
+        index = self._fresh_term_index()
+        if index is None:
+            return []
+        scored = index.top(query, limit, match_all, corpus)
+        tasks = {t.id: t for t in self.get_tasks_by_ids(id for id, _ in scored)}
+        return [(tasks[id], score) for id, score in scored if id in tasks]
+
+    def query(self, tag: str | None = None, completed: bool | None = None) -> List[Task]:
+        """Return tasks filtered by tag and/or completion state, in storage order."""
+        if not tag and completed is not None and self._snapshot_only():
+            snapshot = self._binary()
+            if snapshot is not None:
+                # reads only the completed flags, then decodes the hits
+                with snapshot:
+                    return [snapshot.task(i) for i in range(len(snapshot)) if snapshot.completed(i) == completed]
+        tasks = self.find_by_tag(tag) if tag else self.iter_tasks()
+        return [t for t in tasks if completed is None or t.completed == completed]
+
+
+class JournalStorage(Storage):
+    """Snapshot plus append-only journal.
+
+    The snapshot at `path` keeps the regular `{"version", "updated", "tasks"}`
+    layout. `add_task` appends one JSON record per line to `<path>.journal`;
+    `load` replays those records on top of the snapshot. Once the journal
+    holds `compact_threshold` records it is folded into a new snapshot.
+    """
+
+    def __init__(self, path: str = "tasks.json", compact_threshold: int = 1000, binary: bool = False,
+                 durability: str = "always") -> None:
+        super().__init__(path, binary=binary, durability=durability)
+        self.journal_path = f"{path}.journal"
+        self.compact_threshold = compact_threshold
+
+    def _read_journal(self) -> List[Task]:
+        if not os.path.exists(self.journal_path):
+            return []
+        try:
+            with open(self.journal_path, "rb") as f:
+                lines = f.read().split(b"\n")
+        except OSError as exc:
+            raise StorageError(f"could not read {self.journal_path}: {exc}")
+
+        tasks = []
+        last = len(lines) - 1
+        for n, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                if n == last:
+                    # torn write from an interrupted append; the record was
+                    # never acknowledged, so it is dropped
+                    break
+                raise StorageError(f"invalid journal record in {self.journal_path}: {exc}")
+            if not isinstance(record, dict) or record.get("op") != "add":
+                raise StorageError(f"unexpected journal record in {self.journal_path}")
+            tasks.append(Task.from_dict(record.get("task", {})))
+        return tasks
+
+    def _load_uncached(self) -> List[Task]:
+        tasks = super()._load_uncached()
+        pending = self._read_journal()
+        if not pending:
+            return tasks
+        # Replay is idempotent: a record whose id is already in the snapshot
+        # (e.g. after a compaction that crashed before removing the journal)
+        # replaces the task instead of duplicating it.
+        position = {t.id: i for i, t in enumerate(tasks)}
+        for task in pending:
+            i = position.get(task.id)
+            if i is None:
+                position[task.id] = len(tasks)
+                tasks.append(task)
+            else:
+                tasks[i] = task
+        return tasks
+
+    def _iter_uncached(self) -> Iterator[Task]:
+        # same order as load(): journal records replace snapshot tasks in
+        # place, new ones follow the snapshot
+        pending = {t.id: t for t in self._read_journal()}
+        for task in super()._iter_uncached():
+            yield pending.pop(task.id, task)
+        yield from pending.values()
+
+    def _snapshot_only(self) -> bool:
+        return not os.path.exists(self.journal_path)
+
+    def _signature(self) -> Signature | None:
+        data = file_signature(self.path)
+        journal = file_signature(self.journal_path)
+        if data is None and journal is None:
+            return None
+        return (data or (0, -1, 0)) + (journal or (0, -1, 0))
+
+    def save(self, tasks: List[Task]) -> None:
+        with self.locked():
+            tasks = self._merge_concurrent(tasks)
+            entries, _ = self._write_snapshot(tasks)
+            try:
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+            except OSError as exc:
+                raise StorageError(f"could not remove {self.journal_path}: {exc}")
+            self._build_indexes(tasks, entries)
+            self._loaded = (self._signature(), {t.id for t in tasks})
+            self._remember(tasks)
+
+    def add_tasks(self, added: List[Task], defer_indexes: bool = False) -> None:
+        records = b"".join(
+            json.dumps({"op": "add", "task": t.to_dict()}, ensure_ascii=False).encode("utf-8") + b"\n"
+            for t in added
+        )
+        with self.locked():
+            self.clear_cache()
+            before = self._signature()
+            try:
+                with open(self.journal_path, "ab") as f:
+                    self._drop_torn_tail(f)
+                    f.write(records)
+                    self._sync(f)
+            except OSError as exc:
+                raise StorageError(f"could not write {self.journal_path}: {exc}")
+
+            if self.journal_length() >= self.compact_threshold:
+                self.compact()
+            elif not defer_indexes:
+                self._post_added(added, before)
+
+    @staticmethod
+    def _drop_torn_tail(f) -> None:
+        # An append that was interrupted leaves a partial last line; cut it
+        # off so the next record starts on a line of its own.
+        end = f.seek(0, os.SEEK_END)
+        with open(f.name, "rb") as r:
+            pos = end
+            while pos > 0:
+                start = max(0, pos - 4096)
+                r.seek(start)
+                block = r.read(pos - start)
+                if pos == end and block.endswith(b"\n"):
+                    return
+                cut = block.rfind(b"\n")
+                if cut >= 0:
+                    pos = start + cut + 1
+                    break
+                pos = start
+        if pos != end:
+            f.truncate(pos)
+
+    def journal_length(self) -> int:
+        try:
+            with open(self.journal_path, "rb") as f:
+                return sum(1 for line in f if line.strip())
+        except FileNotFoundError:
+            return 0
+        except OSError as exc:
+            raise StorageError(f"could not read {self.journal_path}: {exc}")
+
+    def get_tasks_by_ids(self, ids: Iterable[str]) -> List[Task]:
+        # later journal records supersede earlier ones and the snapshot
+        ids = list(ids)
+        pending = {t.id: t for t in self._read_journal()}
+        snapshot = {t.id: t for t in super().get_tasks_by_ids(i for i in ids if i not in pending)}
+        out = []
+        for id in ids:
+            task = pending.get(id) or snapshot.get(id)
+            if task is not None:
+                out.append(task)
+        return out
+
+    def compact(self) -> None:
+        """Fold the journal into a fresh snapshot and drop the journal."""
+        with self.locked():
+            self.save(self.load())
+
+
+class BufferedStorage:
+    """Keeps added tasks in memory until `commit()` writes them in one go.
+
+    Wraps any storage backend for sessions running many commands (`speckit
+    shell` / `batch`). Reads see the committed tasks followed by the pending
+    ones; everything else is delegated to the wrapped storage.
+    """
+
+    def __init__(self, storage) -> None:
+        self.storage = storage
+        self.pending: List[Task] = []
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def load(self) -> List[Task]:
+        return self.storage.load() + self.pending
+
+    def iter_tasks(self) -> Iterator[Task]:
+        iter_tasks = getattr(self.storage, "iter_tasks", None)
+        yield from iter_tasks() if iter_tasks is not None else self.storage.load()
+        yield from list(self.pending)
+
+    def add_task(self, task: Task) -> None:
+        self.pending.append(task)
+
+    def add_tasks(self, added: List[Task], defer_indexes: bool = False) -> None:
+        self.pending.extend(added)
+
+    def save(self, tasks: List[Task]) -> None:
+        self.pending = []
+        self.storage.save(tasks)
+
+    def commit(self) -> int:
+        """Write the pending tasks; returns how many were written."""
+        count = len(self.pending)
+        if self.pending:
+            self.storage.add_tasks(self.pending)
+            self.pending = []
+        return count
+
+    def get_task_by_id(self, id: str) -> Task | None:
+        found = self.get_tasks_by_ids([id])
+        return found[0] if found else None
+
+    def get_tasks_by_ids(self, ids: Iterable[str]) -> List[Task]:
+        ids = list(ids)
+        pending = {t.id: t for t in self.pending}
+        if hasattr(self.storage, "get_tasks_by_ids"):
+            stored = self.storage.get_tasks_by_ids(i for i in ids if i not in pending)
+        else:
+            stored = [t for t in map(self.storage.get_task_by_id, ids) if t is not None]
+        found = {t.id: t for t in stored}
+        found.update(pending)
+        return [found[i] for i in ids if i in found]
+
+    def query(self, tag: str | None = None, completed: bool | None = None) -> List[Task]:
+        pending = [t for t in self.pending
+                   if (not tag or tag in t.tags) and (completed is None or t.completed == completed)]
+        return self.storage.query(tag=tag, completed=completed) + pending
+
+    def find_by_tag(self, tag: str, ignore_case: bool = False) -> List[Task]:
+        if ignore_case:
+            pending = [t for t in self.pending if tag.lower() in (x.lower() for x in t.tags)]
+        else:
+            pending = [t for t in self.pending if tag in t.tags]
+        return self.storage.find_by_tag(tag, ignore_case) + pending
+
+    def scan(self, predicate, args: tuple, jobs: int) -> List[Task]:
+        scan = getattr(self.storage, "scan", None)
+        if scan is None:
+            from .parallel import parallel_filter
+
+            return parallel_filter(self.load(), predicate, args, jobs)
+        return scan(predicate, args, jobs) + [t for t in self.pending if predicate(t, *args)]
+
+    def candidates(self, tag: str | None = None, completed: bool | None = None, since=None,
+                   until=None) -> Iterator[Task]:
+        candidates = getattr(self.storage, "candidates", None)
+        yield from candidates(tag, completed, since, until) if candidates is not None else self.storage.iter_tasks()
+        # the caller applies the filters to every candidate
+        yield from list(self.pending)
+
+    def table(self, build: bool = True):
+        table = getattr(self.storage, "table", None)
+        if table is not None and not self.pending:
+            return table(build)
+        if not build:
+            return None
+        from .table import TaskTable
+
         tasks = self.load()
-        for t in tasks:
-            if t.id == id:
-                return t
-        return None
+        return tasks, TaskTable.from_tasks(tasks)
+
+    def description_candidates(self, query: str) -> List[Task] | None:
+        stored = self.storage.description_candidates(query)
+        # pending tasks are not indexed; the caller verifies every candidate
+        return None if stored is None else stored + self.pending
+
+    def rank(self, query: str, limit: int | None = None, match_all: bool = False) -> List[Tuple[Task, float]]:
+        if not self.pending:
+            return self.storage.rank(query, limit, match_all)
+        # scores depend on every document, so rank over an in-memory index
+        tasks = self.load()
+        index = TermIndex(None)
+        index.build(tasks, None)
+        by_id = {t.id: t for t in tasks}
+        return [(by_id[id], score) for id, score in index.top(query, limit, match_all)]
+
+
+BACKENDS = ("json", "journal", "sqlite", "sharded", "segmented")
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def open_storage(path: str, backend: str | None = None, binary: bool = False, durability: str = "always",
+                 shards: int | None = None):
+    """Return the storage implementation selected by `backend`.
+
+    Without an explicit backend, directories open the sharded storage (or
+    the segmented one, if their manifest says so), paths ending in
+    `.db`/`.sqlite` the SQLite backend and anything else the JSON file
+    storage. `binary` keeps a binary snapshot next to JSON data files;
+    `durability` is passed to the JSON storages. `shards` is the shard
+    count of a sharded directory created by the first write.
+    """
+    if backend is None:
+        if os.path.isdir(path):
+            from .partitioned import read_manifest
+            from .segmented import FORMAT
+
+            manifest = read_manifest(path) or {}
+            backend = "segmented" if manifest.get("format") == FORMAT else "sharded"
+        else:
+            backend = "sqlite" if path.lower().endswith(SQLITE_SUFFIXES) else "json"
+    if backend == "sharded":
+        from .sharded import ShardedStorage
+
+        return ShardedStorage(path, shards=shards, binary=binary, durability=durability)
+    if backend == "segmented":
+        from .segmented import SegmentedStorage
+
+        return SegmentedStorage(path, binary=binary, durability=durability)
+    if backend == "sqlite":
+        from .sqlite_storage import SqliteStorage
+
+        return SqliteStorage(path)
+    if backend == "journal":
+        return JournalStorage(path, binary=binary, durability=durability)
+    if backend == "json":
+        return Storage(path, binary=binary, durability=durability)
+    raise StorageError(f"unknown storage backend: {backend}")
@@ -0,0 +1,146 @@
+"""Column-oriented task table for vectorized filtering.
+
+`TaskTable` stores tasks as a struct of NumPy arrays: a bool array for
+`completed`, int64 microseconds since the epoch for `created`, tags
+dictionary-encoded in a CSR layout (`tag_offsets`/`tag_ids` into
+`tag_names`) and descriptions as one UTF-8 buffer with offsets. Filters are
+evaluated as boolean masks over whole columns.
+
+NumPy is optional; `available()` reports whether the table can be used.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+from .models import Task, parse_timestamp
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_MIN = -(2 ** 63)
+_US = timedelta(microseconds=1)
+
+
+def available() -> bool:
+    return np is not None
+
+
+def epoch_us(ts: datetime) -> int:
+    return (ts - _EPOCH) // _US
+
+
+def _created_us(value: str) -> int:
+    try:
+        return epoch_us(parse_timestamp(value))
+    except ValueError:
+        return _EPOCH_MIN
+
+
+class TaskTable:
+    def __init__(self, tasks: Sequence[Task]) -> None:
+        if np is None:
+            raise RuntimeError("TaskTable requires numpy")
+        n = len(tasks)
+        self.ids: List[str] = [t.id for t in tasks]
+        self.created_text: List[str] = [t.created for t in tasks]
+        self.completed = np.fromiter((t.completed for t in tasks), dtype=np.bool_, count=n)
+        self.created = np.fromiter((_created_us(t.created) for t in tasks), dtype=np.int64, count=n)
+        # unparseable timestamps never satisfy a date filter
+        self.created_valid = self.created != _EPOCH_MIN
+
+        tag_codes: Dict[str, int] = {}
+        tag_ids: List[int] = []
+        tag_offsets = np.zeros(n + 1, dtype=np.int64)
+        for i, t in enumerate(tasks):
+            for tag in t.tags:
+                tag_ids.append(tag_codes.setdefault(tag, len(tag_codes)))
+            tag_offsets[i + 1] = len(tag_ids)
+        self.tag_names: List[str] = list(tag_codes)
+        self.tag_codes = tag_codes
+        self.tag_ids = np.array(tag_ids, dtype=np.int32)
+        self.tag_offsets = tag_offsets
+
+        encoded = [t.description.encode("utf-8") for t in tasks]
+        self.desc_offsets = np.zeros(n + 1, dtype=np.int64)
+        if n:
+            np.cumsum(np.fromiter((len(b) for b in encoded), dtype=np.int64, count=n), out=self.desc_offsets[1:])
+        self.desc_bytes = b"".join(encoded)
+
+    @classmethod
+    def from_tasks(cls, tasks: Sequence[Task]) -> "TaskTable":
+        return cls(tasks)
+
+    def appended(self, tasks: Sequence[Task]) -> "TaskTable":
+        """A new table of these rows followed by `tasks`; only the new rows are parsed."""
+        more = TaskTable(tasks)
+        out = TaskTable.__new__(TaskTable)
+        out.ids = self.ids + more.ids
+        out.created_text = self.created_text + more.created_text
+        out.completed = np.concatenate([self.completed, more.completed])
+        out.created = np.concatenate([self.created, more.created])
+        out.created_valid = np.concatenate([self.created_valid, more.created_valid])
+        out.tag_codes = dict(self.tag_codes)
+        for name in more.tag_names:
+            out.tag_codes.setdefault(name, len(out.tag_codes))
+        out.tag_names = list(out.tag_codes)
+        remap = np.array([out.tag_codes[name] for name in more.tag_names], dtype=np.int32)
+        out.tag_ids = np.concatenate([self.tag_ids, remap[more.tag_ids] if len(more.tag_ids) else more.tag_ids])
+        out.tag_offsets = np.concatenate([self.tag_offsets, more.tag_offsets[1:] + self.tag_offsets[-1]])
+        out.desc_offsets = np.concatenate([self.desc_offsets, more.desc_offsets[1:] + self.desc_offsets[-1]])
+        out.desc_bytes = self.desc_bytes + more.desc_bytes
+        return out
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def description(self, i: int) -> str:
+        return self.desc_bytes[self.desc_offsets[i]:self.desc_offsets[i + 1]].decode("utf-8")
+
+    def tags(self, i: int) -> List[str]:
+        return [self.tag_names[c] for c in self.tag_ids[self.tag_offsets[i]:self.tag_offsets[i + 1]]]
+
+    def task(self, i: int) -> Task:
+        return Task(
+            id=self.ids[i],
+            description=self.description(i),
+            created=self.created_text[i],
+            completed=bool(self.completed[i]),
+            tags=self.tags(i),
+        )
+
+    def to_tasks(self) -> List[Task]:
+        return [self.task(i) for i in range(len(self))]
+
+    def mask(
+        self,
+        tag: str | None = None,
+        completed: bool | None = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ):
+        """Boolean row mask for the given filters (all of them must hold)."""
+        out = np.ones(len(self), dtype=np.bool_)
+        if tag:
+            code = self.tag_codes.get(tag)
+            rows = np.zeros(len(self), dtype=np.bool_)
+            if code is not None:
+                positions = np.flatnonzero(self.tag_ids == code)
+                rows[np.searchsorted(self.tag_offsets, positions, side="right") - 1] = True
+            out &= rows
+        if completed is not None:
+            out &= self.completed == completed
+        if since is not None or until is not None:
+            out &= self.created_valid
+        if since is not None:
+            out &= self.created >= epoch_us(since)
+        if until is not None:
+            out &= self.created < epoch_us(until)
+        return out
+
+    def take(self, mask) -> List[Task]:
+        return [self.task(int(i)) for i in np.flatnonzero(mask)]
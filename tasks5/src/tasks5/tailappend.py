@@ -0,0 +1,128 @@
+"""Appending tasks to a tasks.json file in place.
+
+Adding a task normally means parsing and rewriting the whole file. When the
+file starts and ends the way `Storage` writes it, the new tasks can instead
+be written over the closing `]` and the `"updated"` value (always the same
+width, see `timestamp`) patched where it stands; nothing else in the file
+moves, so the spans in the id index stay valid.
+
+The patch is not atomic. An undo record (`<path>.undo`) is written
+atomically before the file is touched and removed once the file is synced.
+`recover` finds an append interrupted by a crash through that record: if
+every appended byte reached the file (the record has their checksum) the
+append stands, otherwise the file is put back exactly as it was.
+Both run under the storage's writer lock.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from .atomic import atomic_write
+
+
+_HEAD = re.compile(rb'\{\n  "version": "[^"\\\n]*",\n  "updated": "([^"\\\n]*)",\n  "tasks": \[')
+_CLOSE = b"\n  ]\n}"
+
+
+def timestamp() -> str:
+    """Current UTC time as ISO 8601, always with microseconds (32 characters)."""
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def undo_path(path: str) -> str:
+    return f"{path}.undo"
+
+
+def append(path: str, chunks: List[bytes], fsync: bool = True) -> Optional[List[Tuple[int, int]]]:
+    """Write encoded tasks at the end of the task array in `path`.
+
+    Returns the `(offset, length)` of each chunk in the file, or None, with
+    the file untouched, when it does not have the expected layout.
+    """
+    import zlib
+
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return None
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        head = _HEAD.match(f.read(256))
+        stamp = timestamp().encode("utf-8")
+        if head is None or len(head.group(1)) != len(stamp):
+            return None
+        f.seek(max(0, size - len(_CLOSE) - 1))
+        tail = f.read()
+        if size == head.end() + 3 and tail.endswith(b"[]\n}"):
+            at, sep = head.end(), b"\n"  # empty array
+        elif tail == b"}" + _CLOSE:
+            at, sep = size - len(_CLOSE), b",\n"
+        else:
+            return None
+
+        spans = []
+        parts = []
+        offset = at
+        for chunk in chunks:
+            parts += (sep, chunk)
+            offset += len(sep)
+            spans.append((offset, len(chunk)))
+            offset += len(chunk)
+            sep = b",\n"
+        parts.append(_CLOSE)
+        payload = b"".join(parts)
+
+        record = {
+            "size": size,
+            "at": at,
+            "replaced": tail[len(tail) - (size - at):].decode("ascii"),
+            "updated_at": head.start(1),
+            "updated": head.group(1).decode("utf-8"),
+            "length": len(payload),
+            "crc32": zlib.crc32(payload),
+        }
+        with atomic_write(undo_path(path), "w", fsync=fsync) as u:
+            u.write(json.dumps(record))
+        try:
+            f.seek(at)
+            f.write(payload)
+            f.seek(head.start(1))
+            f.write(stamp)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        except OSError:
+            f.close()
+            recover(path)
+            raise
+    os.remove(undo_path(path))
+    return spans
+
+
+def recover(path: str) -> bool:
+    """Settle an append interrupted by a crash; True if there was one."""
+    import zlib
+
+    undo = undo_path(path)
+    try:
+        with open(undo, "r", encoding="utf-8") as u:
+            record = json.load(u)
+    except FileNotFoundError:
+        return False
+    with open(path, "r+b") as f:
+        f.seek(record["at"])
+        written = f.read(record["length"] + 1)
+        if len(written) != record["length"] or zlib.crc32(written) != record["crc32"]:
+            f.seek(record["at"])
+            f.write(record["replaced"].encode("ascii"))
+            f.truncate(record["size"])
+            f.seek(record["updated_at"])
+            f.write(record["updated"].encode("utf-8"))
+            f.flush()
+        os.fsync(f.fileno())  # before the record that could undo it is gone
+    os.remove(undo)
+    return True
@@ -1,11 +1,26 @@
+import asyncio
+import functools
+import gzip
+import json
 import os
+import subprocess
+import sys
+import threading
 import tempfile
 from types import SimpleNamespace
 
+import pytest
+
 from tasks5.commands import add as add_cmd
+from tasks5.commands import export as export_cmd
+from tasks5.commands import import_ as import_cmd
 from tasks5.commands import list as list_cmd
-from tasks5.models import Task
-from tasks5.storage import Storage
+from tasks5.commands import search as search_cmd
+from tasks5.commands import shell as shell_cmd
+from tasks5 import cli, client, commands, daemon, table
+from tasks5.models import Task, parse_timestamp
+from tasks5.parallel import parallel_filter
+from tasks5.storage import Storage, open_storage
 
 
 def test_add_and_list_command_output(capsys):
@@ -25,3 +40,428 @@ def test_add_and_list_command_output(capsys):
         captured = capsys.readouterr()
         assert "My task" in captured.out
         assert rc == 0
+
+
+def test_add_rejects_duplicate_id_and_tag_lookups_check_tags(tmp_path, capsys):
+    data = str(tmp_path / "tasks.json")
+    assert cli.main(["--data-file", data, "add", "foo", "--id", "1", "-t", "a"]) == 0
+    assert cli.main(["--data-file", data, "add", "bar", "--id", "1", "-t", "b"]) == 2
+    assert "already exists" in capsys.readouterr().out
+
+    # files written before the check may still hold duplicated ids
+    storage = Storage(data)
+    storage.save(storage.load() + [Task.create("bar", id="1", tags=["b"])])
+    assert storage.find_by_tag("b") == [] and storage.query(tag="b") == []
+    assert [t.description for t in storage.find_by_tag("A", ignore_case=True)] == ["foo"]
+
+
+def test_search_uses_indexes(capsys):
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        storage = Storage(path)
+        storage.save([Task.create("Write Report draft", tags=["School"], id="t1")])
+        assert storage.description_candidates("draft") is not None  # builds the trigram index
+        storage.add_task(Task.create("Buy groceries", tags=["home"], id="t2"))
+        storage.add_task(Task.create("report back", tags=["school"], id="t3"))
+
+        # add_task posted the new tasks into the trigram index incrementally
+        assert storage.trigram_index.is_fresh(storage._signature())
+        assert [t.id for t in storage.description_candidates("REPORT")] == ["t1", "t3"]
+        assert storage.description_candidates("re") is None
+
+        ctx = SimpleNamespace(storage=storage)
+        args = SimpleNamespace(query="Report", field="description", ignore_case=False, json=False)
+        assert search_cmd.run(args, ctx) == 0
+        assert capsys.readouterr().out.splitlines() == ["t1: Write Report draft"]
+
+        args = SimpleNamespace(query="report", field="description", ignore_case=True, json=False)
+        assert search_cmd.run(args, ctx) == 0
+        assert [line[:2] for line in capsys.readouterr().out.splitlines()] == ["t1", "t3"]
+
+        args = SimpleNamespace(query="SCHOOL", field="tags", ignore_case=True, json=False)
+        assert search_cmd.run(args, ctx) == 0
+        assert [line[:2] for line in capsys.readouterr().out.splitlines()] == ["t1", "t3"]
+
+
+def test_ranked_search_orders_by_bm25(capsys):
+    with tempfile.TemporaryDirectory() as d:
+        storage = Storage(os.path.join(d, "tasks.json"))
+        storage.save([
+            Task.create("Quarterly report for finance team meeting", id="long"),
+            Task.create("Report report", id="dense"),
+            Task.create("Plan team offsite", tags=["report"], id="tagged"),
+            Task.create("Water the plants", id="other"),
+        ])
+
+        assert [t.id for t, _ in storage.rank("report")] == ["dense", "tagged", "long"]
+        assert [t.id for t, _ in storage.rank("report team", match_all=True)] == ["tagged", "long"]
+        assert [t.id for t, _ in storage.rank("report plants", limit=1)] == ["other"]
+
+        ctx = SimpleNamespace(storage=storage)
+        args = SimpleNamespace(query="report", rank=True, limit=2, all_terms=False, json=False)
+        assert search_cmd.run(args, ctx) == 0
+        assert [line.split(":")[0] for line in capsys.readouterr().out.splitlines()] == ["dense", "tagged"]
+
+
+def test_parallel_filter_keeps_order():
+    tasks = [Task.create(f"task {i}", tags=["even"] if i % 2 == 0 else [], id=str(i)) for i in range(50)]
+    expected = [t for t in tasks if search_cmd._matches(t, "even", "tags", False)]
+    got = parallel_filter(tasks, search_cmd._matches, ("even", "tags", False), jobs=2, chunk_size=7, min_tasks=0)
+    assert got == expected
+    assert list_cmd._filter_tasks(tasks, "even", False, jobs=2) == expected
+
+
+def test_list_filters_by_created_date(capsys, monkeypatch):
+    with tempfile.TemporaryDirectory() as d:
+        storage = Storage(os.path.join(d, "tasks.json"))
+        storage.save([
+            Task.create("Old", id="old", created="2026-08-31T23:59:59Z"),
+            Task.create("New", id="new", tags=["home"], created="2026-09-01T00:00:00+00:00"),
+            Task.create("Later", id="later", tags=["home"], created="2026-10-02T09:00:00+02:00"),
+        ])
+        ctx = SimpleNamespace(storage=storage)
+        args = SimpleNamespace(tag=None, completed=False, incomplete=False, json=False,
+                               since=parse_timestamp("2026-09-01"), until=parse_timestamp("2026-10-01"))
+        assert list_cmd.run(args, ctx) == 0
+        assert [line.split()[0] for line in capsys.readouterr().out.splitlines()[1:]] == ["new"]
+
+        args.tag, args.until = "home", None
+        assert list_cmd.run(args, ctx) == 0
+        assert [line.split()[0] for line in capsys.readouterr().out.splitlines()[1:]] == ["new", "later"]
+
+        # worker processes see `created` too
+        monkeypatch.setattr(list_cmd, "parallel_filter", functools.partial(parallel_filter, min_tasks=0))
+        args.jobs = 2
+        assert list_cmd.run(args, ctx) == 0
+        assert [line.split()[0] for line in capsys.readouterr().out.splitlines()[1:]] == ["new", "later"]
+
+        if table.available():  # long-lived processes filter dates through the cached table
+            storage.cache_writes = True
+            args.jobs = 1
+            assert list_cmd.run(args, ctx) == 0
+            assert [line.split()[0] for line in capsys.readouterr().out.splitlines()[1:]] == ["new", "later"]
+            assert storage._table is not None  # built by the list above
+
+            # kept current across adds, and then used for the other filters too
+            storage.add_task(Task.create("Home again", id="again", tags=["home"]))
+            assert len(storage._table[2]) == 4
+            for name in ("load", "query", "iter_tasks"):
+                monkeypatch.setattr(storage, name, None)  # the table answers on its own
+            args.since = None
+            assert list_cmd.run(args, ctx) == 0
+            assert [line.split()[0] for line in capsys.readouterr().out.splitlines()[1:]] == ["new", "later", "again"]
+
+
+def test_task_table_masks_match_python_filters():
+    pytest.importorskip("numpy")
+    from tasks5.table import TaskTable
+
+    tasks = [
+        Task(id=str(i), description=f"task {i} ✓", created=f"2026-{1 + i % 12:02d}-15T00:00:00Z",
+             completed=i % 3 == 0, tags=["a", "b"][: i % 3])
+        for i in range(60)
+    ] + [Task(id="bad", description="no date", created="not a date", tags=["a"])]
+    tt = TaskTable.from_tasks(tasks)
+    assert tt.to_tasks() == tasks
+
+    since, until = parse_timestamp("2026-03-01"), parse_timestamp("2026-09-01")
+    for tag, completed, lo, hi in [("a", None, None, None), ("b", False, since, None), (None, True, since, until), ("zzz", None, None, None)]:
+        expected = [t for t in tasks if list_cmd._keep(t, tag, completed, lo, hi)]
+        assert tt.take(tt.mask(tag, completed, lo, hi)) == expected
+
+    # rows appended to a table match a table built from all of them
+    more = [Task(id="new", description="new ✓", created="2026-05-01T00:00:00Z", tags=["c", "a"]),
+            Task(id="plain", description="", created="2026-06-01T00:00:00Z")]
+    grown = TaskTable.from_tasks(tasks[:30]).appended(tasks[30:] + more)
+    assert grown.to_tasks() == tasks + more
+    assert grown.take(grown.mask("a", None, since, None)) == [t for t in tasks + more
+                                                              if list_cmd._keep(t, "a", None, since, None)]
+
+
+def test_import_formats_and_dedup(tmp_path, capsys):
+    storage = Storage(str(tmp_path / "tasks.json"))
+    storage.save([Task.create("existing", id="t1")])
+    ctx = SimpleNamespace(storage=storage)
+
+    ndjson = tmp_path / "in.ndjson"
+    ndjson.write_text(
+        '{"id": "t1", "description": "dup of stored"}\n'
+        '{"id": "t2", "description": "from ndjson", "tags": ["a"], "completed": true}\n'
+        '\n'
+        '{"id": "t2", "description": "dup within input"}\n'
+    )
+    csv_file = tmp_path / "in.csv"
+    csv_file.write_text('id,description,tags,completed\nt3,"from, csv","x,y",yes\n')
+    json_file = tmp_path / "in.json"
+    json_file.write_text('[{"id": "t4", "description": "from json", "created": "2024-01-01T00:00:00+00:00"}]')
+
+    for source in (ndjson, csv_file, json_file):
+        args = SimpleNamespace(source=str(source), format=None, skip_invalid=False, quiet=True)
+        assert import_cmd.run(args, ctx) == 0
+    assert "2 duplicates skipped" in capsys.readouterr().out.splitlines()[0]
+
+    tasks = Storage(storage.path).load()
+    assert [t.id for t in tasks] == ["t1", "t2", "t3", "t4"]
+    assert tasks[1].completed and tasks[1].tags == ["a"]
+    assert tasks[2].description == "from, csv" and tasks[2].tags == ["x", "y"] and tasks[2].completed
+    assert tasks[3].created == "2024-01-01T00:00:00+00:00"
+
+
+def test_import_invalid_records(tmp_path, capsys):
+    storage = Storage(str(tmp_path / "tasks.json"))
+    ctx = SimpleNamespace(storage=storage)
+    source = tmp_path / "in.ndjson"
+    source.write_text('{"description": "ok"}\nnot json\n{"description": ""}\n{"description": "x", "created": "soon"}\n')
+
+    args = SimpleNamespace(source=str(source), format=None, skip_invalid=False, quiet=True)
+    assert import_cmd.run(args, ctx) == 2
+    assert "line 2" in capsys.readouterr().out
+    assert not os.path.exists(storage.path)
+
+    args.skip_invalid = True
+    assert import_cmd.run(args, ctx) == 0
+    assert "Imported 1 tasks (0 duplicates skipped, 3 invalid skipped)" in capsys.readouterr().out
+    assert [t.description for t in storage.load()] == ["ok"]
+
+
+def _export_args(**kw):
+    args = dict(tag=None, completed=False, incomplete=False, since=None, until=None, jobs=1,
+                output="-", format=None, compress=None)
+    args.update(kw)
+    return SimpleNamespace(**args)
+
+
+def test_export_streams_filtered_records(tmp_path, capsys):
+    storage = Storage(str(tmp_path / "tasks.json"))
+    done = Task.create("done, really", tags=["home", "x"], id="t1")
+    done.completed = True
+    storage.save([done, Task.create("open", tags=["home"], id="t2"), Task.create("other", id="t3")])
+    ctx = SimpleNamespace(storage=storage)
+
+    assert export_cmd.run(_export_args(tag="home"), ctx) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["t1", "t2"]
+
+    assert export_cmd.run(_export_args(completed=True, format="json"), ctx) == 0
+    assert json.loads(capsys.readouterr().out) == [done.to_dict()]
+
+    # compressed CSV round-trips through import
+    out = tmp_path / "done.csv.gz"
+    assert export_cmd.run(_export_args(output=str(out)), ctx) == 0
+    with gzip.open(out, "rt", encoding="utf-8", newline="") as f:
+        assert f.readline().strip() == "id,description,created,completed,tags"
+    target = Storage(str(tmp_path / "copy.json"))
+    with gzip.open(out, "rt", encoding="utf-8", newline="") as f:
+        (tmp_path / "done.csv").write_text(f.read())
+    args = SimpleNamespace(source=str(tmp_path / "done.csv"), format=None, skip_invalid=False, quiet=True)
+    assert import_cmd.run(args, SimpleNamespace(storage=target)) == 0
+    assert [t.to_dict() for t in target.load()] == [t.to_dict() for t in storage.load()]
+
+
+def test_cli_forwards_to_running_server(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    args = cli.build_parser().parse_args(["--data-file", "tasks.json", "serve"])
+    ctx = cli.make_context(args)
+    ctx.storage.cache_writes = True
+    server = daemon.Server(args, ctx.storage)
+    thread = threading.Thread(target=asyncio.run, args=(server.run(),))
+    thread.start()
+    try:
+        assert server.ready.wait(5)
+        assert cli.main(["add", "Served task", "--id", "s1"]) == 0
+        assert cli.main(["--data-file", str(tmp_path / "tasks.json"), "list"]) == 0
+        assert cli.main(["search", "served", "--ignore-case"]) == 0
+        assert server.requests == 3
+        out = capsys.readouterr().out
+        assert "Added task s1" in out and out.count("Served task") == 3
+
+        # other options or data files run locally
+        assert cli.main(["--durability", "none", "list"]) == 0
+        assert cli.main(["--data-file", "other.json", "list"]) == 0
+        assert server.requests == 3
+        # the server's writes went through the storage layer
+        assert [t.id for t in Storage(str(tmp_path / "tasks.json")).load()] == ["s1"]
+        assert ctx.storage.cache_hits >= 1  # list served from memory
+    finally:
+        server.stop()
+        thread.join(5)
+    assert not os.path.exists(server.path)
+    assert cli.main(["list"]) == 0
+
+
+def test_batch_buffers_writes_until_commit(tmp_path, capsys):
+    path = str(tmp_path / "tasks.json")
+    storage = Storage(path)
+    storage.save([Task.create("stored report", tags=["work"], id="t0")])
+    commands = tmp_path / "commands.txt"
+    commands.write_text(
+        "add 'draft report' -t work --id t1  # buffered\n"
+        "search report --field description\n"
+        "search work --field tags\n"
+        "commit\n"
+        "add 'late task' --id t2\n"
+        "search --rank report --limit 1\n"
+        "list --tag nope --json\n"
+        "bogus\n"
+        "add never --id t3\n"
+    )
+    ctx = SimpleNamespace(data_file=path, debug=True, storage=storage)
+    writes = []
+    storage_add_tasks = storage.add_tasks
+    storage.add_tasks = lambda tasks, **kw: (writes.append([t.id for t in tasks]), storage_add_tasks(tasks, **kw))
+
+    args = SimpleNamespace(command="batch", source=str(commands), keep_going=False)
+    assert shell_cmd.run(args, ctx) == 2
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert lines[1:3] == ["t0: stored report", "t1: draft report"]
+    assert lines[3:5] == ["t0: stored report", "t1: draft report"]
+    assert "Committed 1 tasks" in lines
+    assert "[search: " in captured.err and "Stopped at line 8" in captured.err
+
+    # one write at the commit point, one on the way out; t3 never ran
+    assert writes == [["t1"], ["t2"]]
+    assert [t.id for t in Storage(path).load()] == ["t0", "t1", "t2"]
+
+
+def test_cli_runs_batch_and_resolves_abbreviated_options(tmp_path, capsys):
+    data = str(tmp_path / "tasks.json")
+    commands_file = tmp_path / "commands.txt"
+    commands_file.write_text("add first -t a --id t1\nadd second --id t2\n")
+    assert cli.main(["--data-file", data, "batch", str(commands_file)]) == 0
+    capsys.readouterr()
+
+    assert cli.main(["--data", data, "list", "--tag", "a"]) == 0
+    assert [line.split()[-1] for line in capsys.readouterr().out.splitlines()[1:]] == ["first"]
+    assert client.scan_argv(["--data=x.json", "--dur", "none", "list"]) == ("x.json", "list")
+
+
+def test_search_rejects_non_positive_limit(tmp_path):
+    for limit in ("0", "-1"):
+        with pytest.raises(SystemExit) as exc:
+            cli.main(["--data-file", str(tmp_path / "tasks.json"), "search", "--rank", "report", "--limit", limit])
+        assert exc.value.code == 2
+
+
+def test_session_filters_include_pending_tasks(tmp_path, capsys):
+    for backend in ("sharded", "segmented"):
+        data = str(tmp_path / backend)
+        open_storage(data, backend=backend).save([Task.create("Stored", id="s", created="2024-06-01T00:00:00+00:00")])
+        commands_file = tmp_path / f"{backend}.txt"
+        commands_file.write_text("add Pending --id p\nlist --jobs 2\nlist --since 2024-01-01\n")
+        assert cli.main(["--data-file", data, "batch", str(commands_file)]) == 0
+        lines = [line.split()[-1] for line in capsys.readouterr().out.splitlines() if line.split()[0] in ("s", "p")]
+        assert lines == ["Stored", "Pending", "Stored", "Pending"], backend
+
+
+def test_batching_server_shares_commits_between_clients(tmp_path, monkeypatch, capsys):
+    # only a server has concurrent adds to batch
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--data-file", str(tmp_path / "tasks.json"), "--durability", "batch", "list"])
+    assert exc.value.code == 2
+
+    monkeypatch.chdir(tmp_path)
+    args = cli.build_parser().parse_args(["--durability", "batch", "serve"])
+    ctx = cli.make_context(args)
+    server = daemon.Server(args, ctx.storage)
+    server.committer.window = 0.2
+    thread = threading.Thread(target=asyncio.run, args=(server.run(),))
+    thread.start()
+    try:
+        assert server.ready.wait(5)
+        rcs = {}
+        ids = [f"c{i}" for i in range(6)] + ["c0"]
+
+        def add(n, id):
+            rcs[n] = client.forward(["add", f"Task {n}", "--id", id])
+
+        clients = [threading.Thread(target=add, args=(n, id)) for n, id in enumerate(ids)]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join(10)
+        # clients asking for the default durability are served too
+        assert sorted(rcs.values()) == [0] * 6 + [2]  # the second "c0" was refused
+        assert server.committer.commits < 6
+        assert sorted(t.id for t in Storage(str(tmp_path / "tasks.json")).load()) == ids[:6]
+        assert client.forward(["list"]) == 0
+        assert capsys.readouterr().out.count("Task") == 6 + 6
+    finally:
+        server.stop()
+        thread.join(5)
+
+
+def test_command_registry_matches_modules():
+    parser = cli.build_parser()
+    subparsers = next(a for a in parser._actions if a.dest == "command")
+    assert list(subparsers.choices) == list(commands.COMMANDS)
+    assert {a.dest: a.help for a in subparsers._choices_actions} == {n: c.help for n, c in commands.COMMANDS.items()}
+
+
+def test_list_imports_only_what_it_needs(tmp_path):
+    path = tmp_path / "tasks.json"
+    path.write_text('{"version": "1.0", "tasks": []}')
+    script = (
+        "import sys; from tasks5 import cli\n"
+        f"assert cli.main(['--data-file', {str(path)!r}, 'list']) == 0\n"
+        "print(' '.join(sorted(sys.modules)))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True).stdout
+    loaded = set(out.split())
+    for heavy in ("numpy", "asyncio", "concurrent.futures", "dataclasses", "sqlite3", "uuid",
+                  "tasks5.commands.add", "tasks5.commands.search", "tasks5.daemon"):
+        assert heavy not in loaded
+    assert "tasks5.commands.list" in loaded
+
+
+def test_cli_accepts_sharded_directory(tmp_path, capsys):
+    data = str(tmp_path / "shards")
+    assert cli.main(["--data-file", data, "--backend", "sharded", "--shards", "3", "add", "First", "--tags", "x"]) == 0
+    assert cli.main(["--data-file", data, "add", "Second"]) == 0
+    with open(os.path.join(data, "manifest.json"), encoding="utf-8") as f:
+        assert json.load(f)["shards"] == 3
+    capsys.readouterr()
+
+    assert cli.main(["--data-file", data, "list", "--jobs", "2"]) == 0
+    assert [line.split()[-1] for line in capsys.readouterr().out.splitlines()[1:]] == ["First", "Second"]
+    assert cli.main(["--data-file", data, "search", "--field", "tags", "x"]) == 0
+    assert capsys.readouterr().out.strip().endswith("First")
+
+
+def test_cli_archive_and_list_all(tmp_path, capsys):
+    data = str(tmp_path / "tasks.json")
+    old = Task.create("Old done", id="old", created="2024-01-05T00:00:00+00:00")
+    old.completed = True
+    Storage(data).save([old, Task.create("Open", id="open", created="2024-01-06T00:00:00+00:00")])
+
+    assert cli.main(["--data-file", data, "archive", "--older-than", "7"]) == 0
+    assert capsys.readouterr().out.strip() == "Archived 1 tasks"
+    for argv, expected in ((["list"], ["Open"]), (["list", "--all"], ["done", "Open"]),
+                           (["list", "--completed"], ["done"]), (["list", "--all", "--incomplete"], ["Open"])):
+        assert cli.main(["--data-file", data] + argv) == 0
+        assert [line.split()[-1] for line in capsys.readouterr().out.splitlines()[1:]] == expected
+
+    # an archived id is still taken
+    assert cli.main(["--data-file", data, "add", "Again", "--id", "old"]) == 2
+    assert "already exists" in capsys.readouterr().out
+    source = tmp_path / "in.json"
+    source.write_text(json.dumps([{"id": "old", "description": "Again"}, {"id": "new", "description": "New"}]),
+                      encoding="utf-8")
+    assert cli.main(["--data-file", data, "import", str(source), "--quiet"]) == 0
+    assert capsys.readouterr().out.strip() == "Imported 1 tasks (1 duplicates skipped, 0 invalid skipped)"
+    assert cli.main(["--data-file", data, "list", "--all"]) == 0
+    assert [line.split()[-1] for line in capsys.readouterr().out.splitlines()[1:]] == ["done", "Open", "New"]
+
+
+def test_cli_lists_segmented_directory_since(tmp_path, capsys):
+    data = str(tmp_path / "segments")
+    open_storage(data, backend="segmented").save([
+        Task.create("Old", id="old", created="2024-01-05T00:00:00+00:00"),
+        Task.create("Recent", id="recent", created="2024-06-05T00:00:00+00:00"),
+    ])
+    assert cli.main(["--data-file", data, "add", "Newest"]) == 0
+    capsys.readouterr()
+
+    assert cli.main(["--data-file", data, "list", "--since", "2024-06-01"]) == 0
+    assert [line.split()[-1] for line in capsys.readouterr().out.splitlines()[1:]] == ["Recent", "Newest"]
@@ -1,11 +1,24 @@
+import io
 import json
 import os
+import subprocess
+import sys
 import tempfile
+import threading
 
 from types import SimpleNamespace
 
-from tasks5.models import Task
-from tasks5.storage import Storage, StorageError
+import pytest
+
+import tasks5
+from tasks5.binary import BinarySnapshot
+from tasks5.groupcommit import GroupCommitter
+from tasks5.index import IdIndex
+from tasks5.jsonscan import ScanError, iter_task_objects
+from tasks5.models import FrozenTask, Task
+from tasks5.sqlite_storage import SqliteStorage, migrate_json
+from tasks5 import storage as storage_module
+from tasks5.storage import JournalStorage, Storage, StorageError, open_storage
 
 
 def test_storage_save_and_load():
@@ -34,3 +47,634 @@ def test_storage_handles_invalid_json():
             assert False, "expected StorageError"
         except StorageError:
             pass
+
+
+def test_journal_storage_appends_and_compacts():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        s = JournalStorage(path, compact_threshold=3)
+
+        s.save([Task.create("Snapshot task", id="a")])
+        s.add_task(Task.create("Journal task", id="b"))
+
+        # the snapshot is untouched; the new task only lives in the journal
+        with open(path, "r", encoding="utf-8") as f:
+            assert [t["id"] for t in json.load(f)["tasks"]] == ["a"]
+        assert [t.id for t in s.load()] == ["a", "b"]
+
+        # a torn trailing record is ignored and cut off by the next append
+        with open(s.journal_path, "ab") as f:
+            f.write(b'{"op": "add", "task": {"id": "x"')
+        assert [t.id for t in s.load()] == ["a", "b"]
+        s.add_task(Task.create("Third", id="c"))
+        assert s.journal_length() == 2
+        s.add_task(Task.create("Fourth", id="d"))
+
+        # threshold reached: folded back into a regular snapshot
+        assert not os.path.exists(s.journal_path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        assert set(data) == {"version", "updated", "tasks"}
+        assert [t["id"] for t in data["tasks"]] == ["a", "b", "c", "d"]
+        assert [t.id for t in Storage(path).load()] == ["a", "b", "c", "d"]
+
+
+def test_sqlite_storage_matches_json_surface():
+    with tempfile.TemporaryDirectory() as d:
+        json_path = os.path.join(d, "tasks.json")
+        db_path = os.path.join(d, "tasks.db")
+        Storage(json_path).save([
+            Task.create("First", tags=["home", "urgent"], id="1"),
+            Task.create("Second", tags=["work"], id="2"),
+        ])
+
+        assert migrate_json(json_path, db_path) == 2
+
+        # duplicated ids cannot go into the database; the error names them
+        legacy = os.path.join(d, "legacy.json")
+        with open(legacy, "w", encoding="utf-8") as f:
+            json.dump({"tasks": [Task.create(desc, id=i).to_dict() for desc, i in (("A", "x"), ("B", "y"), ("C", "x"))]}, f)
+        with pytest.raises(StorageError, match="duplicate task ids: 'x'$"):
+            migrate_json(legacy, db_path)
+
+        s = open_storage(db_path)
+        assert isinstance(s, SqliteStorage)
+        s.add_task(Task(id="3", description="Third", created="2025-11-14T00:00:00Z", completed=True, tags=["home"]))
+
+        assert [t.id for t in s.load()] == ["1", "2", "3"]
+        assert s.get_task_by_id("1").tags == ["home", "urgent"]
+        assert s.get_task_by_id("missing") is None
+        assert [t.id for t in s.query(tag="home")] == ["1", "3"]
+        assert [t.id for t in s.query(tag="home", completed=False)] == ["1"]
+        try:
+            s.add_task(Task.create("Duplicate", id="1"))
+            assert False, "expected StorageError"
+        except StorageError:
+            pass
+        s.close()
+
+
+def test_save_output_and_id_index():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        s = Storage(path)
+        tasks = [Task.create(f"Task {i} — ünïcode", tags=["a", "b"][: i % 3], id=str(i)) for i in range(5)]
+        s.save(tasks)
+
+        with open(path, "r", encoding="utf-8") as f:
+            raw = f.read()
+        data = json.loads(raw)
+        assert raw == json.dumps(data, ensure_ascii=False, indent=2)
+        assert os.path.exists(f"{path}.idx")
+        assert s.get_task_by_id("3") == tasks[3]
+        assert s.get_task_by_id("missing") is None
+
+        # a file written by someone else invalidates the index; a fresh
+        # Storage rebuilds it from the data file
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": "1.0", "updated": "", "tasks": [tasks[4].to_dict(), tasks[1].to_dict()]}, f)
+        s2 = Storage(path)
+        assert s2.get_task_by_id("1") == tasks[1]
+        assert s2.get_task_by_id("3") is None
+        os.remove(f"{path}.idx")
+        assert Storage(path).get_task_by_id("4") == tasks[4]
+
+
+def test_id_index_bisects_and_appends_in_place(tmp_path):
+    path = str(tmp_path / "tasks.json.idx")
+    entries = [(f"id{i:03d}", i * 10, 9) for i in range(50)] + [("id007", 999, 9)]
+    IdIndex(path).build(entries, (1, 2, 3))
+    index = IdIndex(path)
+    assert not index.is_fresh((1, 2, 4))
+    assert index.is_fresh((1, 2, 3)) and len(index) == 51
+    assert index.lookup("id007") == (70, 9) and index.lookup("id049") == (490, 9)
+    assert index.lookup("missing") is None
+
+    # appends extend the tail in place; an index at another signature is left alone
+    index.extend([("new", 600, 5)], (1, 2, 3), (1, 2, 5))
+    index.extend([("other", 700, 5)], (9, 9, 9), (9, 9, 10))
+    index = IdIndex(path)
+    assert index.is_fresh((1, 2, 5)) and index.lookup("new") == (600, 5) and index.lookup("other") is None
+    assert index.spans() == [(offset, length) for _, offset, length in entries] + [(600, 5)]
+
+    # a long tail is folded into the sorted part
+    index.extend([(f"t{i}", 1000 + i, 1) for i in range(1100)], (1, 2, 5), (1, 2, 6))
+    index = IdIndex(path)
+    assert index.is_fresh((1, 2, 6)) and len(index) == 1152 and not index._tail_ids
+    assert index.lookup("t5") == (1005, 1) and index.lookup("id007") == (70, 9)
+
+
+def test_tag_index_lookups_and_incremental_add(monkeypatch):
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        s = JournalStorage(path)
+        s.save([
+            Task.create("One", tags=["Home", "urgent"], id="1"),
+            Task.create("Two", tags=["work"], id="2"),
+            Task.create("Three", tags=["home"], id="3"),
+        ])
+        # built by the first tag query, not by save()
+        assert not os.path.exists(f"{path}.tags")
+        assert [t.id for t in s.find_by_tag("home")] == ["3"]
+        assert os.path.exists(f"{path}.tags")
+        assert [t.id for t in s.find_by_tag("HOME", ignore_case=True)] == ["1", "3"]
+
+        s.add_task(Task.create("Four", tags=["home"], id="4"))
+        # posted incrementally: the index still matches snapshot + journal
+        assert s.tag_index.is_fresh(s._signature())
+        assert [t.id for t in s.find_by_tag("home")] == ["3", "4"]
+        assert [t.id for t in s.query(tag="home", completed=False)] == ["3", "4"]
+
+        # a stale or missing index is rebuilt on demand
+        os.remove(f"{path}.tags")
+        assert [t.id for t in JournalStorage(path).find_by_tag("urgent")] == ["1"]
+
+        # a tag on a large share of the tasks is answered by one streamed scan
+        monkeypatch.setattr(storage_module, "SCAN_MIN_HITS", 0)
+        monkeypatch.setattr(Storage, "get_tasks_by_ids", lambda self, ids: pytest.fail("decoded hits one by one"))
+        assert [t.id for t in s.find_by_tag("HOME", ignore_case=True)] == ["1", "3", "4"]
+        assert [t.id for t in s.query(tag="work")] == ["2"]
+        assert s.description_candidates("Three") is None
+
+
+def test_iter_task_objects_streams_any_layout():
+    tasks = [Task.create(f"Task {i} ✓ \"quoted\" ]", tags=["x"] * (i % 2), id=str(i)).to_dict() for i in range(20)]
+    doc = {"updated": "2025-11-14T00:00:00Z", "meta": {"tasks": [1]}, "tasks": tasks, "version": "1.0"}
+    for text in (json.dumps(doc), json.dumps(doc, indent=4, ensure_ascii=False)):
+        for chunk_size in (1, 7, 1 << 16):
+            assert list(iter_task_objects(io.StringIO(text), chunk_size=chunk_size)) == tasks
+
+    try:
+        list(iter_task_objects(io.StringIO(json.dumps(doc)[:-40])))
+        assert False, "expected ScanError"
+    except ScanError:
+        pass
+
+    with tempfile.TemporaryDirectory() as d:
+        s = JournalStorage(os.path.join(d, "tasks.json"))
+        s.save([Task.from_dict(t) for t in tasks])
+        s.add_task(Task.create("Journal task", id="j"))
+        assert list(s.iter_tasks()) == s.load()
+
+
+def test_load_cache_tracks_file_changes():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        s = Storage(path)
+        s.save([Task.create("One", id="1")])
+
+        assert [t.id for t in s.load()] == ["1"]
+        assert (s.cache_hits, s.cache_misses) == (0, 1)
+        loaded = s.load()
+        loaded.append(Task.create("Not saved", id="x"))
+        assert [t.id for t in s.load()] == ["1"]
+        assert (s.cache_hits, s.cache_misses) == (2, 1)
+
+        # our own save invalidates; another writer changes the signature
+        s.add_task(Task.create("Two", id="2"))
+        assert [t.id for t in s.load()] == ["1", "2"]
+        Storage(path).save([Task.create("Three", id="3")])
+        assert [t.id for t in s.load()] == ["3"]
+        assert [t.id for t in s.iter_tasks()] == ["3"]
+        # add_task appended in place without reading the tasks back
+        assert (s.cache_hits, s.cache_misses) == (3, 3)
+
+
+def test_frozen_task_round_trip_and_interned_tags():
+    data = json.loads('[{"id": "1", "description": "A", "created": "c", "completed": true, "tags": ["home", "urgent"]},'
+                      ' {"id": "2", "description": "B", "created": "c", "completed": false, "tags": ["home"]}]')
+    frozen = [FrozenTask.from_dict(d) for d in data]
+    assert [f.to_dict() for f in frozen] == data
+    assert frozen[0].tags == ("home", "urgent")
+    assert frozen[0].tags[0] is frozen[1].tags[0]
+    assert FrozenTask.from_task(frozen[0].to_task()) == frozen[0]
+
+    tasks = [Task.from_dict(d) for d in data]
+    assert tasks[0].tags[0] is tasks[1].tags[0]
+    try:
+        frozen[0].completed = False
+        assert False, "expected FrozenInstanceError"
+    except AttributeError:
+        pass
+
+
+def test_binary_snapshot_lookups():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        s = Storage(path, binary=True)
+        tasks = [
+            Task(id=f"id{i:03d}", description=f"Task {i} ✓", created="2025-11-14T00:00:00Z",
+                 completed=i % 4 == 0, tags=["even"] if i % 2 == 0 else ["odd", "x"])
+            for i in range(30, 0, -1)
+        ]
+        s.save(tasks)
+
+        with BinarySnapshot(s.binary_path) as snap:
+            assert list(snap.iter_tasks()) == tasks
+            assert snap.find("id007") == tasks.index(s.get_task_by_id("id007"))
+            assert snap.find("id000") is None
+        assert s.get_task_by_id("id012") == tasks[18]
+        assert s.query(completed=True) == [t for t in tasks if t.completed]
+
+        # a JSON file changed behind our back makes the snapshot stale
+        Storage(path).save(tasks[:2])
+        assert s._binary() is None
+        assert s.get_task_by_id("id012") is None
+        assert s.query(completed=False) == [t for t in tasks[:2] if not t.completed]
+
+
+def test_group_commit_batches_concurrent_adds():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        s = Storage(path, durability="batch")
+        s._committer.window = 0.05
+        errors = []
+
+        def add(i):
+            try:
+                s.add_task(Task.create(f"Task {i}", id=str(i)))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors
+        assert sorted(int(t.id) for t in Storage(path).load()) == list(range(20))
+        assert s._committer.commits < 20
+
+        # a failed batch is reported to every caller in it
+        committer = GroupCommitter(lambda tasks: 1 / 0, window=0)
+        future = committer.submit(Task.create("Doomed"))
+        try:
+            future.result()
+            assert False, "expected ZeroDivisionError"
+        except ZeroDivisionError:
+            pass
+
+
+WRITER = """
+import sys
+from tasks5.models import Task
+from tasks5.storage import open_storage
+
+path, backend, name, count = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+storage = open_storage(path, backend)
+for i in range(count):
+    storage.add_task(Task.create(f"{name} task {i}", id=f"{name}-{i}"))
+"""
+
+
+def test_parallel_writer_processes_keep_every_task():
+    src = os.path.dirname(os.path.dirname(tasks5.__file__))
+    env = dict(os.environ, PYTHONPATH=src)
+    writers, per_writer = 8, 10
+    for backend in ("json", "journal"):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "tasks.json")
+            procs = [
+                subprocess.Popen([sys.executable, "-c", WRITER, path, backend, f"w{n}", str(per_writer)], env=env)
+                for n in range(writers)
+            ]
+            assert [p.wait(timeout=120) for p in procs] == [0] * writers
+
+            ids = [t.id for t in open_storage(path, backend).load()]
+            assert sorted(ids) == sorted(f"w{n}-{i}" for n in range(writers) for i in range(per_writer))
+            assert not [f for f in os.listdir(d) if f.endswith(".tmp")]
+
+
+def test_save_merges_tasks_added_since_load():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "tasks.json")
+        Storage(path).save([Task.create("One", id="1"), Task.create("Two", id="2")])
+
+        mine = Storage(path)
+        tasks = mine.load()
+        Storage(path).add_task(Task.create("Theirs", id="3"))
+
+        # drop "2" and add "4" based on the stale view; "3" must survive
+        mine.save([tasks[0], Task.create("Mine", id="4")])
+        assert [t.id for t in Storage(path).load()] == ["1", "4", "3"]
+
+
+def test_save_keeps_file_mode(tmp_path):
+    path = tmp_path / "tasks.json"
+    s = Storage(str(path))
+    s.save([Task.create("a")])
+    os.chmod(path, 0o640)
+    s.save([Task.create("b")])
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+
+def postings(index, tasks):
+    """Every posting of `index` under the keys of `tasks`, and the task lengths."""
+    keys = sorted({key for task in tasks for key in index._keys(task)})
+    return {key: list(zip(*index._postings(key))) for key in keys}, [index.length(n) for n in range(len(index))]
+
+
+def test_incremental_save_matches_full_save(tmp_path):
+    def body(path):
+        # everything after the "updated" timestamp
+        return path.read_bytes().split(b'"tasks": [', 1)[1]
+
+    path, full_path = tmp_path / "tasks.json", tmp_path / "full.json"
+    s = Storage(str(path))
+    s.cache_writes = True
+    tasks = [Task.create(f"Task {i} ünïcode", tags=["a", "b", "B"][: i % 4], id=str(i)) for i in range(20)]
+    s.save(tasks)
+    s.find_by_tag("a"), s.description_candidates("task"), s.rank("task")  # load the posting indexes
+
+    tasks[3].description = "Changed description"
+    tasks[4].tags.append("new")
+    tasks[5].tags.remove("a")
+    tasks[9].completed = True
+    tasks.append(Task.create("Appended", tags=["a"], id="20"))
+    encoded = []
+    s._encode_task = lambda t: encoded.append(t.id) or Storage._encode_task(t)
+    s.save(tasks)
+    assert encoded == ["3", "4", "5", "9", "20"]
+
+    full = Storage(str(full_path))
+    full.save([Task.from_dict(t.to_dict()) for t in tasks])
+    assert body(path) == body(full_path)
+    assert s.get_task_by_id("3").description == "Changed description"
+    assert [t.id for t in s.find_by_tag("a")] == [t.id for t in full.find_by_tag("a")]
+    assert [t.id for t in s.find_by_tag("new")] == ["4"]
+    full.description_candidates("task"), full.rank("task")
+    # patched in memory, and on disk by the delta lines a fresh storage replays
+    reopened = Storage(str(path))
+    reopened.find_by_tag("a"), reopened.description_candidates("task"), reopened.rank("task")
+    for index in (s, reopened):
+        for name in ("tag_index", "trigram_index", "term_index"):
+            assert postings(getattr(index, name), tasks) == postings(getattr(full, name), tasks)
+
+    # a load and save in a fresh storage splices too, without cache_writes
+    oneshot = Storage(str(path))
+    loaded = oneshot.load()
+    loaded[7].description = "Changed after load"
+    encoded.clear()
+    oneshot._encode_task = lambda t: encoded.append(t.id) or Storage._encode_task(t)
+    oneshot.save(loaded)
+    assert encoded == ["7"]
+    assert Storage(str(path)).get_task_by_id("8") == loaded[8]  # spans moved in the id index
+    full.save([Task.from_dict(t.to_dict()) for t in loaded])
+    assert body(path) == body(full_path)
+    tasks = loaded
+
+    # removing a task falls back to a full rewrite
+    del tasks[0]
+    s.save(tasks)
+    full.save(tasks)
+    assert body(path) == body(full_path)
+
+
+def test_save_after_reindexing_a_foreign_file_rewrites_it(tmp_path):
+    path = tmp_path / "tasks.json"
+    tasks = [Task.create(f"Task {i}", tags=["a"], id=str(i)) for i in range(5)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": "1.0", "updated": "", "tasks": [t.to_dict() for t in tasks]}, f)
+    s = Storage(str(path))
+    assert s.get_task_by_id("1").description == "Task 1"  # id index scanned from the compact file
+    loaded = s.load()
+    loaded[2].description = "x"
+    s.save(loaded)
+
+    full = Storage(str(tmp_path / "full.json"))
+    full.save([Task.from_dict(t.to_dict()) for t in loaded])
+    body = lambda p: open(p, "rb").read().split(b'"tasks"')[1]
+    assert body(path) == body(tmp_path / "full.json")
+    # written by save(), the spans may be spliced from now on
+    assert Storage(str(path)).get_task_by_id("4") == loaded[4]
+    assert s.id_index.own_layout
+
+
+def test_add_task_appends_in_place_and_recovers(tmp_path, monkeypatch):
+    from tasks5 import tailappend
+
+    path = str(tmp_path / "tasks.json")
+    s = Storage(path)
+    s.save([])
+    s.add_task(Task.create("First", tags=["a"], id="1"))
+    s.save(s.load() + [Task.create("Second", id="2")])
+    before = open(path, "rb").read()
+
+    # the appended file reads back the same as a full save of it
+    monkeypatch.setattr(Storage, "_load_uncached", lambda self: pytest.fail("add_task read the file"))
+    s.add_tasks([Task.create("Third", id="3"), Task.create("Fourth ✓", tags=["b"], id="4")])
+    monkeypatch.undo()
+    after = open(path, "rb").read()
+    assert len(after) > len(before) and not os.path.exists(tailappend.undo_path(path))
+    full = tmp_path / "full.json"
+    Storage(str(full)).save(Storage(path).load())
+    assert after.split(b'"tasks"')[1] == full.read_bytes().split(b'"tasks"')[1]
+    assert s.get_task_by_id("4").description == "Fourth ✓"
+    assert [t.id for t in s.find_by_tag("b")] == ["4"]
+
+    # a crash after the bytes reached the file keeps the append...
+    monkeypatch.setattr(tailappend.os, "remove", lambda p: None)
+    s.add_task(Task.create("Fifth", id="5"))
+    monkeypatch.undo()
+    assert [t.id for t in Storage(path).load()][-1] == "5"
+    assert not os.path.exists(tailappend.undo_path(path))
+
+    # ...one that tore the write is rolled back to the previous file
+    complete = open(path, "rb").read()
+    monkeypatch.setattr(tailappend.os, "remove", lambda p: None)
+    s.add_task(Task.create("Sixth", id="6"))
+    monkeypatch.undo()
+    with open(path, "r+b") as f:
+        f.truncate(len(complete) + 20)
+    assert [t.id for t in Storage(path).load()] == ["1", "2", "3", "4", "5"]
+    assert open(path, "rb").read() == complete
+
+    # a file laid out differently takes the full rewrite
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": "1.0", "updated": "", "tasks": []}, f)
+    s.add_task(Task.create("Seventh", id="7"))
+    assert [t.id for t in Storage(path).load()] == ["7"]
+
+
+def test_load_during_in_place_append_reads_the_finished_file(tmp_path):
+    path = str(tmp_path / "tasks.json")
+    writer = Storage(path)
+    writer.save([Task.create("First", id="1")])
+    writer.add_task(Task.create("Second", id="2"))
+    complete = open(path, "rb").read()
+
+    # a reader that sees the append half way, after the undo record is gone,
+    # waits for the writer's lock and reads again
+    held, release = threading.Event(), threading.Event()
+
+    def append():
+        with writer.locked():
+            with open(path, "r+b") as f:
+                f.truncate(len(complete) - 10)
+            held.set()
+            release.wait(5)
+            with open(path, "wb") as f:
+                f.write(complete)
+
+    thread = threading.Thread(target=append)
+    thread.start()
+    held.wait(5)
+    threading.Timer(0.1, release.set).start()
+    assert [t.id for t in Storage(path).load()] == ["1", "2"]
+    thread.join()
+
+    # and a real writer never shows a concurrent reader a torn file
+    def add():
+        for i in range(3, 60):
+            writer.add_task(Task.create(f"Task {i}", id=str(i)))
+
+    thread = threading.Thread(target=add)
+    thread.start()
+    counts = []
+    while thread.is_alive():
+        counts.append(len(Storage(path).load()))
+    thread.join()
+    assert counts == sorted(counts) and len(Storage(path).load()) == 59
+
+
+def _has_description(task, description):
+    return task.description == description
+
+
+def test_sharded_storage_matches_single_file(tmp_path):
+    from tasks5.sharded import ShardedStorage
+
+    tasks = [Task.create(f"Task {i} report" if i % 3 else f"Plan {i}", tags=["even"] if i % 2 == 0 else [],
+                         id=f"id{i}", created=f"2024-01-{i + 1:02d}T00:00:00+00:00") for i in range(20)]
+    single = Storage(str(tmp_path / "tasks.json"))
+    single.save(tasks)
+    sharded = open_storage(str(tmp_path / "shards"), backend="sharded", shards=4)
+    sharded.save(tasks)
+
+    reopened = open_storage(str(tmp_path / "shards"))  # a directory opens as sharded
+    assert isinstance(reopened, ShardedStorage) and len(reopened.shards) == 4
+    assert [t.id for t in reopened.load()] == [t.id for t in tasks]
+    assert [t.id for t in reopened.find_by_tag("even")] == [t.id for t in single.find_by_tag("even")]
+    assert [t.id for t in reopened.query(completed=False)] == [t.id for t in tasks]
+    assert reopened.rank("report plan") == single.rank("report plan")
+    assert reopened.get_tasks_by_ids(["id7", "missing", "id3"]) == [tasks[7], tasks[3]]
+
+    # an add writes only the shard the task lands in
+    new = Task.create("Added", id="new", created="2024-02-01T00:00:00+00:00")
+    target = reopened.shard_for("new")
+    mtimes = {s.path: os.stat(s.path).st_mtime_ns for s in reopened.shards}
+    reopened.add_task(new)
+    assert [s.path for s in reopened.shards if os.stat(s.path).st_mtime_ns != mtimes[s.path]] == [target.path]
+    assert reopened.get_task_by_id("new") == new
+    assert [t.id for t in reopened.scan(_has_description, ("Added",), jobs=2)] == ["new"]
+
+
+def test_segmented_storage_prunes_by_zone_map(tmp_path, monkeypatch):
+    from datetime import datetime, timezone
+
+    from tasks5.segmented import SegmentedStorage
+
+    tasks = [Task.create(f"Task {i}", tags=["old"] if i < 4 else ["new"], id=f"id{i}",
+                         created=f"2024-0{1 + i // 2}-1{i % 2}T12:00:00+00:00") for i in range(8)]
+    for t in tasks[:6]:
+        t.completed = True
+    path = str(tmp_path / "segments")
+    open_storage(path, backend="segmented").save(tasks)
+
+    storage = open_storage(path)  # the manifest marks the directory as segmented
+    assert isinstance(storage, SegmentedStorage)
+    assert storage.keys() == ["2024-01", "2024-02", "2024-03", "2024-04"]
+    assert [t.id for t in storage.load()] == [t.id for t in tasks]
+    assert storage.zones()["2024-02"]["tags"] == ["old"]
+
+    opened = []
+    original = Storage.iter_tasks
+    monkeypatch.setattr(Storage, "iter_tasks", lambda self: opened.append(os.path.basename(self.path)) or original(self))
+    since = datetime(2024, 3, 11, tzinfo=timezone.utc)
+    assert {t.id for t in storage.candidates(since=since)} == {"id4", "id5", "id6", "id7"}
+    assert opened == ["segment-2024-03.json", "segment-2024-04.json"]
+    opened.clear()
+    assert {t.id for t in storage.candidates(completed=False)} == {"id6", "id7"}
+    assert opened == ["segment-2024-04.json"]
+    monkeypatch.undo()
+    assert [t.id for t in storage.query(tag="old")] == ["id0", "id1", "id2", "id3"]
+
+    # adds and saves leave older months alone
+    mtimes = {k: os.stat(storage.segment(k).path).st_mtime_ns for k in storage.keys()}
+    storage.add_task(Task.create("Later", id="later", created="2024-04-20T00:00:00+00:00"))
+    loaded = storage.load()
+    loaded[-1].completed = True
+    storage.save(loaded)
+    changed = [k for k in mtimes if os.stat(storage.segment(k).path).st_mtime_ns != mtimes[k]]
+    assert changed == ["2024-04"]
+    assert storage.zones()["2024-04"]["completed"] == 1
+
+    # a segment written behind the manifest's back gets its zone map recomputed
+    Storage(storage.segment("2024-01").path).add_task(
+        Task.create("Sneaked", tags=["urgent"], id="sneaked", created="2024-01-20T00:00:00+00:00"))
+    assert "urgent" in open_storage(path).zones()["2024-01"]["tags"]
+
+
+def test_archive_moves_old_completed_tasks_out_of_load(tmp_path):
+    from datetime import timedelta
+
+    from tasks5 import archive
+
+    path = str(tmp_path / "tasks.json")
+    storage = Storage(path)
+    tasks = [Task.create(f"Task {i}", id=f"id{i}", created=f"2024-01-0{i + 1}T00:00:00+00:00") for i in range(4)]
+    tasks.append(Task.create("Fresh", id="fresh"))
+    for t in tasks[:2] + tasks[-1:]:
+        t.completed = True
+    storage.save(tasks)
+
+    assert storage.archive_completed(timedelta(days=30)) == 2
+    assert [t.id for t in storage.load()] == ["id2", "id3", "fresh"]
+    assert [t.id for t in storage.iter_archived()] == ["id0", "id1"]
+    assert storage.archive_completed(timedelta(days=30)) == 0
+
+    # a migration that died before rewriting the data file is rolled back
+    loaded = storage.load()
+    loaded[0].completed = True
+    storage.save(loaded)
+    out = archive.Appender(path, fsync=False)
+    out.add(loaded[0])
+    out.close()
+    assert [t.id for t in storage.iter_archived()] == ["id0", "id1"]  # readers skip the pending member
+    assert storage.archived_ids() == {"id0", "id1"}
+    assert storage.archive_completed(timedelta(days=30)) == 1
+    assert [t.id for t in storage.iter_archived()] == ["id0", "id1", "id2"]
+    assert [t.id for t in storage.load()] == ["id3", "fresh"]
+    assert not os.path.exists(archive.pending_path(path))
+    assert storage.archived_ids() == {"id0", "id1", "id2"}
+
+    # an archive from before the id list is scanned, and the list seeded on the next migration
+    os.remove(archive.ids_path(path))
+    assert storage.archived_ids() == {"id0", "id1", "id2"}
+    loaded = storage.load()
+    loaded[0].completed = True
+    storage.save(loaded)
+    assert storage.archive_completed(timedelta(days=30)) == 1
+    with open(archive.ids_path(path), encoding="utf-8") as f:
+        assert f.read().split() == ["id0", "id1", "id2", "id3"]
+
+
+def test_write_after_interrupted_archiving_drops_orphaned_member(tmp_path):
+    from datetime import timedelta
+
+    from tasks5 import archive
+
+    path = str(tmp_path / "tasks.json")
+    old = Task.create("Old", id="old", created="2024-01-01T00:00:00+00:00")
+    old.completed = True
+    storage = Storage(path)
+    storage.save([old])
+    out = archive.Appender(path, fsync=False)  # dies before rewriting the data file
+    out.add(old)
+    out.close()
+
+    storage.add_task(Task.create("New", id="new"))
+    assert storage.archive_completed(timedelta(days=30)) == 1
+    assert [t.id for t in storage.iter_archived()] == ["old"]
+    assert [t.id for t in storage.load()] == ["new"]